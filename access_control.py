@@ -1,8 +1,39 @@
 import streamlit as st
 import db_utils
 import config
+import logging
+import re
 from functools import wraps
 
+_log = logging.getLogger(__name__)
+
+# Top-level clauses that end a WHERE clause
+_CLAUSE_AFTER_WHERE = re.compile(r'\b(GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|UNION|FOR\s+UPDATE)\b', re.IGNORECASE)
+_WHERE = re.compile(r'\bWHERE\b', re.IGNORECASE)
+
+# Clauses that end a JOIN's ON condition
+_CLAUSE_AFTER_ON = re.compile(
+    r'\b(?:(?:LEFT|RIGHT|INNER|CROSS|FULL|NATURAL|STRAIGHT_JOIN)\b|JOIN\b|WHERE\b|GROUP\s+BY|HAVING'
+    r'|ORDER\s+BY|LIMIT|UNION|FOR\s+UPDATE|WINDOW\b)',
+    re.IGNORECASE
+)
+_ON = re.compile(r'\s*ON\b', re.IGNORECASE)
+_LEFT_JOIN_BEFORE = re.compile(r'\bLEFT\s+(?:OUTER\s+)?$', re.IGNORECASE)
+
+# Constructs whose row sources the rewriter does not follow
+_UNFILTERABLE = re.compile(r'\b(?:UNION|RIGHT\s+(?:OUTER\s+)?JOIN|FULL\s+(?:OUTER\s+)?JOIN|NATURAL)\b', re.IGNORECASE)
+
+# Table references in FROM / JOIN, with optional alias
+_TABLE_REF = re.compile(
+    r'\b(?:FROM|JOIN)\s+`?(\w+)`?'
+    r'(?:\s+(?:AS\s+)?(?!(?:ON|USING|WHERE|JOIN|LEFT|RIGHT|INNER|OUTER|CROSS|NATURAL|STRAIGHT_JOIN'
+    r'|GROUP|HAVING|ORDER|LIMIT|UNION|FOR)\b)(\w+))?',
+    re.IGNORECASE
+)
+
+class RowFilterError(ValueError):
+    """Raised when a query reads a filtered table in a way that can't be rewritten safely"""
+
 def require_permission(permission_type):
     """
     Decorator to check if user has specific permission
@@ -24,14 +55,8 @@ def require_permission(permission_type):
 
 def check_page_access(page_name):
     """Check if current user can access a specific page"""
-    current_user, _ = db_utils.get_current_db_user()
-    
     # Admin has access to everything
-    if current_user in ('admin', 'canteen_admin'):
-        return True
-    
-    allowed_pages = db_utils.get_allowed_pages()
-    return page_name in allowed_pages
+    return db_utils.get_capabilities().can_access(page_name)
 
 def render_access_denied(page_name):
     """Render access denied message for a page"""
@@ -80,7 +105,7 @@ def render_access_denied(page_name):
 
 def render_permission_badge(permission_type):
     """Render a visual badge showing if user has a permission"""
-    has_permission = db_utils.check_permission(permission_type)
+    has_permission = db_utils.get_capabilities().has(permission_type)
     
     permission_names = {
         'can_create': 'Create',
@@ -108,9 +133,10 @@ def render_permission_badge(permission_type):
 
 def show_current_role_info():
     """Display current role information banner"""
-    current_user, _ = db_utils.get_current_db_user()
+    capabilities = db_utils.get_capabilities()
+    current_user = capabilities.user
     
-    if current_user in ('admin', 'canteen_admin'):
+    if capabilities.is_admin:
         st.info("""
         **Logged in as Administrator**  
         You have full access to all features and pages.
@@ -119,7 +145,6 @@ def show_current_role_info():
     
     if current_user in config.DB_USERS:
         user_info = config.DB_USERS[current_user]
-        role = db_utils.get_user_role()
         
         st.markdown(f"""
         <div style='background: linear-gradient(135deg, {user_info['color']}22 0%, {user_info['color']}44 100%; 
@@ -186,24 +211,191 @@ def create_permission_protected_form(form_name, permission_type):
     
     return PermissionProtectedForm(form_name, permission_type)
 
+def _mask_nested(sql):
+    """Blank out string literals, comments and parenthesised parts of a query.
+
+    Positions are preserved, so matches on the masked text can be used to
+    splice the original. What is left is the top level of the statement.
+    """
+    masked = list(sql)
+    depth = 0
+    quote = None
+    i = 0
+    while i < len(sql):
+        ch = sql[i]
+        if quote:
+            if ch == '\\':
+                masked[i] = ' '
+                if i + 1 < len(sql):
+                    masked[i + 1] = ' '
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+            masked[i] = ' '
+        elif ch in ("'", '"'):
+            quote = ch
+            masked[i] = ' '
+        elif sql.startswith('--', i) or ch == '#':
+            end = sql.find('\n', i)
+            end = len(sql) if end == -1 else end
+            masked[i:end] = ' ' * (end - i)
+            i = end
+            continue
+        elif ch == '(':
+            depth += 1
+            masked[i] = ' '
+        elif ch == ')':
+            depth -= 1
+            masked[i] = ' '
+        elif depth > 0:
+            masked[i] = ' '
+        i += 1
+    return ''.join(masked)
+
+def _paren_groups(sql):
+    """(start, end) of the contents of each top-level parenthesised group"""
+    groups = []
+    depth = 0
+    quote = None
+    i = 0
+    while i < len(sql):
+        ch = sql[i]
+        if quote:
+            if ch == '\\':
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif sql.startswith('--', i) or ch == '#':
+            end = sql.find('\n', i)
+            i = len(sql) if end == -1 else end
+            continue
+        elif ch == '(':
+            if depth == 0:
+                start = i + 1
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+            if depth == 0:
+                groups.append((start, i))
+        i += 1
+    return groups
+
+def _rewrite_level(query, filters, user_filter_field):
+    """Filter the table references at the top level of query (subqueries already done)"""
+    masked = _mask_nested(query)
+    refs = [
+        (match, filters[match.group(1).lower()])
+        for match in _TABLE_REF.finditer(masked)
+        if match.group(1).lower() in filters
+    ]
+
+    # A filtered table named anywhere else at this level (comma joins, ...) would go unfiltered
+    for name in filters:
+        mentions = len(re.findall(rf'\b{re.escape(name)}\b(?!\s*\.)', masked, re.IGNORECASE))
+        if mentions > sum(1 for match, _ in refs if match.group(1).lower() == name):
+            raise RowFilterError(f"{name} is referenced in a way the row filter cannot follow")
+    if not refs:
+        return query, False
+    if _UNFILTERABLE.search(masked):
+        raise RowFilterError("UNION, RIGHT/FULL and NATURAL joins are not row-filtered")
+
+    edits = []
+    where_predicates = []
+    for match, predicate in refs:
+        predicate = predicate.format(alias=match.group(2) or match.group(1), user_field=user_filter_field)
+        if not _LEFT_JOIN_BEFORE.search(masked, 0, match.start()):
+            where_predicates.append(predicate)
+            continue
+        # Nullable side of a LEFT JOIN: filter in ON, so unmatched rows still come back
+        on = _ON.match(masked, match.end())
+        if not on:
+            raise RowFilterError(f"LEFT JOIN {match.group(1)} needs an ON clause to be row-filtered")
+        tail = _CLAUSE_AFTER_ON.search(masked, on.end())
+        end = tail.start() if tail else len(query)
+        existing = query[on.end():end].strip()
+        edits.append((on.end(), end, f" ({predicate}) AND ({existing}) "))
+
+    if where_predicates:
+        condition = ' AND '.join(f"({p})" for p in where_predicates)
+        where = _WHERE.search(masked)
+        if where:
+            # Wrap the existing condition so an OR inside it cannot escape the filter
+            tail = _CLAUSE_AFTER_WHERE.search(masked, where.end())
+            end = tail.start() if tail else len(query)
+            existing = query[where.end():end].strip()
+            edits.append((where.start(), end, f"WHERE {condition} AND ({existing}) "))
+        else:
+            tail = _CLAUSE_AFTER_WHERE.search(masked)
+            end = tail.start() if tail else len(query)
+            edits.append((end, end, f" WHERE {condition} "))
+
+    for start, end, text in sorted(edits, reverse=True):
+        query = query[:start] + text + query[end:]
+    return query, True
+
+def _rewrite(query, filters, user_filter_field):
+    """Filter every level of query, innermost subqueries first"""
+    applied = False
+    for start, end in reversed(_paren_groups(query)):
+        inner, inner_applied = _rewrite(query[start:end], filters, user_filter_field)
+        if inner_applied:
+            query = query[:start] + inner + query[end:]
+            applied = True
+    query, level_applied = _rewrite_level(query, filters, user_filter_field)
+    return query, applied or level_applied
+
+def rewrite_query_with_filters(base_query, table_filters, user_filter_field='user_id'):
+    """Push row predicates into a SELECT wherever a filtered table is read.
+
+    table_filters maps table/view names to SQL predicates written with
+    {alias} (the table's alias in the query) and optionally {user_field}.
+    Predicates go into the WHERE clause of the (sub)query reading the table,
+    or into the ON clause when it is the nullable side of a LEFT JOIN.
+    Raises RowFilterError for queries that can't be filtered safely.
+
+    Returns (rewritten_query, applied).
+    """
+    if not table_filters:
+        return base_query, False
+
+    filters = {name.lower(): predicate for name, predicate in table_filters.items()}
+    rewritten, applied = _rewrite(base_query.rstrip().rstrip(';'), filters, user_filter_field)
+    if not applied:
+        return base_query, False
+    return rewritten.rstrip(), True
+
 def get_filtered_query_based_on_role(base_query, user_filter_field='user_id'):
     """
     Modify query based on user role to limit data visibility
     
+    Roles without can_view_all get the predicates from
+    config.ROLE_ROW_FILTERS pushed into the query (see
+    rewrite_query_with_filters), so the database (using the predicate's
+    index) returns only the rows they may see. A query the rewriter refuses
+    is logged and replaced by one returning no rows.
+    
     Args:
         base_query: Base SQL query
-        user_filter_field: Field name to filter by user (if role requires it)
+        user_filter_field: Field name substituted for {user_field} in filters
     
     Returns:
         Modified query string and whether filtering was applied
     """
-    current_user, _ = db_utils.get_current_db_user()
-    role = db_utils.get_user_role()
+    capabilities = db_utils.get_capabilities()
     
     # Admin and users with view_all can see everything
-    if current_user in ('admin', 'canteen_admin') or role.get('can_view_all', False):
+    if capabilities.is_admin or capabilities.has('can_view_all'):
         return base_query, False
     
-    # For staff with limited view, could add WHERE clause here
-    # This is a placeholder for future implementation
-    return base_query, False
\ No newline at end of file
+    table_filters = config.ROLE_ROW_FILTERS.get(capabilities.user, {})
+    try:
+        return rewrite_query_with_filters(base_query, table_filters, user_filter_field)
+    except RowFilterError as e:
+        # Never fall back to the unfiltered query: return its columns without rows
+        _log.warning("Row filter refused for %s: %s\n%s", capabilities.user, e, base_query)
+        st.error(f"This view can't be limited to your role's rows ({e}), so nothing is shown")
+        return f"SELECT * FROM ({base_query.rstrip().rstrip(';')}) AS refused WHERE FALSE", True
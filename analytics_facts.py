@@ -0,0 +1,190 @@
+"""
+Analytics fact slices
+One query per Analytics tab, grouped at the finest grain its charts need;
+every chart is then derived from that slice with pandas groupbys instead
+of its own scan. The SQL runs unchanged on MariaDB and on the local
+extract (analytics_store).
+"""
+
+import lazy_imports
+
+pd = lazy_imports.lazy_import('pandas')
+
+# KPIs and Order Analytics: orders by status, payment and hour
+ORDER_FACTS = """
+    SELECT
+        order_status,
+        payment_status,
+        payment_method,
+        HOUR(order_date) as hour,
+        COUNT(*) as orders,
+        SUM(total_amount) as amount
+    FROM Orders
+    GROUP BY order_status, payment_status, payment_method, HOUR(order_date)
+"""
+
+# Popular Items: sales per item. An order counts once per category, on the
+# category's lowest item_id in that order, so summing category_orders per
+# category gives distinct orders.
+ITEM_FACTS = """
+    SELECT
+        mi.item_id,
+        mi.item_name,
+        c.category_name,
+        mi.price,
+        s.order_count,
+        s.total_quantity_sold,
+        s.revenue,
+        COALESCE(f.category_orders, 0) as category_orders
+    FROM (
+        SELECT item_id, COUNT(*) as order_count, SUM(quantity) as total_quantity_sold, SUM(subtotal) as revenue
+        FROM Order_Items
+        GROUP BY item_id
+    ) s
+    JOIN Menu_Items mi ON mi.item_id = s.item_id
+    JOIN Categories c ON c.category_id = mi.category_id
+    LEFT JOIN (
+        SELECT first_item, COUNT(*) as category_orders
+        FROM (
+            SELECT MIN(oi.item_id) as first_item
+            FROM Order_Items oi
+            JOIN Menu_Items m ON m.item_id = oi.item_id
+            GROUP BY oi.order_id, m.category_id
+        ) firsts
+        GROUP BY first_item
+    ) f ON f.first_item = s.item_id
+"""
+
+# Revenue Analysis: paid orders per day and payment method
+REVENUE_FACTS = """
+    SELECT
+        DATE(order_date) as order_day,
+        payment_method,
+        COUNT(*) as order_count,
+        SUM(total_amount) as revenue
+    FROM Orders
+    WHERE payment_status = 'completed'
+    GROUP BY DATE(order_date), payment_method
+"""
+
+# Customer Insights: paid orders and spend per user (users without any
+# included); biggest spenders first, so a role's row cap only trims the tail
+CUSTOMER_FACTS = """
+    SELECT
+        u.user_id,
+        u.name,
+        u.srn,
+        u.user_type,
+        COUNT(o.order_id) as order_count,
+        COALESCE(SUM(o.total_amount), 0) as total_spent
+    FROM Users u
+    LEFT JOIN Orders o ON o.user_id = u.user_id AND o.payment_status = 'completed'
+    GROUP BY u.user_id, u.name, u.srn, u.user_type
+    ORDER BY total_spent DESC
+"""
+
+# Customer Insights from User_Stats (kept current by triggers on Orders, see
+# migrations/0002_user_stats.sql): an index read for the top customers and
+# a scan of Users for the per-type split, instead of grouping every order.
+# Live database only; the local extract has no User_Stats.
+TOP_CUSTOMERS = """
+    SELECT
+        u.name,
+        u.srn,
+        u.user_type,
+        s.paid_order_count as order_count,
+        s.total_spent
+    FROM User_Stats s
+    JOIN Users u ON u.user_id = s.user_id
+    WHERE s.paid_order_count > 0
+    ORDER BY s.total_spent DESC
+    LIMIT %s
+"""
+
+USER_TYPE_STATS = """
+    SELECT
+        u.user_type,
+        COUNT(*) as user_count,
+        COALESCE(SUM(s.paid_order_count), 0) as order_count,
+        COALESCE(SUM(s.total_spent), 0) as total_spent
+    FROM Users u
+    LEFT JOIN User_Stats s ON s.user_id = u.user_id
+    GROUP BY u.user_type
+"""
+
+def kpis(order_facts):
+    """Revenue, order counts and average paid order value"""
+    paid = order_facts[order_facts['payment_status'] == 'completed']
+    paid_orders = int(paid['orders'].sum())
+    revenue = float(paid['amount'].sum())
+    return {
+        'total_revenue': revenue,
+        'total_orders': int(order_facts['orders'].sum()),
+        'completed_orders': int(order_facts.loc[order_facts['order_status'] == 'completed', 'orders'].sum()),
+        'avg_order_value': revenue / paid_orders if paid_orders else 0.0
+    }
+
+def order_reports(order_facts):
+    """status_dist, payment_dist and hourly_pattern"""
+    status_dist = (
+        order_facts.groupby('order_status', as_index=False)['orders'].sum()
+        .rename(columns={'orders': 'count'})
+        .sort_values('count', ascending=False)
+    )
+    payment_dist = (
+        order_facts.groupby(['payment_status', 'payment_method'], as_index=False)
+        .agg(count=('orders', 'sum'), total_amount=('amount', 'sum'))
+        .sort_values('total_amount', ascending=False)
+    )
+    hourly_pattern = (
+        order_facts.groupby('hour', as_index=False)['orders'].sum()
+        .rename(columns={'orders': 'order_count'})
+        .sort_values('hour')
+    )
+    return {'status_dist': status_dist, 'payment_dist': payment_dist, 'hourly_pattern': hourly_pattern}
+
+def item_reports(item_facts, top=10):
+    """popular_items (top by quantity) and category_sales"""
+    popular_items = (
+        item_facts.sort_values('total_quantity_sold', ascending=False)
+        .head(top)[['item_name', 'category_name', 'order_count', 'total_quantity_sold', 'price']]
+        .reset_index(drop=True)
+    )
+    category_sales = (
+        item_facts.groupby('category_name', as_index=False)
+        .agg(order_count=('category_orders', 'sum'),
+             total_quantity=('total_quantity_sold', 'sum'),
+             total_revenue=('revenue', 'sum'))
+        .sort_values('total_revenue', ascending=False)
+    )
+    return {'popular_items': popular_items, 'category_sales': category_sales}
+
+def revenue_reports(revenue_facts, days=30):
+    """daily_revenue (last `days` days with sales, newest first) and payment_revenue"""
+    daily_revenue = (
+        revenue_facts.groupby('order_day', as_index=False)
+        .agg(order_count=('order_count', 'sum'), daily_revenue=('revenue', 'sum'))
+        .sort_values('order_day', ascending=False)
+        .head(days)
+    )
+    payment_revenue = (
+        revenue_facts.groupby('payment_method', as_index=False)
+        .agg(order_count=('order_count', 'sum'), total_revenue=('revenue', 'sum'))
+        .sort_values('total_revenue', ascending=False)
+    )
+    return {'daily_revenue': daily_revenue, 'payment_revenue': payment_revenue}
+
+def customer_reports(customer_facts, top=10):
+    """top_customers (by paid spend) and user_type_stats"""
+    buyers = customer_facts[customer_facts['order_count'] > 0]
+    top_customers = (
+        buyers.sort_values('total_spent', ascending=False)
+        .head(top)[['name', 'srn', 'user_type', 'order_count', 'total_spent']]
+        .reset_index(drop=True)
+    )
+    user_type_stats = (
+        customer_facts.groupby('user_type', as_index=False)
+        .agg(user_count=('user_id', 'nunique'), order_count=('order_count', 'sum'),
+             total_spent=('total_spent', 'sum'))
+    )
+    return {'top_customers': top_customers, 'user_type_stats': user_type_stats}
@@ -0,0 +1,269 @@
+"""
+Local analytics extract
+Keeps a copy of Orders, Order_Items and Users (plus the small Menu_Items and
+Categories tables) in a local SQLite file, so the Analytics page can run
+its aggregations there instead of on the transactional database.
+
+Tables, column names and the Popular_Items view mirror the live schema, so
+report SQL runs unchanged on either side. The extract is kept current from
+Change_Outbox: the last applied change_id is the watermark, and every row a
+change touches is re-read from the primary by key (or deleted locally if it
+is gone). A full reload happens on first use, or when the outbox was purged
+past the watermark.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+import os
+import sqlite3
+import threading
+import time
+from mysql.connector import Error
+import config
+import db_utils
+import lazy_imports
+
+pd = lazy_imports.lazy_import('pandas')
+
+# Extracted tables: key column and the columns copied
+TABLES = {
+    'Orders': ('order_id', ['order_id', 'user_id', 'order_date', 'total_amount', 'order_status',
+                            'payment_method', 'payment_status']),
+    'Order_Items': ('order_item_id', ['order_item_id', 'order_id', 'item_id', 'quantity', 'unit_price', 'subtotal']),
+    'Users': ('user_id', ['user_id', 'srn', 'name', 'user_type'])
+}
+
+# Reloaded in full on every refresh (a few dozen rows)
+DIMENSIONS = {
+    'Menu_Items': ('item_id', ['item_id', 'category_id', 'item_name', 'price']),
+    'Categories': ('category_id', ['category_id', 'category_name'])
+}
+
+LOCAL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS Orders (
+        order_id INTEGER PRIMARY KEY, user_id INTEGER, order_date TEXT, total_amount REAL,
+        order_status TEXT, payment_method TEXT, payment_status TEXT
+    );
+    CREATE TABLE IF NOT EXISTS Order_Items (
+        order_item_id INTEGER PRIMARY KEY, order_id INTEGER, item_id INTEGER,
+        quantity INTEGER, unit_price REAL, subtotal REAL
+    );
+    CREATE TABLE IF NOT EXISTS Users (
+        user_id INTEGER PRIMARY KEY, srn TEXT, name TEXT, user_type TEXT
+    );
+    CREATE TABLE IF NOT EXISTS Menu_Items (
+        item_id INTEGER PRIMARY KEY, category_id INTEGER, item_name TEXT, price REAL
+    );
+    CREATE TABLE IF NOT EXISTS Categories (
+        category_id INTEGER PRIMARY KEY, category_name TEXT
+    );
+    CREATE TABLE IF NOT EXISTS Extract_State (
+        name TEXT PRIMARY KEY, value TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_orders_user ON Orders(user_id);
+    CREATE INDEX IF NOT EXISTS idx_orderitems_order ON Order_Items(order_id);
+    CREATE INDEX IF NOT EXISTS idx_orderitems_item ON Order_Items(item_id);
+    CREATE VIEW IF NOT EXISTS Popular_Items AS
+    SELECT
+        mi.item_name,
+        c.category_name,
+        COUNT(oi.order_item_id) as order_count,
+        SUM(oi.quantity) as total_quantity_sold,
+        mi.price
+    FROM Menu_Items mi
+    JOIN Order_Items oi ON mi.item_id = oi.item_id
+    JOIN Categories c ON mi.category_id = c.category_id
+    GROUP BY mi.item_id, mi.item_name, c.category_name, mi.price
+    ORDER BY total_quantity_sold DESC;
+"""
+
+CONSUMER = 'analytics_store'
+
+# One refresh at a time per process; readers never wait for it
+_refresh_lock = threading.Lock()
+
+def _path():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), config.ANALYTICS_STORE_PATH)
+
+def _connect():
+    conn = sqlite3.connect(_path(), timeout=30, check_same_thread=False)
+    # WAL lets pages read the last committed extract while a refresh writes
+    conn.execute("PRAGMA journal_mode = WAL")
+    # MariaDB's HOUR(), so report SQL runs unchanged
+    conn.create_function('HOUR', 1, lambda value: int(value[11:13]) if value else None, deterministic=True)
+    return conn
+
+def _get_state(conn, name, default=None):
+    row = conn.execute("SELECT value FROM Extract_State WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else default
+
+def _set_state(conn, name, value):
+    conn.execute("INSERT OR REPLACE INTO Extract_State (name, value) VALUES (?, ?)", (name, str(value)))
+
+def _sqlite_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, Decimal):
+        return float(value)
+    # numpy scalars
+    return value.item() if hasattr(value, 'item') else value
+
+def _to_rows(frame, columns):
+    """DataFrame rows as tuples SQLite can store (dates as text, decimals as float)"""
+    return [tuple(_sqlite_value(value) for value in row) for row in frame[columns].itertuples(index=False, name=None)]
+
+def _read(query, params=None):
+    """Run a read on the live database, raising on errors.
+
+    (fetch_query returns an empty frame on errors, which would look like an
+    empty table and wipe the extract.)
+    """
+    # Always the primary, so rows are at least as new as the outbox watermark
+    with db_utils.get_db_connection(use_replica=False) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        frame = pd.DataFrame.from_records(cursor.fetchall(), columns=list(cursor.column_names), coerce_float=True)
+        cursor.close()
+    return frame
+
+def _replace_rows(conn, table, columns, frame):
+    placeholders = ", ".join("?" for _ in columns)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+        _to_rows(frame, columns)
+    )
+
+def _copy_table(conn, table, key, columns):
+    """Copy a whole table in key order, ANALYTICS_EXTRACT_CHUNK rows per query"""
+    conn.execute(f"DELETE FROM {table}")
+    after = 0
+    while True:
+        chunk = _read(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {key} > %s ORDER BY {key} LIMIT %s",
+            (after, config.ANALYTICS_EXTRACT_CHUNK)
+        )
+        if chunk.empty:
+            break
+        _replace_rows(conn, table, columns, chunk)
+        after = int(chunk[key].iloc[-1])
+        if len(chunk) < config.ANALYTICS_EXTRACT_CHUNK:
+            break
+
+def _oldest_change():
+    oldest = _read("SELECT MIN(change_id) as oldest, MAX(change_id) as newest FROM Change_Outbox")
+    return oldest['oldest'][0], oldest['newest'][0]
+
+def _full_load(conn):
+    """Reload every table; returns the watermark the copy is consistent from"""
+    _, newest = _oldest_change()
+    # Changes after this id are applied on the next refresh, re-reading rows by key
+    watermark = int(newest) if pd.notna(newest) else 0
+    for table, (key, columns) in {**TABLES, **DIMENSIONS}.items():
+        _copy_table(conn, table, key, columns)
+    return watermark
+
+def _apply_changes(conn, watermark):
+    """Apply outbox changes after watermark; returns (new watermark, changes applied)"""
+    applied = 0
+    for _ in range(config.ANALYTICS_MAX_BATCHES):
+        changes, position = db_utils.read_changes(CONSUMER, tables=list(TABLES), after=watermark)
+        # Late rows from re-checked gaps can arrive while position stays put
+        if not changes.empty:
+            for table, touched in changes.groupby('table_name')['row_id']:
+                key, columns = TABLES[table]
+                ids = sorted(set(int(row_id) for row_id in touched))
+                placeholders = ", ".join(["%s"] * len(ids))
+                current = _read(
+                    f"SELECT {', '.join(columns)} FROM {table} WHERE {key} IN ({placeholders})",
+                    ids
+                )
+                found = set(int(row_id) for row_id in current[key]) if not current.empty else set()
+                gone = [(row_id,) for row_id in ids if row_id not in found]
+                if gone:
+                    conn.executemany(f"DELETE FROM {table} WHERE {key} = ?", gone)
+                if found:
+                    _replace_rows(conn, table, columns, current)
+        applied += len(changes)
+        if position == watermark:
+            break
+        watermark = position
+    return watermark, applied
+
+def refresh(max_age=None):
+    """Bring the extract up to date if it is older than max_age seconds.
+
+    Returns the extract status (see get_status). If another session is
+    refreshing, or the live database can't be read, the current extract is
+    left as it is and a refresh error is reported in the status.
+    """
+    max_age = config.ANALYTICS_REFRESH_SECONDS if max_age is None else max_age
+    conn = _connect()
+    try:
+        conn.executescript(LOCAL_SCHEMA)
+        refreshed_at = float(_get_state(conn, 'refreshed_at', 0))
+        if time.time() - refreshed_at < max_age or not _refresh_lock.acquire(blocking=False):
+            return get_status(conn)
+        try:
+            started = time.perf_counter()
+            watermark = _get_state(conn, 'watermark')
+            oldest, _ = _oldest_change()
+            full = watermark is None or (pd.notna(oldest) and int(oldest) > int(watermark) + 1)
+
+            with conn:
+                if full:
+                    watermark, applied = _full_load(conn), 0
+                else:
+                    watermark, applied = _apply_changes(conn, int(watermark))
+                    for table, (key, columns) in DIMENSIONS.items():
+                        _copy_table(conn, table, key, columns)
+                _set_state(conn, 'watermark', watermark)
+                _set_state(conn, 'refreshed_at', time.time())
+                _set_state(conn, 'last_mode', 'full' if full else 'incremental')
+                _set_state(conn, 'last_applied', applied)
+                _set_state(conn, 'last_refresh_ms', int((time.perf_counter() - started) * 1000))
+                _set_state(conn, 'last_error', '')
+            # Stored: re-checked change gaps delivered above are settled
+            db_utils.acknowledge_changes(CONSUMER)
+        except (Error, db_utils.QueryLimitError) as e:
+            with conn:
+                _set_state(conn, 'last_error', str(e))
+        finally:
+            _refresh_lock.release()
+        return get_status(conn)
+    finally:
+        conn.close()
+
+def get_status(conn=None):
+    """Extract state: refreshed_at (datetime or None), watermark, last_mode,
+    last_applied, last_refresh_ms and last_error"""
+    own = conn is None
+    conn = conn or _connect()
+    try:
+        conn.executescript(LOCAL_SCHEMA)
+        refreshed_at = float(_get_state(conn, 'refreshed_at', 0))
+        return {
+            'refreshed_at': datetime.fromtimestamp(refreshed_at) if refreshed_at else None,
+            'watermark': int(_get_state(conn, 'watermark', 0)),
+            'last_mode': _get_state(conn, 'last_mode'),
+            'last_applied': int(_get_state(conn, 'last_applied', 0)),
+            'last_refresh_ms': int(_get_state(conn, 'last_refresh_ms', 0)),
+            'last_error': _get_state(conn, 'last_error') or None
+        }
+    finally:
+        if own:
+            conn.close()
+
+def fetch(query, params=None):
+    """Run a report query on the extract and return a DataFrame.
+
+    Takes the same SQL as db_utils.fetch_query (%s placeholders).
+    """
+    conn = _connect()
+    try:
+        cursor = conn.execute(query.replace('%s', '?'), params or ())
+        columns = [column[0] for column in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+    finally:
+        conn.close()
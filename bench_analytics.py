@@ -0,0 +1,156 @@
+"""
+Analytics page benchmark
+Times each Analytics tab both ways: the old one-query-per-chart reports
+against the single fact query per tab (analytics_facts) plus its pandas
+derivations, and prints the median time and query count of each.
+
+Runs on a MariaDB database (by default a fresh clone of the provisioning
+template, see provision_db.py) or, with --local, on the local analytics
+extract.
+
+Usage: python bench_analytics.py [--runs N] [--database NAME | --local]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from mysql.connector import Error
+import analytics_facts
+import analytics_store
+import config
+import lazy_imports
+import provision_db
+
+pd = lazy_imports.lazy_import('pandas')
+
+# The per-chart reports the Analytics page ran before the fact slices.
+# The KPIs and the Order Analytics tab now share one fetch, so they are
+# timed together.
+LEGACY = {
+    'KPIs + Order Analytics': [
+        "SELECT COALESCE(SUM(total_amount), 0) as revenue FROM Orders WHERE payment_status = 'completed'",
+        "SELECT COUNT(*) as count FROM Orders",
+        "SELECT COUNT(*) as count FROM Orders WHERE order_status = 'completed'",
+        "SELECT COALESCE(AVG(total_amount), 0) as avg_val FROM Orders WHERE payment_status = 'completed'",
+        "SELECT order_status, COUNT(*) as count FROM Orders GROUP BY order_status ORDER BY count DESC",
+        """SELECT payment_status, payment_method, COUNT(*) as count, SUM(total_amount) as total_amount
+           FROM Orders GROUP BY payment_status, payment_method ORDER BY total_amount DESC""",
+        "SELECT HOUR(order_date) as hour, COUNT(*) as order_count FROM Orders GROUP BY HOUR(order_date) ORDER BY hour"
+    ],
+    'Popular Items': [
+        "SELECT * FROM Popular_Items LIMIT 10",
+        """SELECT c.category_name, COUNT(DISTINCT oi.order_id) as order_count,
+                  SUM(oi.quantity) as total_quantity, SUM(oi.subtotal) as total_revenue
+           FROM Order_Items oi
+           JOIN Menu_Items mi ON oi.item_id = mi.item_id
+           JOIN Categories c ON mi.category_id = c.category_id
+           GROUP BY c.category_id, c.category_name
+           ORDER BY total_revenue DESC"""
+    ],
+    'Revenue Analysis': [
+        """SELECT DATE(order_date) as order_day, COUNT(*) as order_count, SUM(total_amount) as daily_revenue
+           FROM Orders WHERE payment_status = 'completed'
+           GROUP BY DATE(order_date) ORDER BY order_day DESC LIMIT 30""",
+        """SELECT payment_method, COUNT(*) as order_count, SUM(total_amount) as total_revenue
+           FROM Orders WHERE payment_status = 'completed'
+           GROUP BY payment_method ORDER BY total_revenue DESC"""
+    ],
+    'Customer Insights': [
+        """SELECT u.name, u.srn, u.user_type, COUNT(o.order_id) as order_count, SUM(o.total_amount) as total_spent
+           FROM Users u LEFT JOIN Orders o ON u.user_id = o.user_id
+           WHERE o.payment_status = 'completed'
+           GROUP BY u.user_id, u.name, u.srn, u.user_type
+           ORDER BY total_spent DESC LIMIT 10""",
+        """SELECT u.user_type, COUNT(DISTINCT u.user_id) as user_count, COUNT(o.order_id) as order_count,
+                  COALESCE(SUM(o.total_amount), 0) as total_spent
+           FROM Users u LEFT JOIN Orders o ON u.user_id = o.user_id AND o.payment_status = 'completed'
+           GROUP BY u.user_type"""
+    ]
+}
+
+# Fact query and derivation per tab
+FACTS = {
+    'KPIs + Order Analytics': (
+        analytics_facts.ORDER_FACTS,
+        lambda facts: (analytics_facts.kpis(facts), analytics_facts.order_reports(facts))
+    ),
+    'Popular Items': (analytics_facts.ITEM_FACTS, analytics_facts.item_reports),
+    'Revenue Analysis': (analytics_facts.REVENUE_FACTS, analytics_facts.revenue_reports),
+    'Customer Insights': (analytics_facts.CUSTOMER_FACTS, analytics_facts.customer_reports)
+}
+
+def mariadb_fetcher(conn):
+    def fetch(query):
+        cursor = conn.cursor()
+        cursor.execute(query)
+        frame = pd.DataFrame.from_records(cursor.fetchall(), columns=list(cursor.column_names), coerce_float=True)
+        cursor.close()
+        return frame
+    return fetch
+
+def _median_ms(work, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        work()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def run_benchmark(fetch, runs):
+    """Return [(tab, legacy_ms, legacy_queries, facts_ms)] using fetch(query) -> DataFrame"""
+    results = []
+    for tab, queries in LEGACY.items():
+        query, derive = FACTS[tab]
+        legacy_ms = _median_ms(lambda: [fetch(q) for q in queries], runs)
+        facts_ms = _median_ms(lambda: derive(fetch(query)), runs)
+        results.append((tab, legacy_ms, len(queries), facts_ms))
+    return results
+
+def print_results(results):
+    print(f"{'tab':<24} {'per chart':>16} {'one fetch':>12} {'speedup':>8}")
+    for tab, legacy_ms, queries, facts_ms in results:
+        speedup = legacy_ms / facts_ms if facts_ms else float('inf')
+        print(f"{tab:<24} {legacy_ms:8.1f} ms ({queries}q) {facts_ms:9.1f} ms {speedup:7.1f}x")
+    legacy_total = sum(r[1] for r in results)
+    facts_total = sum(r[3] for r in results)
+    print(f"{'total':<24} {legacy_total:8.1f} ms ({sum(r[2] for r in results)}q) "
+          f"{facts_total:9.1f} ms ({len(results)}q)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Analytics page queries")
+    parser.add_argument('--runs', type=int, default=5)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--database', help="existing database to run on (default: a clone of the template)")
+    target.add_argument('--local', action='store_true', help="run on the local analytics extract")
+    args = parser.parse_args()
+
+    try:
+        if args.local:
+            analytics_store.refresh(max_age=0)
+            print_results(run_benchmark(analytics_store.fetch, args.runs))
+            return 0
+
+        if args.database:
+            conn = provision_db._connect(args.database)
+            try:
+                print_results(run_benchmark(mariadb_fetcher(conn), args.runs))
+            finally:
+                conn.close()
+            return 0
+
+        provision_db.prepare()
+        with provision_db.cloned_database() as name:
+            conn = provision_db._connect(name)
+            try:
+                print(f"Database {name}: cloned from {config.PROVISION_TEMPLATE_DB}")
+                print_results(run_benchmark(mariadb_fetcher(conn), args.runs))
+            finally:
+                conn.close()
+    except (Error, RuntimeError) as e:
+        print(f"FAIL: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Bulk delete engine
+Deletes the rows matching a cleanup job's predicate by primary key, in
+chunks of BULK_DELETE_CHUNK_SIZE, pausing between chunks for longer when
+replicas lag or other sessions wait on row locks. Each chunk commits
+together with its checkpoint in Bulk_Delete_Jobs, so an interrupted job
+resumes after the last deleted key.
+"""
+
+import threading
+import time
+from mysql.connector import Error
+import streamlit as st
+import config
+import db_utils
+
+# Cleanup jobs offered on the Delete page; where is re-checked on every chunk.
+# children: (table, column) rows deleted first, in the same transaction;
+# cascaded deletes don't fire triggers (Item_Stats, Change_Outbox).
+# archived: added to where once the archive tables of
+# queries/partition_orders.sql exist.
+JOBS = {
+    'cancelled_orders': {
+        'label': 'Cancelled orders',
+        'table': 'Orders',
+        'key': 'order_id',
+        'where': "order_status = 'cancelled'",
+        'children': [('Order_Items', 'order_id')]
+    },
+    'users_without_orders': {
+        'label': 'Users with no orders and an empty wallet',
+        'table': 'Users',
+        'key': 'user_id',
+        'where': "wallet_balance = 0 AND NOT EXISTS (SELECT 1 FROM Orders o WHERE o.user_id = Users.user_id)",
+        'archived': "NOT EXISTS (SELECT 1 FROM Orders_Archive oa WHERE oa.user_id = Users.user_id)"
+    },
+    'unordered_unavailable_items': {
+        'label': 'Unavailable menu items that were never ordered',
+        'table': 'Menu_Items',
+        'key': 'item_id',
+        'where': "is_available = FALSE AND NOT EXISTS (SELECT 1 FROM Order_Items oi WHERE oi.item_id = Menu_Items.item_id)",
+        'archived': "NOT EXISTS (SELECT 1 FROM Order_Items_Archive oia WHERE oia.item_id = Menu_Items.item_id)"
+    }
+}
+
+# Jobs running in this process, so two sessions don't run the same one
+_running = set()
+_running_lock = threading.Lock()
+
+def _has_archive():
+    """True once the order archive tables exist"""
+    found = db_utils.fetch_query("""
+        SELECT 1 as found FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'Orders_Archive'
+    """, (config.DB_NAME,), use_replica=False)
+    return not found.empty
+
+def _resolve(job_name):
+    """The job with its archive check folded into where when it applies"""
+    job = JOBS[job_name]
+    if job.get('archived') and _has_archive():
+        job = {**job, 'where': f"{job['where']} AND {job['archived']}"}
+    return job
+
+def get_job_state(job_name):
+    """Saved progress of a job as a dict, or None if it never ran"""
+    state = db_utils.fetch_query(
+        "SELECT * FROM Bulk_Delete_Jobs WHERE job_name = %s", (job_name,), use_replica=False
+    )
+    if state.empty:
+        return None
+    state = state.iloc[0].to_dict()
+    state['active'] = job_name in _running
+    return state
+
+def count_remaining(job_name):
+    """Rows the job would still delete"""
+    job = _resolve(job_name)
+    count = db_utils.fetch_query(
+        f"SELECT COUNT(*) as count FROM {job['table']} WHERE {job['where']}", use_replica=False
+    )
+    return int(count['count'][0]) if not count.empty else 0
+
+def start_job(job_name):
+    """Reset a job's checkpoint so the next run starts from the first key"""
+    return db_utils.execute_query("""
+        INSERT INTO Bulk_Delete_Jobs (job_name, last_key, deleted_rows, total_rows, status, started_at)
+        VALUES (%s, 0, 0, %s, 'running', NOW())
+        ON DUPLICATE KEY UPDATE last_key = 0, deleted_rows = 0, total_rows = VALUES(total_rows),
+                                status = 'running', started_at = NOW()
+    """, (job_name, count_remaining(job_name)))
+
+def _next_sleep(sleep, chunk_seconds, lock_waits, lag):
+    """Back off (double) under lock waits or replica lag, otherwise ease back down"""
+    if lock_waits or (lag is not None and lag > config.BULK_DELETE_MAX_LAG_SECONDS):
+        sleep *= 2
+    else:
+        sleep /= 2
+    sleep = max(sleep, chunk_seconds * config.BULK_DELETE_SLEEP_RATIO, config.BULK_DELETE_MIN_SLEEP)
+    return min(sleep, config.BULK_DELETE_MAX_SLEEP)
+
+def _delete_chunk(job_name, job, after, chunk_size):
+    """Delete the next chunk after key `after`, checkpointing in the same transaction.
+
+    Returns (rows deleted, last key, row lock waits), or (0, after, 0) once
+    no matching keys are left, which also marks the job done.
+    """
+    with db_utils.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT {job['key']} FROM {job['table']} WHERE {job['key']} > %s AND {job['where']} "
+            f"ORDER BY {job['key']} LIMIT %s",
+            (after, chunk_size)
+        )
+        keys = [row[0] for row in cursor.fetchall()]
+        if not keys:
+            cursor.execute("UPDATE Bulk_Delete_Jobs SET status = 'done' WHERE job_name = %s", (job_name,))
+            conn.commit()
+            cursor.close()
+            return 0, after, 0
+
+        # The predicate is checked again so rows changed since the SELECT are kept
+        placeholders = ", ".join(["%s"] * len(keys))
+        for child, column in job.get('children', ()):
+            cursor.execute(
+                f"DELETE FROM {child} WHERE {column} IN ("
+                f"SELECT {job['key']} FROM {job['table']} WHERE {job['key']} IN ({placeholders}) AND {job['where']})",
+                keys
+            )
+        cursor.execute(
+            f"DELETE FROM {job['table']} WHERE {job['key']} IN ({placeholders}) AND {job['where']}",
+            keys
+        )
+        deleted = cursor.rowcount
+        cursor.execute("""
+            UPDATE Bulk_Delete_Jobs
+            SET last_key = %s, deleted_rows = deleted_rows + %s
+            WHERE job_name = %s
+        """, (keys[-1], deleted, job_name))
+        conn.commit()
+
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Innodb_row_lock_current_waits'")
+        row = cursor.fetchone()
+        cursor.close()
+    return deleted, keys[-1], int(row[1]) if row else 0
+
+def run_job(job_name, progress=None, chunk_size=None):
+    """Run a job, resuming from its checkpoint if it was interrupted.
+
+    progress(state) is called after every chunk with deleted_rows,
+    total_rows, last_key, pause and lock_waits. Returns the number of rows
+    deleted by this run, or None if the job is already running here or a
+    chunk failed (the job can then be resumed).
+    """
+    job = _resolve(job_name)
+    chunk_size = chunk_size or config.BULK_DELETE_CHUNK_SIZE
+
+    with _running_lock:
+        if job_name in _running:
+            st.warning(f"{job['label']}: this cleanup is already running")
+            return None
+        _running.add(job_name)
+
+    try:
+        state = get_job_state(job_name)
+        if state is None or state['status'] == 'done':
+            if not start_job(job_name):
+                return None
+            state = get_job_state(job_name)
+
+        after = int(state['last_key'])
+        deleted_rows = int(state['deleted_rows'])
+        total_rows = int(state['total_rows'])
+        deleted_now = 0
+        pause = config.BULK_DELETE_MIN_SLEEP
+
+        while True:
+            chunk_started = time.time()
+            try:
+                deleted, last_key, lock_waits = _delete_chunk(job_name, job, after, chunk_size)
+            except (Error, db_utils.QueryLimitError) as e:
+                st.error(f"Bulk delete stopped after key {after} (resume to continue): {e}")
+                return None
+            if last_key == after:
+                return deleted_now
+            after = last_key
+
+            deleted_rows += deleted
+            deleted_now += deleted
+            pause = _next_sleep(pause, time.time() - chunk_started, lock_waits, db_utils.get_max_replica_lag())
+            if progress:
+                progress({
+                    'deleted_rows': deleted_rows,
+                    'total_rows': max(total_rows, deleted_rows),
+                    'last_key': after,
+                    'pause': pause,
+                    'lock_waits': lock_waits
+                })
+            time.sleep(pause)
+    finally:
+        with _running_lock:
+            _running.discard(job_name)
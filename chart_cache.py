@@ -0,0 +1,120 @@
+"""
+Plotly figure cache
+Charts are rebuilt and serialized on every rerun even when their data
+hasn't changed. figure() keys each chart on a fingerprint of its DataFrame
+plus the chart spec and hands back the JSON serialized last time, and
+plotly_chart() sends that JSON to the browser as is, so tab switches and
+widget toggles skip plotly express and the serializer entirely.
+
+The cache is shared by all sessions of the same database user (the role
+decides which rows a chart is built from) and bounded by
+config.CHART_CACHE_MAX_FIGURES and config.CHART_CACHE_MAX_MB (serialized
+size), least recently used first.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+import streamlit as st
+from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+import config
+import db_utils
+import lazy_imports
+
+pd = lazy_imports.lazy_import('pandas')
+px = lazy_imports.lazy_import('plotly.express')
+
+# (db user, builder, data fingerprint, spec) -> (figure JSON, bytes, build + serialize seconds)
+_figures = OrderedDict()
+_cache_bytes = 0
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'saved_seconds': 0.0}
+_cache_lock = threading.Lock()
+
+def fingerprint(frame):
+    """Fast content hash of a DataFrame: values, index, column names and dtypes"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(zip(frame.columns, map(str, frame.dtypes)))).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=True).values.tobytes())
+    return digest.hexdigest()
+
+def _builder_name(build):
+    if isinstance(build, str):
+        return f"px.{build}"
+    return f"{build.__module__}.{build.__qualname__}"
+
+def figure(build, frame, layout=None, **spec):
+    """Return build(frame, **spec) with layout applied, serialized to JSON, from the cache when possible.
+
+    build is a plotly express function name ('bar', 'pie', ...) or a callable
+    taking the DataFrame and spec keyword arguments. spec and layout must be
+    JSON-serializable (anything else is keyed by its str()). Show the result
+    with plotly_chart().
+    """
+    username, _ = db_utils.get_current_db_user()
+    key = (
+        username,
+        _builder_name(build),
+        fingerprint(frame),
+        json.dumps({'spec': spec, 'layout': layout}, sort_keys=True, default=str)
+    )
+
+    with _cache_lock:
+        entry = _figures.get(key)
+        if entry is not None:
+            _figures.move_to_end(key)
+            _stats['hits'] += 1
+            _stats['saved_seconds'] += entry[2]
+            return entry[0]
+
+    started = time.perf_counter()
+    builder = getattr(px, build) if isinstance(build, str) else build
+    fig = builder(frame, **spec)
+    if layout:
+        fig.update_layout(**layout)
+    figure_json = fig.to_json()
+    elapsed = time.perf_counter() - started
+    _store(key, (figure_json, len(figure_json.encode()), elapsed))
+    return figure_json
+
+def plotly_chart(figure_json, use_container_width=False):
+    """Show a figure() result, like st.plotly_chart with the default theme.
+
+    st.plotly_chart would validate the figure again and re-serialize it on
+    every rerun; this enqueues the same element (streamlit 1.28) with the
+    cached JSON, in whichever container is active.
+    """
+    proto = PlotlyChartProto()
+    proto.use_container_width = use_container_width
+    proto.figure.spec = figure_json
+    proto.figure.config = json.dumps({'showLink': False, 'linkText': False})
+    proto.theme = "streamlit"
+    return st._main._enqueue("plotly_chart", proto)
+
+def _store(key, entry):
+    global _cache_bytes
+    max_bytes = config.CHART_CACHE_MAX_MB * 1024 * 1024
+    with _cache_lock:
+        _stats['misses'] += 1
+        old = _figures.pop(key, None)
+        if old is not None:
+            _cache_bytes -= old[1]
+        _figures[key] = entry
+        _cache_bytes += entry[1]
+        while _figures and (len(_figures) > config.CHART_CACHE_MAX_FIGURES or _cache_bytes > max_bytes):
+            _, evicted = _figures.popitem(last=False)
+            _cache_bytes -= evicted[1]
+            _stats['evictions'] += 1
+
+def get_stats():
+    """Figure cache hits, misses, evictions, build time saved, size and entry count"""
+    with _cache_lock:
+        return {**_stats, 'figures': len(_figures), 'bytes': _cache_bytes}
+
+def clear():
+    """Drop every cached figure"""
+    global _cache_bytes
+    with _cache_lock:
+        _figures.clear()
+        _cache_bytes = 0
@@ -0,0 +1,76 @@
+"""
+Import-time budget check
+Runs `python -X importtime` over the app's own modules and fails if they take
+longer than config.IMPORT_TIME_BUDGET_MS or pull in plotly at import time.
+
+Usage: python check_import_time.py [budget_ms]
+"""
+
+import os
+import re
+import subprocess
+import sys
+import config
+
+APP_MODULES = ['config', 'lazy_imports', 'db_utils', 'access_control', 'kitchen_scheduler', 'demand_forecast', 'order_archive', 'bulk_delete', 'table_maintenance', 'sql_script', 'analytics_store', 'analytics_facts', 'chart_cache', 'page_sections']
+
+# "import time:  self [us] | cumulative | <indent>package"
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)$')
+
+# Modules that must only be loaded lazily
+LAZY_ONLY = ('plotly',)
+
+def measure_import_times(modules=APP_MODULES):
+    """Return ({module: cumulative_ms}, [lazy-only modules imported]) for a fresh interpreter.
+
+    streamlit is imported first so its own cost (paid by every page anyway)
+    is not charged to the app modules.
+    """
+    code = "try:\n    import streamlit\nexcept ImportError:\n    pass\n"
+    code += "\n".join(f"import {name}" for name in modules)
+
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    times = {}
+    eager = set()
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        # A single space of indent marks a top-level import from the -c script
+        if len(indent) == 1 and name in modules:
+            times[name] = cumulative_us / 1000
+        if name.split('.')[0] in LAZY_ONLY:
+            eager.add(name.split('.')[0])
+    return times, sorted(eager)
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else config.IMPORT_TIME_BUDGET_MS
+    times, eager = measure_import_times()
+
+    for name, ms in sorted(times.items(), key=lambda item: -item[1]):
+        print(f"{name:<20} {ms:8.1f} ms")
+    total = sum(times.values())
+    print(f"{'total':<20} {total:8.1f} ms (budget {budget:.0f} ms)")
+
+    ok = True
+    if total > budget:
+        print("FAIL: app modules exceed the import-time budget")
+        ok = False
+    if eager:
+        print(f"FAIL: imported at module load, should be lazy: {', '.join(eager)}")
+        ok = False
+    if ok:
+        print("OK")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
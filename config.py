@@ -47,33 +47,185 @@ DB_USERS = {
 }
 
 # Role-based page access control
+# max_statement_time: seconds before the server cancels a query (MariaDB max_statement_time)
+# max_concurrent_queries: queries the role may run at once across all sessions
+#   (kept low for readonly so reporting cannot starve the staff/cashier role)
+# max_rows: rows a single SELECT may return
 ROLE_PERMISSIONS = {
     'canteen_admin': {
         'pages': ['Users', 'Menu', 'Orders', 'Analytics', 'Admin', 'Delete'],
         'can_create': True,
         'can_update': True,
         'can_delete': True,
-        'can_view_all': True
+        'can_view_all': True,
+        'max_statement_time': 60,
+        'max_concurrent_queries': 5,
+        'max_rows': 100000
     },
     'canteen_manager': {
         'pages': ['Users', 'Menu', 'Orders', 'Analytics'],
         'can_create': True,
         'can_update': True,
         'can_delete': True,
-        'can_view_all': True
+        'can_view_all': True,
+        'max_statement_time': 30,
+        'max_concurrent_queries': 5,
+        'max_rows': 50000
     },
     'canteen_staff': {
         'pages': ['Users', 'Orders', 'Analytics'],
         'can_create': True,
         'can_update': True,
         'can_delete': False,
-        'can_view_all': False
+        'can_view_all': False,
+        'max_statement_time': 10,
+        'max_concurrent_queries': 20,
+        'max_rows': 5000
     },
     'canteen_readonly': {
         'pages': ['Analytics'],
         'can_create': False,
         'can_update': False,
         'can_delete': False,
-        'can_view_all': True
+        'can_view_all': True,
+        'max_statement_time': 15,
+        'max_concurrent_queries': 2,
+        'max_rows': 20000
     }
-}
\ No newline at end of file
+}
+
+# Read replicas ("host" or "host:port"). Leave empty to send every query to DB_HOST.
+# For local testing start a second MariaDB replicating from the first, e.g. ["127.0.0.1:3307"]
+DB_REPLICA_HOSTS = []
+
+# Replicas lagging more than this (Seconds_Behind_Master) are skipped
+REPLICA_MAX_LAG_SECONDS = 5
+
+# How often (seconds) a replica's health and lag are re-checked
+REPLICA_HEALTH_CHECK_INTERVAL = 15
+
+# User used to run SHOW SLAVE STATUS on replicas (needs SLAVE MONITOR / REPLICATION CLIENT)
+REPLICA_MONITOR_USER = 'canteen_admin'
+
+# After a write, the session reads from the primary for this many seconds
+READ_YOUR_WRITES_WINDOW = 10
+
+# Roles whose reads always go to replicas
+REPLICA_READ_ROLES = ['canteen_readonly']
+
+# Concurrent queries allowed per browser session, whatever the role
+MAX_CONCURRENT_QUERIES_PER_SESSION = 2
+
+# Seconds to wait for a free query slot before giving up
+QUERY_SLOT_WAIT_SECONDS = 5
+
+# Pooled connections kept per (host, user)
+DB_POOL_SIZE = 10
+
+# Server-side prepared statements cached per pooled connection (LRU)
+PREPARED_STATEMENT_CACHE_SIZE = 32
+
+# Plotly figures cached as JSON per database user (chart_cache.py), least recently used evicted first
+CHART_CACHE_MAX_FIGURES = 200
+CHART_CACHE_MAX_MB = 64
+
+# How long (seconds) a page section reuses its query results within a session (page_sections.py)
+SECTION_CACHE_SECONDS = 60
+
+# Import-time budget (milliseconds) checked by check_import_time.py
+IMPORT_TIME_BUDGET_MS = 1500
+
+# How long (seconds) a verified login is trusted before re-checking; 0 = whole session
+CREDENTIAL_CACHE_TTL_SECONDS = 900
+
+# Row filters pushed into SQL for roles without can_view_all (see
+# access_control.get_filtered_query_based_on_role). Keys are tables/views,
+# values are predicates using {alias}; keep them sargable so they hit an index.
+ROLE_ROW_FILTERS = {
+    'canteen_staff': {
+        # Staff work the current day's orders only (idx_orders_date / idx_orders_status_date)
+        'Orders': "{alias}.order_date >= CURDATE()",
+        'Order_Summary': "{alias}.order_date >= CURDATE()"
+    }
+}
+
+# Parallel kitchen stations modelled by the ETA scheduler (kitchen_scheduler.py)
+KITCHEN_STATIONS = 3
+
+# How often (seconds) the in-memory kitchen schedule is rebuilt from the database
+KITCHEN_SCHEDULE_RESYNC_SECONDS = 300
+
+# Demand forecasting (demand_forecast.py): days of order history used, how
+# often (seconds) the model is rebuilt, and the safety factor on daily demand
+# (1.65 standard deviations ~ 95% of days covered) for recommended stock
+FORECAST_HISTORY_DAYS = 365
+FORECAST_REFRESH_SECONDS = 900
+FORECAST_SAFETY_FACTOR = 1.65
+
+# Change data capture (Change_Outbox): rows read per consumer batch, hours
+# changes are kept, and how long (seconds) a gap in change_id is treated as
+# a transaction still in flight rather than a rolled-back insert
+CDC_BATCH_SIZE = 500
+CDC_RETENTION_HOURS = 72
+CDC_GAP_GRACE_SECONDS = 5
+
+# Batched cleanup deletes: rows removed per transaction
+DELETE_BATCH_SIZE = 500
+
+# Order archival (order_archive.py): completed/cancelled orders older than
+# this many whole months move to the archive tables, ARCHIVE_CHUNK_SIZE
+# orders per transaction; monthly partitions are kept this many months ahead
+ARCHIVE_AFTER_MONTHS = 6
+ARCHIVE_CHUNK_SIZE = 500
+PARTITION_MONTHS_AHEAD = 3
+
+# Bulk delete engine (bulk_delete.py): rows per chunk, pause bounds
+# (seconds) between chunks, the pause as a share of the last chunk's run
+# time, and the replica lag (seconds) above which it backs off
+BULK_DELETE_CHUNK_SIZE = 200
+BULK_DELETE_MIN_SLEEP = 0.05
+BULK_DELETE_MAX_SLEEP = 5.0
+BULK_DELETE_SLEEP_RATIO = 0.5
+BULK_DELETE_MAX_LAG_SECONDS = 2
+
+# Table maintenance (table_maintenance.py): off-peak window in local hours
+# (may wrap past midnight), how often (seconds) the scheduler checks, when a
+# table is rebuilt (free space in MB and as a share of its size), how old
+# statistics may get before ANALYZE, and how long (seconds) DDL waits for a
+# metadata lock before giving up
+MAINTENANCE_WINDOW_START_HOUR = 23
+MAINTENANCE_WINDOW_END_HOUR = 5
+MAINTENANCE_CHECK_SECONDS = 900
+MAINTENANCE_MIN_FREE_MB = 16
+MAINTENANCE_FRAGMENTATION_RATIO = 0.2
+MAINTENANCE_ANALYZE_AFTER_HOURS = 24
+MAINTENANCE_LOCK_WAIT_SECONDS = 5
+
+# Schema migrations (migrate.py): directory of NNNN_name.sql files, the user
+# they run as, whether ALTER TABLE / CREATE INDEX / DROP INDEX get
+# ALGORITHM=INPLACE, LOCK=NONE when they name neither, and the copy speed
+# (MB per second) used for dry-run time estimates
+MIGRATIONS_DIR = 'migrations'
+MIGRATION_USER = 'canteen_admin'
+MIGRATION_ONLINE_DDL = True
+MIGRATION_COPY_MB_PER_SECOND = 50
+
+# Test/benchmark provisioning (provision_db.py): template database cloned
+# for each run, where its snapshots are kept, and how much data is generated
+# into it (users, orders, spread over this many days)
+PROVISION_TEMPLATE_DB = 'canteen_template'
+PROVISION_SNAPSHOT_DIR = 'snapshots'
+PROVISION_USERS = 2000
+PROVISION_ORDERS = 50000
+PROVISION_DAYS = 365
+
+# Local analytics extract (analytics_store.py): SQLite file (relative to the
+# app directory), whether the Analytics page reads from it by default, how
+# stale (seconds) it may get before a page load refreshes it, rows per query
+# when copying a table (keep under the smallest role max_rows), and outbox
+# batches applied per refresh
+ANALYTICS_STORE_PATH = 'analytics_extract.sqlite3'
+ANALYTICS_USE_LOCAL_STORE = True
+ANALYTICS_REFRESH_SECONDS = 60
+ANALYTICS_EXTRACT_CHUNK = 5000
+ANALYTICS_MAX_BATCHES = 20
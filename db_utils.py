@@ -1,9 +1,69 @@
 import mysql.connector
 from mysql.connector import Error
-import pandas as pd
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
 import streamlit as st
+from collections import OrderedDict, namedtuple
 from contextlib import contextmanager
+import hashlib
+import json
+import re
+import threading
+import time
+from types import MappingProxyType
 import config
+import lazy_imports
+import sql_script
+
+# pandas is only imported when the first DataFrame is built
+pd = lazy_imports.lazy_import('pandas')
+
+# Replica health cache shared by all sessions: (host, port) -> {'lag', 'checked_at'}
+_replica_health = {}
+_replica_lock = threading.Lock()
+
+# MariaDB error raised when max_statement_time cancels a query
+ER_STATEMENT_TIMEOUT = 1969
+
+# Server error for a prepared statement id the session doesn't know
+ER_UNKNOWN_STMT_HANDLER = 1243
+
+# Per-role concurrent query slots shared by all sessions, and limit hit counters
+_role_slots = {}
+_limit_events = {}
+_slot_lock = threading.Lock()
+
+
+# Connection pools keyed by (host, port, user, password). Pools are opened
+# outside _pool_lock (that takes every connection's connect and auth), under
+# a lock per key so each is opened once.
+_pools = {}
+_pool_lock = threading.Lock()
+_pool_open_locks = {}
+
+# Outcome of the last pool checkout: (host, port, user) -> {'ok', 'error', 'checked_at'}
+_pool_health = {}
+
+# Prepared statement cache counters across all pooled connections
+_stmt_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'saved_seconds': 0.0}
+_stmt_lock = threading.Lock()
+
+# Change_Outbox id ranges read_changes skipped as rolled back, per consumer:
+# consumer -> {(first_id, last_id): skipped_at}. Once due, a range is looked
+# up on every read until the consumer acknowledges the batch (rows found per
+# range in _cdc_rechecked), then counted as recovered or lost.
+_cdc_gaps = {}
+_cdc_rechecked = {}
+_cdc_gap_stats = {'skipped': 0, 'recovered': 0, 'lost': 0}
+_cdc_lock = threading.Lock()
+
+
+# Set once the per-process warm-up has been started
+_warm_up_started = False
+
+
+class QueryLimitError(Exception):
+    """Raised when a query cannot run within the role's query budget"""
 
 def get_current_db_user():
     """Get the currently logged-in database user from session state"""
@@ -19,14 +79,47 @@ def set_db_user(username, password):
     """Set the database user for the session"""
     st.session_state.db_user = username
     st.session_state.db_password = password
+    st.session_state.pop('capabilities', None)
+    # Section results were loaded with the previous user's privileges (page_sections.py)
+    st.session_state.pop('_section_results', None)
+
+
+def _credential_token(username, password):
+    """Hash credentials so verified sessions are keyed without storing the password twice"""
+    return hashlib.sha256(f"{username}\0{password}".encode()).hexdigest()
 
+def _remember_verification(username, password, version, current_user):
+    """Cache a successful verification (server version and CURRENT_USER) in the session"""
+    cache = st.session_state.setdefault('verified_credentials', {})
+    cache[_credential_token(username, password)] = {
+        'user': username,
+        'version': version,
+        'current_user': current_user,
+        'verified_at': time.time()
+    }
+
+def get_verified_session(username, password):
+    """Get the cached verification for these credentials, or None if missing or expired"""
+    cache = st.session_state.get('verified_credentials', {})
+    info = cache.get(_credential_token(username, password))
+    if info is None:
+        return None
+    ttl = config.CREDENTIAL_CACHE_TTL_SECONDS
+    if ttl and time.time() - info['verified_at'] > ttl:
+        del cache[_credential_token(username, password)]
+        return None
+    return info
 
 def verify_db_credentials(username, password, timeout=5):
     """Attempt to connect to the DB using the provided credentials.
 
     Returns (True, message) on success, (False, error_message) on failure.
-    This does not modify session state.
+    Successful verifications are cached for the session (see
+    get_verified_session) so repeated checks skip the connection, but the
+    active user is not changed.
     """
+    if get_verified_session(username, password):
+        return True, f"Credentials valid for {username}"
     try:
         conn = mysql.connector.connect(
             host=config.DB_HOST,
@@ -37,74 +130,550 @@ def verify_db_credentials(username, password, timeout=5):
             connection_timeout=timeout
         )
         if conn and conn.is_connected():
+            cursor = conn.cursor()
+            cursor.execute("SELECT VERSION(), CURRENT_USER()")
+            version, current_user = cursor.fetchone()
+            cursor.close()
             conn.close()
+            _remember_verification(username, password, version, current_user)
             return True, f"Credentials valid for {username}"
         return False, "Unable to establish connection"
     except Error as e:
         # Provide clearer feedback for common auth errors
         return False, str(e)
 
+# Permission bits of the compiled role matrix
+PERMISSION_BITS = MappingProxyType({
+    'can_create': 1,
+    'can_update': 2,
+    'can_delete': 4,
+    'can_view_all': 8
+})
+
+# Permissions backed by a table privilege, checked against SHOW GRANTS
+_GRANT_PRIVILEGES = {'can_create': 'INSERT', 'can_update': 'UPDATE', 'can_delete': 'DELETE'}
+
+# "GRANT <privileges> ON <db>.<table> TO ..."
+_GRANT_LINE = re.compile(r'^GRANT\s+(.+?)\s+ON\s+(?:TABLE\s+|PROCEDURE\s+|FUNCTION\s+)?(\S+)\s+TO\s', re.IGNORECASE)
+
+
+class Capabilities(namedtuple('Capabilities', ['user', 'is_admin', 'permissions', 'pages', 'role', 'grants_verified'])):
+    """Immutable permission set of one database user.
+
+    permissions is a bitmask of PERMISSION_BITS and pages a frozenset, so
+    checks are a bit test or set lookup. role is a read-only view of the
+    user's config.ROLE_PERMISSIONS entry (query limits etc.).
+    """
+    __slots__ = ()
+
+    def has(self, permission_type):
+        return bool(self.permissions & PERMISSION_BITS.get(permission_type, 0))
+
+    def can_access(self, page_name):
+        return self.is_admin or page_name in self.pages
+
+
+def _compile_role_matrix(role_permissions):
+    """Compile ROLE_PERMISSIONS into {user: Capabilities}, done once at import"""
+    matrix = {}
+    for user, role in role_permissions.items():
+        permissions = 0
+        for name, bit in PERMISSION_BITS.items():
+            if role.get(name, False):
+                permissions |= bit
+        matrix[user] = Capabilities(
+            user=user,
+            is_admin=user == 'canteen_admin',
+            permissions=permissions,
+            pages=frozenset(role.get('pages', [])),
+            role=MappingProxyType(dict(role, pages=tuple(role.get('pages', [])))),
+            grants_verified=False
+        )
+    return MappingProxyType(matrix)
+
+ROLE_MATRIX = _compile_role_matrix(config.ROLE_PERMISSIONS)
+_NO_CAPABILITIES = Capabilities(None, False, 0, frozenset(), MappingProxyType({}), False)
+
+def _matrix_entry(username):
+    # Map legacy 'admin' literal to canteen_admin for role lookup
+    if username == 'admin':
+        username = 'canteen_admin'
+    return ROLE_MATRIX.get(username, _NO_CAPABILITIES)
+
+def _granted_permission_bits(grant_lines):
+    """Permission bits backed by the privileges in SHOW GRANTS output for this database"""
+    granted = set()
+    for line in grant_lines:
+        match = _GRANT_LINE.match(line)
+        if not match:
+            continue
+        database = match.group(2).replace('`', '').split('.')[0]
+        if database not in ('*', config.DB_NAME):
+            continue
+        privileges = {p.strip().split('(')[0].strip().upper() for p in match.group(1).split(',')}
+        if 'ALL' in privileges or 'ALL PRIVILEGES' in privileges:
+            return sum(PERMISSION_BITS.values())
+        granted |= privileges
+
+    bits = PERMISSION_BITS['can_view_all']  # row visibility is an app rule, not a grant
+    for name, privilege in _GRANT_PRIVILEGES.items():
+        if privilege in granted:
+            bits |= PERMISSION_BITS[name]
+    return bits
+
+def _verify_grants(capabilities):
+    """Narrow config capabilities to what SHOW GRANTS actually allows.
+
+    Config can only lose permissions here, never gain them. If the grants
+    cannot be read the config capabilities are kept unverified.
+    """
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SHOW GRANTS")
+            grant_lines = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+    except (Error, QueryLimitError):
+        return capabilities
+    return capabilities._replace(
+        permissions=capabilities.permissions & _granted_permission_bits(grant_lines),
+        grants_verified=True
+    )
+
+def get_capabilities():
+    """Get the current user's Capabilities, cached for the session.
+
+    SHOW GRANTS is checked once per session and user; switching users
+    (set_db_user) drops the cached object.
+    """
+    username, _ = get_current_db_user()
+    cached = st.session_state.get('capabilities')
+    if cached is not None and cached.user == username:
+        return cached
+
+    capabilities = _matrix_entry(username)._replace(user=username)
+    if capabilities.permissions:
+        capabilities = _verify_grants(capabilities)
+    st.session_state.capabilities = capabilities
+    return capabilities
+
 def get_user_role():
     """Get the role of the current database user"""
     username, _ = get_current_db_user()
-    
-    # Map legacy 'admin' literal to canteen_admin for role lookup
-    if username in ('admin', 'canteen_admin'):
-        return config.ROLE_PERMISSIONS.get('canteen_admin', {})
-    
-    return config.ROLE_PERMISSIONS.get(username, {})
+    return _matrix_entry(username).role
 
 def check_permission(permission_type):
     """Check if current user has a specific permission"""
-    role = get_user_role()
-    return role.get(permission_type, False)
+    return get_capabilities().has(permission_type)
 
 def get_allowed_pages():
     """Get list of pages the current user can access"""
-    role = get_user_role()
-    return role.get('pages', [])
+    return list(get_capabilities().role.get('pages', ()))
 
-@contextmanager
-def get_db_connection():
-    """Get database connection with current user credentials"""
-    conn = None
+def _parse_host(entry):
+    """Split a 'host' or 'host:port' entry into (host, port)"""
+    host, _, port = str(entry).partition(':')
+    return host, int(port) if port else config.DB_PORT
+
+def _get_pool(host, port, username, password):
+    """Get (or create) the connection pool for a host and user.
+
+    Only callers needing the same pool wait while it is opened; checkouts
+    from other pools go ahead.
+    """
+    key = (host, port, username, password)
+    with _pool_lock:
+        pool = _pools.get(key)
+        if pool is not None:
+            return pool
+        open_lock = _pool_open_locks.setdefault(key, threading.Lock())
+        pool_name = f"canteen_{len(_pool_open_locks)}"
+
+    with open_lock:
+        with _pool_lock:
+            pool = _pools.get(key)
+        if pool is None:
+            # Sessions are not reset on return so prepared statements survive;
+            # get_db_connection rolls back and re-applies session limits instead.
+            # consume_results discards rows left unread by abandoned streams.
+            pool = pooling.MySQLConnectionPool(
+                pool_name=pool_name,
+                pool_size=config.DB_POOL_SIZE,
+                pool_reset_session=False,
+                consume_results=True,
+                host=host,
+                user=username,
+                password=password,
+                database=config.DB_NAME,
+                port=port
+            )
+            with _pool_lock:
+                _pools[key] = pool
+        return pool
+
+def _warm_up_pools():
+    """Create the pool of every configured user and check replica health.
+
+    Creating a pool opens all of its connections, so doing it here keeps the
+    connect/auth round-trips off the first page request.
+    """
+    for username, info in config.DB_USERS.items():
+        try:
+            pool = _get_pool(config.DB_HOST, config.DB_PORT, username, info['password'])
+            conn = pool.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            conn.close()
+        except Error:
+            continue
+    if config.DB_REPLICA_HOSTS:
+        _pick_replica()
+
+def start_warm_up():
+    """Start the background warm-up (pools, replica checks, heavy imports) once per process"""
+    global _warm_up_started
+    with _pool_lock:
+        if _warm_up_started:
+            return False
+        _warm_up_started = True
+
+    lazy_imports.warm_up_imports()
+    threading.Thread(target=_warm_up_pools, name="warm-up-pools", daemon=True).start()
+    return True
+
+def _record_pool_health(host, port, username, error=None):
+    """Remember whether the last checkout from a pool worked"""
+    with _pool_lock:
+        _pool_health[(host, port, username)] = {
+            'ok': error is None,
+            'error': error,
+            'checked_at': time.time()
+        }
+
+def _connect(host, port):
+    """Check out a pooled connection to host:port with current user credentials"""
+    username, password = get_current_db_user()
     try:
-        username, password = get_current_db_user()
-        
-        conn = mysql.connector.connect(
-            host=config.DB_HOST,
-            user=username,
-            password=password,
-            database=config.DB_NAME,
-            port=config.DB_PORT
-        )
-        yield conn
+        pool = _get_pool(host, port, username, password)
+        deadline = time.time() + config.QUERY_SLOT_WAIT_SECONDS
+        while True:
+            try:
+                conn = pool.get_connection()
+                break
+            except PoolError:
+                if time.time() >= deadline:
+                    raise
+                time.sleep(0.05)
     except Error as e:
-        st.error(f"Database connection error: {e}")
+        _record_pool_health(host, port, username, str(e))
         raise
-    finally:
-        if conn and conn.is_connected():
+    _record_pool_health(host, port, username)
+    return conn
+
+def check_replica_health(host, port, timeout=2):
+    """Return the replication lag of a replica in seconds, or None if it is unusable"""
+    monitor_user = config.REPLICA_MONITOR_USER
+    try:
+        conn = mysql.connector.connect(
+            host=host,
+            user=monitor_user,
+            password=config.DB_USERS.get(monitor_user, {}).get('password', config.DB_PASSWORD),
+            port=port,
+            connection_timeout=timeout
+        )
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SHOW SLAVE STATUS")
+            status = cursor.fetchone()
+            cursor.close()
+        finally:
             conn.close()
+    except Error:
+        return None
+
+    # Not configured as a replica, or replication threads stopped
+    if not status or status.get('Slave_SQL_Running') != 'Yes':
+        return None
+    return status.get('Seconds_Behind_Master')
+
+def _mark_replica_down(host, port):
+    """Take a replica out of rotation until its next health check"""
+    with _replica_lock:
+        _replica_health[(host, port)] = {'lag': None, 'checked_at': time.time()}
+
+def get_replica_status():
+    """Get the cached health of every configured replica"""
+    with _replica_lock:
+        return {f"{host}:{port}": dict(state) for (host, port), state in _replica_health.items()}
+
+def _replica_state(host, port, now):
+    """Cached health of a replica, re-checked when older than the health check interval"""
+    with _replica_lock:
+        state = _replica_health.get((host, port))
+    if state is None or now - state['checked_at'] > config.REPLICA_HEALTH_CHECK_INTERVAL:
+        state = {'lag': check_replica_health(host, port), 'checked_at': now}
+        with _replica_lock:
+            _replica_health[(host, port)] = state
+    return state
+
+def get_max_replica_lag():
+    """Highest lag (seconds) among reachable replicas, or None if there are none"""
+    now = time.time()
+    lags = [_replica_state(*_parse_host(entry), now)['lag'] for entry in config.DB_REPLICA_HOSTS]
+    lags = [lag for lag in lags if lag is not None]
+    return max(lags) if lags else None
+
+def _pick_replica():
+    """Return (host, port) of the least-lagged healthy replica, or None"""
+    now = time.time()
+    candidates = []
+    for entry in config.DB_REPLICA_HOSTS:
+        host, port = _parse_host(entry)
+        state = _replica_state(host, port, now)
+        if state['lag'] is not None and state['lag'] <= config.REPLICA_MAX_LAG_SECONDS:
+            candidates.append((state['lag'], host, port))
+    if not candidates:
+        return None
+    _, host, port = min(candidates)
+    return host, port
+
+def _record_write():
+    """Remember the time of this session's last write (for read-your-writes)"""
+    st.session_state.last_write_at = time.time()
+
+def _should_use_replica(use_replica):
+    """Decide whether a read may go to a replica.
 
-def fetch_query(query, params=None):
-    """Execute SELECT query and return results as DataFrame"""
+    use_replica=True forces replica reads (e.g. analytics pages), False forces
+    the primary and None routes by role. Reads shortly after a write in the
+    same session always go to the primary so the session sees its own writes.
+    """
+    if not config.DB_REPLICA_HOSTS or use_replica is False:
+        return False
+
+    last_write = st.session_state.get('last_write_at')
+    if last_write and time.time() - last_write < config.READ_YOUR_WRITES_WINDOW:
+        return False
+
+    if use_replica:
+        return True
+    username, _ = get_current_db_user()
+    return username in config.REPLICA_READ_ROLES
+
+def _open_connection(use_replica=False):
+    """Connect to a healthy replica when allowed, falling back to the primary"""
+    if _should_use_replica(use_replica):
+        target = _pick_replica()
+        if target:
+            try:
+                return _connect(*target)
+            except Error:
+                _mark_replica_down(*target)
+    return _connect(config.DB_HOST, config.DB_PORT)
+
+def _record_limit_event(reason):
+    """Count a query that hit one of the role limits"""
+    username, _ = get_current_db_user()
+    with _slot_lock:
+        key = (username, reason)
+        _limit_events[key] = _limit_events.get(key, 0) + 1
+
+def get_query_limit_stats():
+    """Get how often each role hit each query limit, as a DataFrame"""
+    with _slot_lock:
+        rows = [{'user': user, 'limit': reason, 'count': count}
+                for (user, reason), count in _limit_events.items()]
+    return pd.DataFrame(rows, columns=['user', 'limit', 'count'])
+
+@contextmanager
+def _query_slot():
+    """Hold one of the session's and one of the role's concurrent query slots"""
+    username, _ = get_current_db_user()
+    limit = get_user_role().get('max_concurrent_queries')
+    wait = config.QUERY_SLOT_WAIT_SECONDS
+
+    role_sem = None
+    if limit:
+        with _slot_lock:
+            role_sem = _role_slots.setdefault(username, threading.BoundedSemaphore(limit))
+
+    if 'query_slots' not in st.session_state:
+        st.session_state.query_slots = threading.BoundedSemaphore(config.MAX_CONCURRENT_QUERIES_PER_SESSION)
+    session_sem = st.session_state.query_slots
+
+    if not session_sem.acquire(timeout=wait):
+        _record_limit_event('session_concurrency')
+        raise QueryLimitError("Too many queries running in this session, please try again")
     try:
-        with get_db_connection() as conn:
-            df = pd.read_sql(query, conn, params=params)
-            return df
+        if role_sem and not role_sem.acquire(timeout=wait):
+            _record_limit_event('role_concurrency')
+            raise QueryLimitError(f"All {limit} query slots for {username} are busy, please try again")
+        try:
+            yield
+        finally:
+            if role_sem:
+                role_sem.release()
+    finally:
+        session_sem.release()
+
+def _apply_session_limits(conn, timeout=None, max_rows=None):
+    """Set the role's statement timeout and the row cap on a connection.
+
+    timeout (seconds) overrides the role's max_statement_time for this call.
+    sql_select_limit is set one above max_rows so truncation can be detected,
+    and back to DEFAULT when max_rows is None: pooled sessions keep it, and
+    internal reads (analytics extract, scheduler, cleanup and archive jobs)
+    must see every row.
+    """
+    role = get_user_role()
+    statement_time = timeout if timeout is not None else role.get('max_statement_time') or 0
+    select_limit = int(max_rows) + 1 if max_rows else 'DEFAULT'
+
+    cursor = conn.cursor()
+    cursor.execute(f"SET SESSION max_statement_time = {float(statement_time)}, sql_select_limit = {select_limit}")
+    cursor.close()
+
+def _format_query_error(e):
+    """Describe a query error, reporting statement timeouts as cancellations"""
+    if getattr(e, 'errno', None) == ER_STATEMENT_TIMEOUT:
+        _record_limit_event('statement_timeout')
+        return "Query cancelled: it exceeded the statement time limit for your role"
+    return str(e)
+
+@contextmanager
+def get_db_connection(use_replica=False, timeout=None, max_rows=None):
+    """Get database connection with current user credentials.
+
+    Writes use the primary (the default); pass use_replica=None/True for reads.
+    The connection holds one of the role's query slots and runs under the
+    role's statement timeout (or timeout seconds, if given). SELECTs on it
+    are capped just above max_rows when given, otherwise not at all.
+    """
+    with _query_slot():
+        conn = None
+        try:
+            conn = _open_connection(use_replica)
+            _apply_session_limits(conn, timeout, max_rows)
+            yield conn
+        except Error as e:
+            st.error(f"Database connection error: {_format_query_error(e)}")
+            raise
+        finally:
+            if conn:
+                if conn.is_connected():
+                    # End any open transaction/snapshot before the pool reuses it
+                    conn.rollback()
+                try:
+                    # Always hand pooled connections back, even when the server
+                    # session dropped; the pool reconnects them on next checkout
+                    conn.close()
+                except Error:
+                    pass
+
+def _bump_stmt_stats(**deltas):
+    """Add to the prepared statement cache counters"""
+    with _stmt_lock:
+        for key, value in deltas.items():
+            _stmt_stats[key] += value
+
+def get_statement_cache_stats():
+    """Get prepared statement cache hits, misses, evictions and estimated parse time saved"""
+    with _stmt_lock:
+        return dict(_stmt_stats)
+
+def _execute_prepared(conn, query, params):
+    """Execute query as a server-side prepared statement (binary protocol).
+
+    Each pooled connection keeps an LRU of prepared cursors keyed by SQL text,
+    so repeated calls skip the PREPARE round-trip and parse. The time saved is
+    estimated as the first (prepare + execute) run minus the cached run.
+    Returns the cursor; callers must fetch all rows before reusing conn.
+    """
+    raw = getattr(conn, '_cnx', conn)
+    # Statement ids belong to one server session: a connection the pool
+    # reconnected starts with an empty cache
+    cache_owner, cache = getattr(raw, '_stmt_cache', (None, None))
+    if cache is None or cache_owner != raw.connection_id:
+        cache = OrderedDict()
+        raw._stmt_cache = (raw.connection_id, cache)
+
+    start = time.perf_counter()
+    entry = cache.get(query)
+    if entry is not None:
+        cache.move_to_end(query)
+        try:
+            # Pass the cached SQL object itself: the cursor only skips
+            # re-preparing when it sees the same operation again
+            entry['cursor'].execute(entry['sql'], params)
+            elapsed = time.perf_counter() - start
+            _bump_stmt_stats(hits=1, saved_seconds=max(entry['first_run'] - elapsed, 0.0))
+            return entry['cursor']
+        except Error as e:
+            cache.pop(query, None)
+            # The server forgot the statement: prepare it again below
+            if getattr(e, 'errno', None) != ER_UNKNOWN_STMT_HANDLER:
+                raise
+            start = time.perf_counter()
+
+    cursor = raw.cursor(prepared=True)
+    cursor.execute(query, params)
+    cache[query] = {'sql': query, 'cursor': cursor, 'first_run': time.perf_counter() - start}
+    _bump_stmt_stats(misses=1)
+
+    while len(cache) > config.PREPARED_STATEMENT_CACHE_SIZE:
+        _, evicted = cache.popitem(last=False)
+        try:
+            evicted['cursor'].close()
+        except Error:
+            pass
+        _bump_stmt_stats(evictions=1)
+    return cursor
+
+def fetch_query(query, params=None, use_replica=None, timeout=None, prepared=False):
+    """Execute SELECT query and return results as DataFrame.
+
+    use_replica: True sends the read to a replica, False to the primary,
+    None routes by role (see _should_use_replica).
+    timeout: statement timeout in seconds, overriding the role's default.
+    prepared: run as a cached server-side prepared statement; use for
+    parameterized queries that run over and over with the same SQL text.
+    Results are capped at the role's max_rows.
+    """
+    try:
+        max_rows = get_user_role().get('max_rows')
+        with get_db_connection(use_replica, timeout, max_rows) as conn:
+            if prepared:
+                cursor = _execute_prepared(conn, query, params or ())
+                df = pd.DataFrame.from_records(
+                    cursor.fetchall(), columns=list(cursor.column_names), coerce_float=True
+                )
+            else:
+                df = pd.read_sql(query, conn, params=params)
+
+        if max_rows and len(df) > max_rows:
+            _record_limit_event('row_cap')
+            st.warning(f"Showing the first {max_rows} rows (row limit for your role)")
+            df = df.head(max_rows)
+        return df
+    except QueryLimitError as e:
+        st.error(f" Query not run: {e}")
+        return pd.DataFrame()
     except Error as e:
-        st.error(f" Query execution error: {e}")
+        st.error(f" Query execution error: {_format_query_error(e)}")
         return pd.DataFrame()
     except Exception as e:
         st.error(f" Unexpected error: {e}")
         return pd.DataFrame()
 
-def execute_query(query, params=None, fetch_results=False):
+def execute_query(query, params=None, fetch_results=False, timeout=None):
     """Execute INSERT, UPDATE, DELETE queries"""
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(timeout=timeout) as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
+            _record_write()
             
             if fetch_results:
                 results = cursor.fetchall()
@@ -115,19 +684,23 @@ def execute_query(query, params=None, fetch_results=False):
             conn.commit()
             cursor.close()
             return True
+    except QueryLimitError as e:
+        st.error(f"Query not run: {e}")
+        return False
     except Error as e:
-        st.error(f"Query execution error: {e}")
+        st.error(f"Query execution error: {_format_query_error(e)}")
         return False
     except Exception as e:
         st.error(f"Unexpected error: {e}")
         return False
 
-def call_procedure(proc_name, params=None):
+def call_procedure(proc_name, params=None, timeout=None):
     """Call stored procedure"""
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(timeout=timeout) as conn:
             cursor = conn.cursor()
             cursor.callproc(proc_name, params or ())
+            _record_write()
             
             # Fetch all result sets
             results = []
@@ -137,29 +710,238 @@ def call_procedure(proc_name, params=None):
             conn.commit()
             cursor.close()
             return results
+    except QueryLimitError as e:
+        st.error(f"Procedure not run: {e}")
+        return None
     except Error as e:
-        st.error(f"Procedure call error: {e}")
+        st.error(f"Procedure call error: {_format_query_error(e)}")
         return None
     except Exception as e:
         st.error(f"Unexpected error: {e}")
         return None
 
-def call_function(func_name, params):
-    """Call stored function"""
+def _procedure_result_sets(proc_name, params=None, timeout=None):
+    """Run CALL on an unbuffered cursor and yield it once per result set.
+
+    Unlike cursor.callproc, which buffers every result set client-side, rows
+    are read from the server only as the caller fetches them. The procedure's
+    writes are committed (and recorded) once every result set was read; a
+    caller that stops early rolls them back.
+    """
+    params = tuple(params or ())
+    placeholders = ', '.join(['%s'] * len(params))
+    with get_db_connection(timeout=timeout) as conn:
+        cursor = conn.cursor()
+        for result in cursor.execute(f"CALL {proc_name}({placeholders})", params, multi=True):
+            if result.with_rows:
+                yield result
+        conn.commit()
+        _record_write()
+        cursor.close()
+
+def call_procedure_iter(proc_name, params=None, chunk_size=None, timeout=None):
+    """Call stored procedure and lazily yield its rows.
+
+    Yields one row tuple at a time, or lists of up to chunk_size rows when
+    chunk_size is given (chunks never span two result sets). Memory use stays
+    flat however many rows the procedure returns. The connection and one of
+    the session's query slots stay taken until the generator is exhausted or
+    closed, so consume it in one go (a for loop) rather than across reruns.
+    """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
+        for result in _procedure_result_sets(proc_name, params, timeout):
+            if chunk_size:
+                rows = result.fetchmany(chunk_size)
+                while rows:
+                    yield rows
+                    rows = result.fetchmany(chunk_size)
+            else:
+                row = result.fetchone()
+                while row is not None:
+                    yield row
+                    row = result.fetchone()
+    except QueryLimitError as e:
+        st.error(f"Procedure not run: {e}")
+    except Error as e:
+        st.error(f"Procedure call error: {_format_query_error(e)}")
+    except Exception as e:
+        st.error(f"Unexpected error: {e}")
+
+def call_procedure_frames(proc_name, params=None, timeout=None):
+    """Call stored procedure and return each result set as its own DataFrame.
+
+    Column names come from the result set, and only one result set is held
+    in raw row form at a time. Returns None on error.
+    """
+    try:
+        frames = []
+        for result in _procedure_result_sets(proc_name, params, timeout):
+            frames.append(pd.DataFrame.from_records(
+                result.fetchall(), columns=list(result.column_names), coerce_float=True
+            ))
+        return frames
+    except QueryLimitError as e:
+        st.error(f"Procedure not run: {e}")
+        return None
+    except Error as e:
+        st.error(f"Procedure call error: {_format_query_error(e)}")
+        return None
+    except Exception as e:
+        st.error(f"Unexpected error: {e}")
+        return None
+
+def call_function(func_name, params, use_replica=None, timeout=None):
+    """Call stored function (a read, so it may be served by a replica)"""
+    try:
+        with get_db_connection(use_replica, timeout) as conn:
             # Build function call
             placeholders = ', '.join(['%s'] * len(params))
             query = f"SELECT {func_name}({placeholders})"
             
-            cursor.execute(query, params)
-            result = cursor.fetchone()[0]
-            cursor.close()
-            return result
+            # Same SQL text for every call, so reuse the prepared statement
+            cursor = _execute_prepared(conn, query, params)
+            rows = cursor.fetchall()
+            return rows[0][0]
+    except QueryLimitError as e:
+        st.error(f"Function not run: {e}")
+        return None
+    except Error as e:
+        st.error(f"Function call error: {_format_query_error(e)}")
+        return None
+    except Exception as e:
+        st.error(f"Unexpected error: {e}")
+        return None
+
+def call_function_batch(func_name, param_rows, use_replica=None, timeout=None, batch_size=500):
+    """Call a stored function for many argument tuples in one round-trip.
+
+    The argument tuples are sent as a UNION ALL derived table and the function
+    is evaluated once per row, so N calls cost one statement (per batch_size
+    rows) instead of N. Returns a list of results aligned with param_rows.
+    """
+    param_rows = [tuple(row) for row in param_rows]
+    if not param_rows:
+        return []
+
+    arity = len(param_rows[0])
+    if any(len(row) != arity for row in param_rows):
+        st.error(f"Function call error: every argument tuple for {func_name} needs {arity} value(s)")
+        return None
+
+    args = ', '.join(f"t.p{i}" for i in range(arity))
+    first_row = 'SELECT %s AS idx' + ''.join(f", %s AS p{i}" for i in range(arity))
+    next_row = 'SELECT %s' + ', %s' * arity
+
+    try:
+        results = []
+        with get_db_connection(use_replica, timeout) as conn:
+            for start in range(0, len(param_rows), batch_size):
+                chunk = param_rows[start:start + batch_size]
+                derived = ' UNION ALL '.join([first_row] + [next_row] * (len(chunk) - 1))
+                query = f"SELECT {func_name}({args}) FROM ({derived}) AS t ORDER BY t.idx"
+                params = [value for idx, row in enumerate(chunk) for value in (idx, *row)]
+
+                # Full batches share SQL text, so the prepared statement is reused
+                cursor = _execute_prepared(conn, query, params)
+                results.extend(row[0] for row in cursor.fetchall())
+        return results
+    except QueryLimitError as e:
+        st.error(f"Function not run: {e}")
+        return None
+    except Error as e:
+        st.error(f"Function call error: {_format_query_error(e)}")
+        return None
+    except Exception as e:
+        st.error(f"Unexpected error: {e}")
+        return None
+
+def bulk_update_stock(updates, mode='set', reenable=False, timeout=None):
+    """Apply many stock changes in one transaction with a set-based UPDATE ... JOIN.
+
+    updates is a list of (item_id, quantity) pairs; mode 'set' makes quantity
+    the new stock and 'add' adds it to the current stock (never below 0).
+    With reenable, items that were out of stock and now have stock are made
+    available again (disable_item_when_out_of_stock only ever disables).
+
+    Returns {'changed': rows updated, 'flipped': DataFrame of items whose
+    availability changed, 'unknown': item_ids not found}, or None on error.
+    """
+    if mode not in ('set', 'add'):
+        st.error(f"Stock update error: unknown mode '{mode}'")
+        return None
+
+    # Last value wins when an item appears twice
+    rows = list({int(item_id): int(quantity) for item_id, quantity in updates}.items())
+    if not rows:
+        return {'changed': 0, 'flipped': pd.DataFrame(), 'unknown': []}
+
+    new_stock = "t.quantity" if mode == 'set' else "GREATEST(mi.stock + t.quantity, 0)"
+
+    try:
+        with get_db_connection(timeout=timeout) as conn:
+            cursor = conn.cursor()
+            # Temporary tables live as long as the pooled connection, so clear any leftover
+            cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_stock_updates")
+            cursor.execute("""
+                CREATE TEMPORARY TABLE tmp_stock_updates (
+                    item_id INT PRIMARY KEY,
+                    quantity INT NOT NULL,
+                    old_stock INT NULL,
+                    new_stock INT NULL,
+                    was_available BOOLEAN NULL
+                ) ENGINE=MEMORY
+            """)
+            try:
+                cursor.executemany(
+                    "INSERT INTO tmp_stock_updates (item_id, quantity) VALUES (%s, %s)",
+                    rows
+                )
+
+                # Resolve old and new stock first; this also locks the items being changed
+                cursor.execute(f"""
+                    UPDATE tmp_stock_updates t
+                    JOIN Menu_Items mi ON mi.item_id = t.item_id
+                    SET t.old_stock = mi.stock,
+                        t.new_stock = {new_stock},
+                        t.was_available = mi.is_available
+                """)
+
+                cursor.execute("""
+                    UPDATE Menu_Items mi
+                    JOIN tmp_stock_updates t ON t.item_id = mi.item_id
+                    SET mi.stock = t.new_stock,
+                        mi.is_available = CASE
+                            WHEN %s AND t.old_stock <= 0 AND t.new_stock > 0 THEN TRUE
+                            ELSE mi.is_available
+                        END
+                    WHERE mi.stock <> t.new_stock
+                """, (bool(reenable),))
+                changed = cursor.rowcount
+                _record_write()
+
+                cursor.execute("""
+                    SELECT t.item_id, mi.item_name, t.old_stock, mi.stock AS new_stock,
+                           mi.is_available
+                    FROM tmp_stock_updates t
+                    JOIN Menu_Items mi ON mi.item_id = t.item_id
+                    WHERE mi.is_available <> t.was_available
+                    ORDER BY mi.item_name
+                """)
+                flipped = pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+
+                cursor.execute("SELECT item_id FROM tmp_stock_updates WHERE old_stock IS NULL ORDER BY item_id")
+                unknown = [row[0] for row in cursor.fetchall()]
+
+                conn.commit()
+            finally:
+                cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_stock_updates")
+                cursor.close()
+        return {'changed': changed, 'flipped': flipped, 'unknown': unknown}
+    except QueryLimitError as e:
+        st.error(f"Stock update not run: {e}")
+        return None
     except Error as e:
-        st.error(f"Function call error: {e}")
+        st.error(f"Stock update error: {_format_query_error(e)}")
         return None
     except Exception as e:
         st.error(f"Unexpected error: {e}")
@@ -170,20 +952,260 @@ def test_connection():
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT VERSION()")
-            version = cursor.fetchone()[0]
-            
-            # Get current user
-            cursor.execute("SELECT CURRENT_USER()")
-            current_user = cursor.fetchone()[0]
-            
+            cursor.execute("SELECT VERSION(), CURRENT_USER()")
+            version, current_user = cursor.fetchone()
             cursor.close()
-            return True, f"Connected as {current_user} | MariaDB {version}"
+
+        username, password = get_current_db_user()
+        _remember_verification(username, password, version, current_user)
+        return True, f"Connected as {current_user} | MariaDB {version}"
     except Error as e:
         return False, f"Connection failed: {e}"
     except Exception as e:
         return False, f"Unexpected error: {e}"
 
+def get_connection_status():
+    """Get (ok, message) for status displays without a new connection per rerun.
+
+    Connectivity comes from the primary pool's last checkout, and the server
+    version / current user from the session's cached verification. Only when
+    neither is known yet does this fall back to test_connection().
+    """
+    username, password = get_current_db_user()
+    with _pool_lock:
+        health = _pool_health.get((config.DB_HOST, config.DB_PORT, username))
+    if health and not health['ok']:
+        return False, f"Connection failed: {health['error']}"
+
+    info = get_verified_session(username, password)
+    if info is None:
+        return test_connection()
+    return True, f"Connected as {info['current_user']} | MariaDB {info['version']}"
+
+def get_checkpoint(consumer):
+    """Get the last change_id a CDC consumer has processed (0 if new)"""
+    checkpoint = fetch_query(
+        "SELECT last_change_id FROM CDC_Checkpoints WHERE consumer = %s",
+        (consumer,),
+        use_replica=False
+    )
+    return int(checkpoint['last_change_id'][0]) if not checkpoint.empty else 0
+
+def commit_checkpoint(consumer, change_id):
+    """Record that a consumer has processed every change up to change_id"""
+    committed = execute_query("""
+        INSERT INTO CDC_Checkpoints (consumer, last_change_id) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE last_change_id = GREATEST(last_change_id, VALUES(last_change_id))
+    """, (consumer, int(change_id)))
+    if committed:
+        acknowledge_changes(consumer)
+    return committed
+
+def read_changes(consumer, batch_size=None, tables=None, after=None):
+    """Read the next batch of Change_Outbox rows after the consumer's checkpoint.
+
+    change_id is allocated at insert but rows become visible at commit, so a
+    gap may be a transaction still in flight. The batch stops before a gap
+    whose next row is younger than CDC_GAP_GRACE_SECONDS; older gaps are
+    taken for rolled-back inserts and skipped, but looked up again on reads
+    at least CDC_GAP_GRACE_SECONDS later. Rows that committed late are then
+    delivered ahead of the batch, out of change_id order (and even when
+    position doesn't move), on every read until the consumer acknowledges
+    them (commit_checkpoint or acknowledge_changes). get_cdc_gap_stats counts
+    skipped, recovered and lost ids.
+
+    Returns (changes, position): a DataFrame with payload decoded to dicts
+    (filtered to tables, if given), and the change_id to pass to
+    commit_checkpoint once the batch is processed. after overrides the
+    stored checkpoint.
+    """
+    if after is None:
+        after = get_checkpoint(consumer)
+    changes = fetch_query("""
+        SELECT change_id, table_name, row_id, operation, payload, changed_at,
+               TIMESTAMPDIFF(SECOND, changed_at, NOW()) AS age_seconds
+        FROM Change_Outbox
+        WHERE change_id > %s
+        ORDER BY change_id
+        LIMIT %s
+    """, (after, batch_size or config.CDC_BATCH_SIZE), use_replica=False)
+    position = after
+    skipped = []
+    if not changes.empty:
+        previous = changes['change_id'].shift(1, fill_value=after)
+        gaps = changes['change_id'] != previous + 1
+        in_flight = gaps & (changes['age_seconds'] < config.CDC_GAP_GRACE_SECONDS)
+        if in_flight.any():
+            keep = in_flight.to_numpy().argmax()
+            changes, previous, gaps = changes.iloc[:keep], previous.iloc[:keep], gaps.iloc[:keep]
+        if not changes.empty:
+            position = int(changes['change_id'].iloc[-1])
+        skipped = [(int(first) + 1, int(next_id) - 1) for first, next_id in zip(previous[gaps], changes.loc[gaps, 'change_id'])]
+        changes = changes.drop(columns='age_seconds')
+
+    recovered = _recheck_change_gaps(consumer, skipped)
+    if not recovered.empty:
+        changes = recovered if changes.empty else pd.concat([recovered, changes], ignore_index=True)
+    if changes.empty:
+        return changes, position
+
+    changes['payload'] = changes['payload'].apply(lambda p: json.loads(p) if p else {})
+    if tables:
+        changes = changes[changes['table_name'].isin(tables)]
+    return changes.reset_index(drop=True), position
+
+def _recheck_change_gaps(consumer, skipped):
+    """Queue newly skipped (first_id, last_id) ranges and look up the ones due for their re-check.
+
+    Returns the outbox rows that appeared in due ranges since they were
+    skipped. The ranges stay queued until acknowledge_changes.
+    """
+    now = time.time()
+    with _cdc_lock:
+        queued = _cdc_gaps.setdefault(consumer, {})
+        # A batch read again without a checkpoint reports the same gaps
+        skipped = [gap for gap in skipped if gap not in queued]
+        for gap in skipped:
+            queued[gap] = now
+        _cdc_gap_stats['skipped'] += sum(last - first + 1 for first, last in skipped)
+        due = [gap for gap, skipped_at in queued.items() if now - skipped_at >= config.CDC_GAP_GRACE_SECONDS]
+    if not due:
+        return pd.DataFrame()
+
+    ranges = ' OR '.join(['change_id BETWEEN %s AND %s'] * len(due))
+    recovered = fetch_query(f"""
+        SELECT change_id, table_name, row_id, operation, payload, changed_at
+        FROM Change_Outbox
+        WHERE {ranges}
+        ORDER BY change_id
+    """, tuple(value for gap in due for value in gap), use_replica=False)
+    ids = recovered['change_id'] if not recovered.empty else pd.Series(dtype='int64')
+    with _cdc_lock:
+        found = _cdc_rechecked.setdefault(consumer, {})
+        for first, last in due:
+            found[(first, last)] = int(ids.between(first, last).sum())
+    return recovered
+
+def acknowledge_changes(consumer):
+    """Settle the gap ranges re-checked by the consumer's reads so far.
+
+    Call once the batches read since the last acknowledgement are processed;
+    commit_checkpoint does. Consumers keeping their own position
+    (analytics_store) call it after storing it. Settled ranges are no longer
+    looked up, and their ids count as recovered or lost (rolled back or purged).
+    """
+    with _cdc_lock:
+        queued = _cdc_gaps.get(consumer, {})
+        for (first, last), rows in _cdc_rechecked.pop(consumer, {}).items():
+            queued.pop((first, last), None)
+            _cdc_gap_stats['recovered'] += rows
+            _cdc_gap_stats['lost'] += last - first + 1 - rows
+
+def get_cdc_gap_stats():
+    """Get change_ids skipped as gaps, recovered on re-check and never seen, plus ranges awaiting re-check"""
+    with _cdc_lock:
+        return {**_cdc_gap_stats, 'pending': sum(len(gaps) for gaps in _cdc_gaps.values())}
+
+def consume_changes(consumer, handler, batch_size=None, tables=None, max_batches=None):
+    """Feed pending changes to handler(changes) batch by batch, checkpointing after each.
+
+    Delivery is at-least-once: if handler raises, the checkpoint stays put and
+    the batch is read again next time. Returns the number of changes handled.
+    """
+    handled = 0
+    batches = 0
+    after = get_checkpoint(consumer)
+    while max_batches is None or batches < max_batches:
+        changes, position = read_changes(consumer, batch_size, tables, after)
+        if not changes.empty:
+            handler(changes)
+            handled += len(changes)
+        if position == after:
+            # Only re-checked gap rows (if any) were delivered; settle them
+            acknowledge_changes(consumer)
+            break
+        if not commit_checkpoint(consumer, position):
+            break
+        after = position
+        batches += 1
+    return handled
+
+def delete_in_batches(table, where, params=None, key=None, batch_size=None, timeout=None):
+    """Run DELETE FROM table WHERE <where> as a series of small transactions.
+
+    Each batch deletes at most batch_size rows (in key order, normally the
+    primary key) and commits, so row locks are only held briefly and
+    replicas apply small transactions. Returns the number of rows deleted,
+    or None on error.
+    """
+    batch_size = batch_size or config.DELETE_BATCH_SIZE
+    order_by = f" ORDER BY {key}" if key else ""
+    query = f"DELETE FROM {table} WHERE {where}{order_by} LIMIT %s"
+    params = tuple(params or ())
+
+    deleted = 0
+    try:
+        with get_db_connection(timeout=timeout) as conn:
+            cursor = conn.cursor()
+            while True:
+                cursor.execute(query, params + (batch_size,))
+                conn.commit()
+                _record_write()
+                deleted += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+            cursor.close()
+        return deleted
+    except QueryLimitError as e:
+        st.error(f"Delete not run: {e}")
+        return None
+    except Error as e:
+        st.error(f"Delete error after {deleted} rows: {_format_query_error(e)}")
+        return None
+    except Exception as e:
+        st.error(f"Unexpected error: {e}")
+        return None
+
+def purge_change_outbox(retention_hours=None, chunk_size=5000, timeout=None):
+    """Delete outbox rows older than the retention period, chunk_size rows per transaction.
+
+    Consumers whose checkpoint falls behind the retention period miss the
+    purged changes; get_cdc_status shows how far behind each one is.
+    Returns the number of rows deleted, or None on error.
+    """
+    retention_hours = retention_hours or config.CDC_RETENTION_HOURS
+    cutoff = fetch_query("""
+        SELECT COALESCE(MAX(change_id), 0) AS cutoff
+        FROM Change_Outbox
+        WHERE changed_at < NOW() - INTERVAL %s HOUR
+    """, (retention_hours,), use_replica=False)
+    if cutoff.empty or not int(cutoff['cutoff'][0]):
+        return 0
+
+    return delete_in_batches(
+        'Change_Outbox',
+        'change_id <= %s',
+        (int(cutoff['cutoff'][0]),),
+        key='change_id',
+        batch_size=chunk_size,
+        timeout=timeout
+    )
+
+def get_cdc_status():
+    """Get outbox size and each consumer's checkpoint and lag (in changes)"""
+    outbox = fetch_query("""
+        SELECT COUNT(*) AS pending_rows, COALESCE(MIN(change_id), 0) AS oldest_id,
+               COALESCE(MAX(change_id), 0) AS newest_id, MIN(changed_at) AS oldest_at
+        FROM Change_Outbox
+    """, use_replica=False)
+    consumers = fetch_query("""
+        SELECT c.consumer, c.last_change_id, c.updated_at,
+               GREATEST((SELECT COALESCE(MAX(change_id), 0) FROM Change_Outbox) - c.last_change_id, 0) AS lag
+        FROM CDC_Checkpoints c
+        ORDER BY lag DESC
+    """, use_replica=False)
+    return outbox, consumers
+
 def get_table_info(table_name):
     """Get table structure"""
     query = f"DESCRIBE {table_name}"
@@ -208,16 +1230,16 @@ def execute_file(file_path):
     """Execute SQL file"""
     try:
         with open(file_path, 'r') as f:
-            sql_script = f.read()
+            script = f.read()
         
         with get_db_connection() as conn:
             cursor = conn.cursor()
             
-            # Split and execute statements
-            statements = sql_script.split(';')
-            for statement in statements:
-                if statement.strip():
-                    cursor.execute(statement)
+            # Split like the mysql client (DELIMITER blocks, strings, comments)
+            for statement in sql_script.split_statements(script):
+                cursor.execute(statement)
+                if cursor.with_rows:
+                    cursor.fetchall()
             
             conn.commit()
             cursor.close()
@@ -0,0 +1,189 @@
+"""
+Demand forecasting
+Per-item demand curves (weekday x hour) from Order_Items history, used for
+recommended stock levels and "runs out by" predictions on the Menu page.
+"""
+
+from datetime import date, datetime, timedelta
+import math
+import threading
+import time
+import config
+import db_utils
+import lazy_imports
+
+np = lazy_imports.lazy_import('numpy')
+pd = lazy_imports.lazy_import('pandas')
+
+# Quantity sold per item, weekday (0 = Monday) and hour, over whole past days
+HOURLY_ROLLUP_QUERY = """
+    SELECT
+        oi.item_id,
+        WEEKDAY(o.order_date) as weekday,
+        HOUR(o.order_date) as hour,
+        SUM(oi.quantity) as quantity
+    FROM Orders o
+    JOIN Order_Items oi ON oi.order_id = o.order_id
+    WHERE o.order_date >= CURDATE() - INTERVAL %s DAY
+      AND o.order_date < CURDATE()
+      AND o.order_status <> 'cancelled'
+    GROUP BY oi.item_id, WEEKDAY(o.order_date), HOUR(o.order_date)
+"""
+
+# Quantity sold per item and day, for the day-to-day spread of demand
+DAILY_ROLLUP_QUERY = """
+    SELECT
+        oi.item_id,
+        DATE(o.order_date) as day,
+        SUM(oi.quantity) as quantity
+    FROM Orders o
+    JOIN Order_Items oi ON oi.order_id = o.order_id
+    WHERE o.order_date >= CURDATE() - INTERVAL %s DAY
+      AND o.order_date < CURDATE()
+      AND o.order_status <> 'cancelled'
+    GROUP BY oi.item_id, DATE(o.order_date)
+"""
+
+# Model shared by all sessions, rebuilt every FORECAST_REFRESH_SECONDS
+_model = None
+_model_lock = threading.Lock()
+
+def build_model(hourly, daily, today=None):
+    """Build demand curves from the two rollups.
+
+    Returns a dict with item_ids (sorted), curve[item, weekday, hour] (mean
+    quantity), daily_mean / daily_std[item, weekday], history_days and
+    build_ms. Days without sales count as zero demand; history starts at the
+    first day with any sale.
+    """
+    started = time.perf_counter()
+    today = today or date.today()
+
+    if daily.empty:
+        first_day = today
+    else:
+        first_day = pd.to_datetime(daily['day']).min().date()
+    history_days = max((today - first_day).days, 1)
+    days = pd.date_range(today - timedelta(days=history_days), periods=history_days, freq='D')
+    day_weekdays = days.dayofweek.to_numpy()
+    weekday_counts = np.bincount(day_weekdays, minlength=7)
+
+    item_ids = np.union1d(hourly['item_id'].to_numpy(), daily['item_id'].to_numpy()).astype(int)
+
+    curve = np.zeros((len(item_ids), 7, 24))
+    if not hourly.empty:
+        np.add.at(
+            curve,
+            (
+                np.searchsorted(item_ids, hourly['item_id'].to_numpy()),
+                hourly['weekday'].to_numpy(dtype=int),
+                hourly['hour'].to_numpy(dtype=int)
+            ),
+            hourly['quantity'].to_numpy(dtype=float)
+        )
+    curve /= np.maximum(weekday_counts, 1)[None, :, None]
+
+    per_day = np.zeros((len(item_ids), history_days))
+    if not daily.empty:
+        day_index = (pd.to_datetime(daily['day']) - days[0]).dt.days.to_numpy()
+        np.add.at(
+            per_day,
+            (np.searchsorted(item_ids, daily['item_id'].to_numpy()), day_index),
+            daily['quantity'].to_numpy(dtype=float)
+        )
+    daily_std = np.zeros((len(item_ids), 7))
+    for weekday in range(7):
+        if weekday_counts[weekday]:
+            daily_std[:, weekday] = per_day[:, day_weekdays == weekday].std(axis=1)
+
+    return {
+        'item_ids': item_ids,
+        'curve': curve,
+        'daily_mean': curve.sum(axis=2),
+        'daily_std': daily_std,
+        'history_days': history_days,
+        'built_at': time.time(),
+        'build_ms': (time.perf_counter() - started) * 1000
+    }
+
+def refresh_model():
+    """Fetch the rollups and rebuild the shared model"""
+    global _model
+    days = config.FORECAST_HISTORY_DAYS
+    hourly = db_utils.fetch_query(HOURLY_ROLLUP_QUERY, (days,), use_replica=True)
+    daily = db_utils.fetch_query(DAILY_ROLLUP_QUERY, (days,), use_replica=True)
+    if hourly.empty:
+        hourly = pd.DataFrame(columns=['item_id', 'weekday', 'hour', 'quantity'])
+    if daily.empty:
+        daily = pd.DataFrame(columns=['item_id', 'day', 'quantity'])
+    model = build_model(hourly, daily)
+    with _model_lock:
+        _model = model
+    return model
+
+def get_model():
+    """Get the shared model, rebuilding it when missing or stale"""
+    model = _model
+    if model is None or time.time() - model['built_at'] > config.FORECAST_REFRESH_SECONDS:
+        return refresh_model()
+    return model
+
+def _format_clock(hours):
+    minutes = int(round(hours * 60))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def forecast_stock(items, model=None, now=None):
+    """Add forecast columns to a DataFrame with item_id and stock.
+
+    expected_rest_of_day: demand still expected today
+    runs_out_at: "HH:MM" when today's demand exhausts current stock, or None
+    recommended_stock: tomorrow's expected demand plus a safety margin of
+        FORECAST_SAFETY_FACTOR standard deviations
+    """
+    model = model or get_model()
+    now = now or datetime.now()
+    result = items.copy()
+
+    item_ids = result['item_id'].to_numpy(dtype=int)
+    stock = result['stock'].to_numpy(dtype=float)
+    rows = np.arange(len(result))
+
+    # Items never sold have no curve and forecast zero demand
+    if len(model['item_ids']):
+        index = np.minimum(np.searchsorted(model['item_ids'], item_ids), len(model['item_ids']) - 1)
+        known = model['item_ids'][index] == item_ids
+    else:
+        index = np.zeros(len(result), dtype=int)
+        known = np.zeros(len(result), dtype=bool)
+
+    today_curve = np.zeros((len(result), 24))
+    today_curve[known] = model['curve'][index[known], now.weekday()]
+
+    # Share of each hour still ahead of us, then demand left per hour
+    hour_now = now.hour + now.minute / 60
+    hours = np.arange(24)
+    left = np.clip(hours + 1 - hour_now, 0, 1)
+    demand = today_curve * left
+    cumulative = np.cumsum(demand, axis=1)
+
+    exhausted = (cumulative >= stock[:, None]) & (demand > 0) & (stock[:, None] > 0)
+    runs_out = exhausted.any(axis=1)
+    first = exhausted.argmax(axis=1)
+    before = np.where(first > 0, cumulative[rows, np.maximum(first - 1, 0)], 0.0)
+    segment = demand[rows, first]
+    segment_start = np.maximum(first, hour_now)
+    share = np.divide(stock - before, segment, out=np.zeros(len(result)), where=segment > 0)
+    runs_out_at = segment_start + share * (first + 1 - segment_start)
+
+    tomorrow = (now.weekday() + 1) % 7
+    mean = np.zeros(len(result))
+    std = np.zeros(len(result))
+    mean[known] = model['daily_mean'][index[known], tomorrow]
+    std[known] = model['daily_std'][index[known], tomorrow]
+
+    result['expected_rest_of_day'] = np.round(cumulative[:, -1], 1)
+    result['runs_out_at'] = [_format_clock(t) if hit else None for t, hit in zip(runs_out_at, runs_out)]
+    result['recommended_stock'] = [
+        int(math.ceil(m + config.FORECAST_SAFETY_FACTOR * s)) for m, s in zip(mean, std)
+    ]
+    return result
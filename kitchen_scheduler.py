@@ -0,0 +1,224 @@
+"""
+Kitchen ETA scheduler
+Models the kitchen as parallel stations and keeps Orders.estimated_ready_time
+up to date for confirmed and preparing orders.
+"""
+
+from bisect import bisect_left, insort
+import heapq
+import threading
+import time
+import config
+import db_utils
+
+# Open orders with their prep time (longest item, as an order's items are
+# cooked side by side on one station) and when they entered their status
+OPEN_ORDERS_QUERY = """
+    SELECT
+        o.order_id,
+        o.order_status,
+        MAX(mi.preparation_time_minutes) as prep_minutes,
+        UNIX_TIMESTAMP(COALESCE(
+            (SELECT MAX(e.changed_at) FROM Order_Status_Events e
+             WHERE e.order_id = o.order_id AND e.status = o.order_status),
+            o.order_date)) as status_since
+    FROM Orders o
+    JOIN Order_Items oi ON oi.order_id = o.order_id
+    JOIN Menu_Items mi ON mi.item_id = oi.item_id
+    WHERE o.order_status IN ('confirmed', 'preparing') {order_filter}
+    GROUP BY o.order_id, o.order_status, o.order_date
+"""
+
+SCHEDULED_STATUSES = ('confirmed', 'preparing')
+
+
+class KitchenSchedule:
+    """Open orders assigned to parallel stations.
+
+    Orders are served in queue order (preparing orders first, then by when
+    they were confirmed) and each takes the station that frees up first,
+    kept in a heap of (free_at, station). The heap as it was before each
+    order is stored with it, so adding or removing an order only reschedules
+    the orders behind it. Times are Unix timestamps.
+    """
+
+    def __init__(self, stations):
+        self.stations = stations
+        self._keys = []
+        self._entries = {}
+        self._tail = tuple((0.0, station) for station in range(stations))
+        self.last_update_ms = 0.0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _heap_at(self, index):
+        if index < len(self._keys):
+            return self._entries[self._keys[index][-1]]['heap_before']
+        return self._tail
+
+    def _reschedule(self, index, now):
+        """Recompute slots from queue position index; returns {order_id: ready_at} that changed"""
+        heap = list(self._heap_at(index))
+        changed = {}
+        for key in self._keys[index:]:
+            order_id = key[-1]
+            entry = self._entries[order_id]
+            entry['heap_before'] = tuple(heap)
+
+            free_at, station = heapq.heappop(heap)
+            start = entry['started_at'] if entry['started_at'] is not None else max(free_at, now)
+            ready = max(start + entry['duration'], now)
+            heapq.heappush(heap, (ready, station))
+
+            if entry['ready_at'] is None or int(entry['ready_at']) != int(ready):
+                changed[order_id] = ready
+            entry.update(station=station, start_at=start, ready_at=ready)
+        self._tail = tuple(heap)
+        return changed
+
+    def _unlink(self, order_id):
+        """Drop an order from the queue, returning its former position"""
+        entry = self._entries.pop(order_id)
+        index = bisect_left(self._keys, entry['key'])
+        del self._keys[index]
+        if index < len(self._keys):
+            # The next order now starts from the removed order's station state
+            self._entries[self._keys[index][-1]]['heap_before'] = entry['heap_before']
+        else:
+            self._tail = entry['heap_before']
+        return index
+
+    def upsert(self, order_id, prep_minutes, status_since, preparing=False, now=None):
+        """Add or update an order; returns {order_id: ready_at} that changed"""
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+
+        index = len(self._keys)
+        if order_id in self._entries:
+            index = self._unlink(order_id)
+
+        key = (0 if preparing else 1, status_since, order_id)
+        position = bisect_left(self._keys, key)
+        self._entries[order_id] = {
+            'key': key,
+            'duration': prep_minutes * 60,
+            'started_at': status_since if preparing else None,
+            'status': 'preparing' if preparing else 'confirmed',
+            'heap_before': self._heap_at(position),
+            'ready_at': None
+        }
+        insort(self._keys, key)
+
+        changed = self._reschedule(min(index, position), now)
+        self.last_update_ms = (time.perf_counter() - started) * 1000
+        return changed
+
+    def remove(self, order_id, now=None):
+        """Remove a finished or cancelled order; returns {order_id: ready_at} that changed"""
+        if order_id not in self._entries:
+            return {}
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        changed = self._reschedule(self._unlink(order_id), now)
+        self.last_update_ms = (time.perf_counter() - started) * 1000
+        return changed
+
+    def queue(self):
+        """Scheduled orders in queue order"""
+        return [
+            {
+                'order_id': key[-1],
+                'status': self._entries[key[-1]]['status'],
+                'station': self._entries[key[-1]]['station'] + 1,
+                'start_at': self._entries[key[-1]]['start_at'],
+                'ready_at': self._entries[key[-1]]['ready_at']
+            }
+            for key in self._keys
+        ]
+
+
+# Process-wide schedule shared by all sessions
+_schedule = None
+_loaded_at = 0.0
+_schedule_lock = threading.Lock()
+
+def _fetch_open_orders(order_id=None):
+    if order_id is None:
+        return db_utils.fetch_query(OPEN_ORDERS_QUERY.format(order_filter=""), use_replica=False)
+    return db_utils.fetch_query(
+        OPEN_ORDERS_QUERY.format(order_filter="AND o.order_id = %s"),
+        (order_id,),
+        use_replica=False
+    )
+
+def _write_etas(changed):
+    """Store changed ETAs in one UPDATE"""
+    if not changed:
+        return True
+    cases = " ".join("WHEN %s THEN FROM_UNIXTIME(%s)" for _ in changed)
+    placeholders = ", ".join(["%s"] * len(changed))
+    params = []
+    for order_id, ready_at in changed.items():
+        params.extend([order_id, int(ready_at)])
+    params.extend(changed.keys())
+    return db_utils.execute_query(f"""
+        UPDATE Orders
+        SET estimated_ready_time = CASE order_id {cases} END
+        WHERE order_id IN ({placeholders})
+    """, params)
+
+def rebuild_schedule():
+    """Rebuild the schedule from the database and store every ETA"""
+    global _schedule, _loaded_at
+    orders = _fetch_open_orders()
+    schedule = KitchenSchedule(config.KITCHEN_STATIONS)
+    now = time.time()
+    changed = {}
+    if not orders.empty:
+        # Oldest first, so each order is appended to the end of the queue
+        for _, row in orders.sort_values('status_since').iterrows():
+            changed.update(schedule.upsert(
+                int(row['order_id']),
+                int(row['prep_minutes']),
+                float(row['status_since']),
+                preparing=row['order_status'] == 'preparing',
+                now=now
+            ))
+    with _schedule_lock:
+        _schedule = schedule
+        _loaded_at = time.time()
+    _write_etas(changed)
+    return schedule
+
+def get_schedule():
+    """Get the shared schedule, rebuilding it when missing or older than the resync interval"""
+    if _schedule is None or time.time() - _loaded_at > config.KITCHEN_SCHEDULE_RESYNC_SECONDS:
+        return rebuild_schedule()
+    return _schedule
+
+def refresh_order(order_id):
+    """Reschedule one order after its status or items changed, then store the ETAs that moved"""
+    schedule = get_schedule()
+    orders = _fetch_open_orders(order_id)
+    with _schedule_lock:
+        if orders.empty:
+            changed = schedule.remove(order_id)
+        else:
+            row = orders.iloc[0]
+            changed = schedule.upsert(
+                order_id,
+                int(row['prep_minutes']),
+                float(row['status_since']),
+                preparing=row['order_status'] == 'preparing'
+            )
+    return _write_etas(changed)
+
+def on_status_change(order_id, new_status):
+    """Keep the schedule in step with an order status update"""
+    if new_status in SCHEDULED_STATUSES:
+        return refresh_order(order_id)
+    schedule = get_schedule()
+    with _schedule_lock:
+        changed = schedule.remove(order_id)
+    return _write_etas(changed)
@@ -0,0 +1,45 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            # import_module holds the import lock, so this is thread-safe
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_import(name):
+    """Return a lazy stand-in for module `name` (e.g. 'plotly.express')"""
+    return LazyModule(name)
+
+
+# Heavy modules imported in the background by warm_up_imports()
+WARM_UP_MODULES = ['pandas', 'plotly.express', 'plotly.graph_objects']
+
+def warm_up_imports(modules=None):
+    """Import heavy modules in a daemon thread so the first page that needs them finds them loaded"""
+    def run():
+        for name in modules or WARM_UP_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+
+    thread = threading.Thread(target=run, name="warm-up-imports", daemon=True)
+    thread.start()
+    return thread
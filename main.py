@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 import config
 import db_utils
@@ -130,11 +129,11 @@ def render_user_switcher():
     
     # Show permissions for current role
     with st.sidebar.expander("My Permissions", expanded=False):
-        role = db_utils.get_user_role()
+        capabilities = db_utils.get_capabilities()
         
-        if role:
+        if capabilities.role:
             st.markdown("**Allowed Pages:**")
-            for page in role.get('pages', []):
+            for page in db_utils.get_allowed_pages():
                 st.markdown(f"- {page}")
             
             st.markdown("**Operations:**")
@@ -147,23 +146,20 @@ def render_user_switcher():
             ]
 
             for perm_name, perm_key in permissions:
-                if role.get(perm_key, False):
+                if capabilities.has(perm_key):
                     st.markdown(f"- {perm_name}: Yes")
                 else:
                     st.markdown(f"- {perm_name}: No")
+            
+            if not capabilities.grants_verified:
+                st.caption("Database grants not verified; showing configured permissions.")
         else:
             st.info("Full administrator access")
 
 def check_page_access(page_name):
     """Check if current user can access a page"""
-    current_user, _ = db_utils.get_current_db_user()
-    
     # Admin has access to everything
-    if current_user in ('admin', 'canteen_admin'):
-        return True
-    
-    allowed_pages = db_utils.get_allowed_pages()
-    return page_name in allowed_pages
+    return db_utils.get_capabilities().can_access(page_name)
 
 def render_access_denied():
     """Render access denied message"""
@@ -183,15 +179,13 @@ def render_access_denied():
     st.markdown("---")
     st.info("**Tip:** Switch to a different user role from the sidebar to access more features.")
 
-def main():
-    # Render user switcher in sidebar
-    render_user_switcher()
-    
+def render_sidebar_stats():
+    """Render connection status and quick stats in the sidebar"""
     with st.sidebar:
         st.markdown("### Quick Stats")
         
-        # Connection status
-        status, msg = db_utils.test_connection()
+        # Connection status (from pool health and the cached verification)
+        status, msg = db_utils.get_connection_status()
         if status:
             st.success("Connected")
             st.caption(msg)
@@ -217,6 +211,13 @@ def main():
         st.markdown("### System Info")
         st.info(f"Database: {config.DB_NAME}")
         st.info(f"Host: {config.DB_HOST}")
+
+def main():
+    # Pools, replica checks and heavy imports warm up in the background
+    db_utils.start_warm_up()
+
+    # Render user switcher in sidebar
+    render_user_switcher()
     
     # Main content
     st.markdown('<h1 class="main-header">Canteen Management System</h1>', unsafe_allow_html=True)
@@ -365,33 +366,33 @@ def main():
     # Role-based quick actions
     st.subheader("Quick Actions")
     
-    role = db_utils.get_user_role()
+    capabilities = db_utils.get_capabilities()
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        if role.get('can_create', False) or current_user in ('admin', 'canteen_admin'):
+        if capabilities.is_admin or capabilities.has('can_create'):
             if st.button("Add New User", use_container_width=True):
                 st.info("Navigate to Users → Add New User tab")
         else:
             st.button("Add New User", disabled=True, use_container_width=True)
     
     with col2:
-        if 'Orders' in db_utils.get_allowed_pages() or current_user in ('admin', 'canteen_admin'):
+        if capabilities.can_access('Orders'):
             if st.button("Create Order", use_container_width=True):
                 st.info("Navigate to Orders → New Order tab")
         else:
             st.button("Create Order", disabled=True, use_container_width=True)
     
     with col3:
-        if 'Analytics' in db_utils.get_allowed_pages() or current_user in ('admin', 'canteen_admin'):
+        if capabilities.can_access('Analytics'):
             if st.button("View Reports", use_container_width=True):
                 st.info("Navigate to Analytics page")
         else:
             st.button("View Reports", disabled=True, use_container_width=True)
     
     with col4:
-        if role.get('can_update', False) or current_user in ('admin', 'canteen_admin'):
+        if capabilities.is_admin or capabilities.has('can_update'):
             if st.button("Manage Wallets", use_container_width=True):
                 st.info("Navigate to Users → Wallet Management tab")
         else:
@@ -406,5 +407,8 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
+    # Sidebar stats need their own queries; render them after the main content
+    render_sidebar_stats()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
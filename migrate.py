@@ -0,0 +1,301 @@
+"""
+Schema migration runner
+Applies migrations/NNNN_name.sql files in order and records them in the
+schema_version table. Each statement is a step: its progress is committed
+with the statement (DDL commits on its own), so a failed migration resumes
+at the statement that failed. Statements should be safe to re-run
+(IF NOT EXISTS / IF EXISTS), as a DDL statement may have completed just
+before a failure.
+
+ALTER TABLE, CREATE INDEX and DROP INDEX statements that name no algorithm
+or lock run with ALGORITHM=INPLACE, LOCK=NONE, so the server refuses them
+rather than blocking writes; name ALGORITHM=COPY explicitly where a copy is
+intended. --dry-run prints the estimated lock impact of pending statements.
+
+Usage: python migrate.py [--dry-run | --status] [--user NAME]
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+import mysql.connector
+from mysql.connector import Error
+import config
+import sql_script
+
+# Server error for a table that does not exist
+ER_NO_SUCH_TABLE = 1146
+
+MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+SCHEMA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        steps_done INT NOT NULL DEFAULT 0,
+        steps_total INT NOT NULL,
+        status ENUM('running', 'applied') NOT NULL DEFAULT 'running',
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        applied_at TIMESTAMP NULL,
+        duration_ms INT NOT NULL DEFAULT 0
+    )
+"""
+
+# Statements that take the online DDL options, and the table they touch
+ONLINE_DDL = (
+    re.compile(r'^ALTER\s+(?:ONLINE\s+)?(?:IGNORE\s+)?TABLE\s+`?(\w+)`?', re.IGNORECASE),
+    re.compile(r'^CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?`?\w+`?\s+ON\s+`?(\w+)`?', re.IGNORECASE),
+    re.compile(r'^DROP\s+INDEX\s+(?:IF\s+EXISTS\s+)?`?\w+`?\s+ON\s+`?(\w+)`?', re.IGNORECASE)
+)
+
+# Other statements and the table they touch, for the dry-run estimate
+ROW_DML = re.compile(
+    r'^(?:UPDATE\s+(?:IGNORE\s+)?|DELETE\s+FROM\s+|INSERT\s+(?:IGNORE\s+)?INTO\s+|REPLACE\s+INTO\s+)`?(\w+)`?',
+    re.IGNORECASE
+)
+TRIGGER_TABLE = re.compile(r'^CREATE\s+(?:DEFINER\s*=\s*\S+\s+)?TRIGGER\b.*?\bON\s+`?(\w+)`?', re.IGNORECASE | re.DOTALL)
+DROP_TABLE = re.compile(r'^DROP\s+TABLE\s+(?:IF\s+EXISTS\s+)?`?(\w+)`?', re.IGNORECASE)
+
+ALGORITHM_OPTION = re.compile(r'\bALGORITHM\s*=\s*(\w+)', re.IGNORECASE)
+LOCK_OPTION = re.compile(r'\bLOCK\s*=\s*(\w+)', re.IGNORECASE)
+
+def find_migrations(directory=None):
+    """[(version, name, path)] of the migration files, in version order"""
+    directory = directory or os.path.join(os.path.dirname(os.path.abspath(__file__)), config.MIGRATIONS_DIR)
+    migrations = []
+    for filename in os.listdir(directory) if os.path.isdir(directory) else ():
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    return sorted(migrations)
+
+def _ddl_table(statement):
+    for pattern in ONLINE_DDL:
+        match = pattern.match(statement)
+        if match:
+            return match.group(1)
+    return None
+
+def with_online_options(statement):
+    """Add ALGORITHM=INPLACE, LOCK=NONE to DDL that names neither.
+
+    Partition maintenance and FULLTEXT/SPATIAL indexes are left alone, as
+    the server can't run them without locking.
+    """
+    if not config.MIGRATION_ONLINE_DDL or _ddl_table(statement) is None:
+        return statement
+    if ALGORITHM_OPTION.search(statement) or LOCK_OPTION.search(statement):
+        return statement
+    if re.search(r'\b(PARTITION|FULLTEXT|SPATIAL)\b', statement, re.IGNORECASE):
+        return statement
+    if statement.upper().startswith('ALTER'):
+        return f"{statement}, ALGORITHM=INPLACE, LOCK=NONE"
+    return f"{statement} ALGORITHM=INPLACE LOCK=NONE"
+
+def estimate_impact(statement, table_stats):
+    """(table, lock impact, estimated seconds) for one statement.
+
+    table_stats maps table name to (approx rows, bytes). Time is the table
+    size over MIGRATION_COPY_MB_PER_SECOND for statements that scan or copy it.
+    """
+    def size_of(table):
+        rows, size = table_stats.get(table, (0, 0))
+        return rows, size / 1024 / 1024
+
+    table = _ddl_table(statement)
+    if table is not None:
+        rows, mb = size_of(table)
+        # Dropping an index only changes metadata
+        seconds = 0.0 if statement.upper().startswith('DROP') else mb / config.MIGRATION_COPY_MB_PER_SECOND
+        algorithm = (ALGORITHM_OPTION.search(statement) or [None, 'DEFAULT'])[1].upper()
+        lock = (LOCK_OPTION.search(statement) or [None, 'DEFAULT'])[1].upper()
+        if lock == 'NONE':
+            impact = f"online ({algorithm}): metadata lock only at start and end; {rows} rows processed"
+        elif lock == 'EXCLUSIVE':
+            impact = f"reads and writes blocked on {table} for the whole run ({rows} rows)"
+        elif lock == 'SHARED' or algorithm == 'COPY':
+            impact = f"writes blocked on {table} while {rows} rows are copied"
+        else:
+            impact = f"server's choice of lock (may block writes on {table}, {rows} rows)"
+        return table, impact, seconds
+
+    match = ROW_DML.match(statement)
+    if match:
+        rows, mb = size_of(match.group(1))
+        return match.group(1), f"row locks on up to {rows} rows until the step commits", \
+            mb / config.MIGRATION_COPY_MB_PER_SECOND
+
+    match = TRIGGER_TABLE.match(statement)
+    if match:
+        return match.group(1), "brief metadata lock", 0.0
+
+    match = DROP_TABLE.match(statement)
+    if match:
+        rows, _ = size_of(match.group(1))
+        return match.group(1), f"drops the table ({rows} rows)", 0.0
+
+    return None, "metadata only", 0.0
+
+def _connect(username):
+    return mysql.connector.connect(
+        host=config.DB_HOST,
+        port=config.DB_PORT,
+        user=username,
+        password=config.DB_USERS[username]['password'],
+        database=config.DB_NAME
+    )
+
+def _applied_versions(cursor):
+    try:
+        cursor.execute("SELECT version, checksum, steps_done, status FROM schema_version")
+    except Error as e:
+        # No migration has run yet (a dry run doesn't create the table)
+        if e.errno == ER_NO_SUCH_TABLE:
+            return {}
+        raise
+    return {row[0]: {'checksum': row[1], 'steps_done': row[2], 'status': row[3]} for row in cursor.fetchall()}
+
+def _load(path):
+    with open(path, 'r') as f:
+        script = f.read()
+    return sql_script.split_statements(script), hashlib.sha256(script.encode()).hexdigest()
+
+def _pending(cursor, directory=None):
+    """[(version, name, statements, checksum, first step)] not yet fully applied"""
+    applied = _applied_versions(cursor)
+    pending = []
+    for version, name, path in find_migrations(directory):
+        statements, checksum = _load(path)
+        state = applied.get(version)
+        if state and state['checksum'] != checksum:
+            if state['status'] == 'applied':
+                print(f"WARNING: {version:04d}_{name} changed after it was applied; not re-run")
+                continue
+            raise RuntimeError(f"{version:04d}_{name} changed after a partial run; restore the file to resume")
+        if state and state['status'] == 'applied':
+            continue
+        pending.append((version, name, statements, checksum, state['steps_done'] if state else 0))
+    return pending
+
+def dry_run(username=None, directory=None):
+    """Print what each pending statement would lock and for roughly how long"""
+    conn = _connect(username or config.MIGRATION_USER)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH + INDEX_LENGTH
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = %s
+        """, (config.DB_NAME,))
+        table_stats = {row[0]: (int(row[1] or 0), int(row[2] or 0)) for row in cursor.fetchall()}
+
+        pending = _pending(cursor, directory)
+        if not pending:
+            print("Schema is up to date")
+        for version, name, statements, _, first_step in pending:
+            print(f"{version:04d}_{name}: {len(statements) - first_step} statement(s)")
+            total = 0.0
+            for step, statement in enumerate(statements[first_step:], start=first_step + 1):
+                statement = with_online_options(statement)
+                table, impact, seconds = estimate_impact(statement, table_stats)
+                total += seconds
+                summary = ' '.join(statement.split())[:70]
+                print(f"  {step:3d}. {summary}")
+                print(f"       {table or '-'}: {impact}, ~{seconds:.1f}s")
+            print(f"  estimated total ~{total:.1f}s")
+        cursor.close()
+    finally:
+        conn.close()
+
+def apply_pending(conn, directory=None):
+    """Apply pending migrations on an open connection. Returns the number applied; raises on the first failure."""
+    applied = 0
+    cursor = conn.cursor()
+    cursor.execute(SCHEMA_VERSION_TABLE)
+
+    for version, name, statements, checksum, first_step in _pending(cursor, directory):
+        started = time.perf_counter()
+        cursor.execute("""
+            INSERT INTO schema_version (version, name, checksum, steps_total)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE steps_total = VALUES(steps_total)
+        """, (version, name, checksum, len(statements)))
+        conn.commit()
+
+        for step in range(first_step, len(statements)):
+            try:
+                cursor.execute(with_online_options(statements[step]))
+                if cursor.with_rows:
+                    cursor.fetchall()
+                cursor.execute(
+                    "UPDATE schema_version SET steps_done = %s WHERE version = %s",
+                    (step + 1, version)
+                )
+                conn.commit()
+            except Error as e:
+                conn.rollback()
+                raise RuntimeError(f"{version:04d}_{name} failed at statement {step + 1}: {e}") from e
+
+        cursor.execute("""
+            UPDATE schema_version
+            SET status = 'applied', applied_at = NOW(), duration_ms = duration_ms + %s
+            WHERE version = %s
+        """, (int((time.perf_counter() - started) * 1000), version))
+        conn.commit()
+        applied += 1
+        print(f"Applied {version:04d}_{name} ({len(statements) - first_step} statement(s))")
+    cursor.close()
+    return applied
+
+def migrate(username=None, directory=None):
+    """Apply pending migrations to the app database"""
+    conn = _connect(username or config.MIGRATION_USER)
+    try:
+        return apply_pending(conn, directory)
+    finally:
+        conn.close()
+
+def status(username=None, directory=None):
+    """Print every migration with its state"""
+    conn = _connect(username or config.MIGRATION_USER)
+    try:
+        cursor = conn.cursor()
+        applied = _applied_versions(cursor)
+        for version, name, path in find_migrations(directory):
+            state = applied.get(version)
+            if state is None:
+                label = "pending"
+            elif state['status'] == 'running':
+                label = f"interrupted after step {state['steps_done']}"
+            else:
+                label = "applied"
+            print(f"{version:04d}_{name:<40} {label}")
+        cursor.close()
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument('--dry-run', action='store_true', help="print the estimated lock impact only")
+    parser.add_argument('--status', action='store_true', help="list migrations and their state")
+    parser.add_argument('--user', default=config.MIGRATION_USER, choices=sorted(config.DB_USERS))
+    args = parser.parse_args()
+
+    try:
+        if args.status:
+            status(args.user)
+        elif args.dry_run:
+            dry_run(args.user)
+        else:
+            migrate(args.user)
+    except (Error, RuntimeError) as e:
+        print(f"FAIL: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+-- The kitchen scheduler looks up when each open order entered its current
+-- status (MAX(changed_at) per order and status); with the status in the
+-- index that is a single index dive instead of a scan of the order's events.
+CREATE INDEX IF NOT EXISTS idx_events_order_status_time
+    ON Order_Status_Events(order_id, status, changed_at);
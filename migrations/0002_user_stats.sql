@@ -0,0 +1,114 @@
+-- Per-user lifetime order metrics, kept current by triggers on Orders.
+-- Top customers become a read of idx_user_stats_spent and per-user order
+-- counts a primary key join, instead of grouping every order.
+-- paid_order_count and total_spent only count orders whose payment completed.
+CREATE TABLE IF NOT EXISTS User_Stats (
+    user_id INT PRIMARY KEY,
+    order_count INT NOT NULL DEFAULT 0,
+    paid_order_count INT NOT NULL DEFAULT 0,
+    total_spent DECIMAL(12,2) NOT NULL DEFAULT 0,
+    first_order_at TIMESTAMP NULL,
+    last_order_at TIMESTAMP NULL,
+    CONSTRAINT fk_user_stats_user FOREIGN KEY (user_id) REFERENCES Users(user_id)
+        ON DELETE CASCADE ON UPDATE CASCADE,
+    INDEX idx_user_stats_spent (total_spent)
+);
+
+DELIMITER //
+
+-- Recompute one user's row from their orders (idx_orders_user)
+CREATE PROCEDURE IF NOT EXISTS refresh_user_stats(IN p_user_id INT)
+BEGIN
+    INSERT INTO User_Stats (user_id, order_count, paid_order_count, total_spent, first_order_at, last_order_at)
+    SELECT
+        p_user_id,
+        COUNT(*),
+        COALESCE(SUM(payment_status = 'completed'), 0),
+        COALESCE(SUM(IF(payment_status = 'completed', total_amount, 0)), 0),
+        MIN(order_date),
+        MAX(order_date)
+    FROM Orders
+    WHERE user_id = p_user_id
+    ON DUPLICATE KEY UPDATE
+        order_count = VALUES(order_count),
+        paid_order_count = VALUES(paid_order_count),
+        total_spent = VALUES(total_spent),
+        first_order_at = VALUES(first_order_at),
+        last_order_at = VALUES(last_order_at);
+END//
+
+CREATE TRIGGER IF NOT EXISTS user_stats_order_insert
+AFTER INSERT ON Orders
+FOR EACH ROW
+BEGIN
+    INSERT INTO User_Stats (user_id, order_count, paid_order_count, total_spent, first_order_at, last_order_at)
+    VALUES (NEW.user_id, 1, NEW.payment_status = 'completed',
+            IF(NEW.payment_status = 'completed', NEW.total_amount, 0), NEW.order_date, NEW.order_date)
+    ON DUPLICATE KEY UPDATE
+        order_count = order_count + 1,
+        paid_order_count = paid_order_count + VALUES(paid_order_count),
+        total_spent = total_spent + VALUES(total_spent),
+        first_order_at = LEAST(COALESCE(first_order_at, VALUES(first_order_at)), VALUES(first_order_at)),
+        last_order_at = GREATEST(COALESCE(last_order_at, VALUES(last_order_at)), VALUES(last_order_at));
+END//
+
+-- Payment and amount changes are applied as deltas; moving an order to
+-- another user or date (rare) recomputes the users involved
+CREATE TRIGGER IF NOT EXISTS user_stats_order_update
+AFTER UPDATE ON Orders
+FOR EACH ROW
+BEGIN
+    IF NEW.user_id <> OLD.user_id OR NEW.order_date <> OLD.order_date THEN
+        CALL refresh_user_stats(OLD.user_id);
+        IF NEW.user_id <> OLD.user_id THEN
+            CALL refresh_user_stats(NEW.user_id);
+        END IF;
+    ELSEIF (NEW.payment_status = 'completed' OR OLD.payment_status = 'completed')
+           AND (NEW.payment_status <> OLD.payment_status OR NEW.total_amount <> OLD.total_amount) THEN
+        UPDATE User_Stats
+        SET paid_order_count = paid_order_count
+                + (NEW.payment_status = 'completed') - (OLD.payment_status = 'completed'),
+            total_spent = total_spent
+                + IF(NEW.payment_status = 'completed', NEW.total_amount, 0)
+                - IF(OLD.payment_status = 'completed', OLD.total_amount, 0)
+        WHERE user_id = NEW.user_id;
+        -- No row yet (order predates the table): build it from Orders
+        IF ROW_COUNT() = 0 THEN
+            CALL refresh_user_stats(NEW.user_id);
+        END IF;
+    END IF;
+END//
+
+-- Deleting an order may remove the user's first or last one, so the row is
+-- recomputed; deletes (cancellations, bulk cleanup) are rare. Orders moved
+-- to Orders_Archive still count: order_archive sets @archiving_orders while
+-- it deletes them, and queries/partition_orders.sql replaces
+-- refresh_user_stats with one that reads both tables.
+CREATE TRIGGER IF NOT EXISTS user_stats_order_delete
+AFTER DELETE ON Orders
+FOR EACH ROW
+BEGIN
+    IF @archiving_orders IS NULL THEN
+        CALL refresh_user_stats(OLD.user_id);
+    END IF;
+END//
+
+DELIMITER ;
+
+-- Backfill existing orders (recomputed, so safe to re-run)
+INSERT INTO User_Stats (user_id, order_count, paid_order_count, total_spent, first_order_at, last_order_at)
+SELECT
+    user_id,
+    COUNT(*),
+    SUM(payment_status = 'completed'),
+    SUM(IF(payment_status = 'completed', total_amount, 0)),
+    MIN(order_date),
+    MAX(order_date)
+FROM Orders
+GROUP BY user_id
+ON DUPLICATE KEY UPDATE
+    order_count = VALUES(order_count),
+    paid_order_count = VALUES(paid_order_count),
+    total_spent = VALUES(total_spent),
+    first_order_at = VALUES(first_order_at),
+    last_order_at = VALUES(last_order_at);
@@ -0,0 +1,152 @@
+-- Per-item sales counters over Order_Items, kept current by triggers, so
+-- "has this item been ordered" and "total sales for this item" are a
+-- primary key lookup instead of a pass over the item's order lines.
+-- Cascaded deletes don't fire triggers: every order delete in the app
+-- removes its Order_Items explicitly first (delete_order, bulk_delete).
+-- Orders deleted any other way (e.g. by hand, where fk_orderitem_order's
+-- ON DELETE CASCADE removes the lines) leave the counters too high until
+-- refresh_item_stats() rebuilds them (Delete page -> Rebuild Item Sales
+-- Counters). Archived order lines stay counted: order_archive sets
+-- @archiving_orders while it moves them.
+CREATE TABLE IF NOT EXISTS Item_Stats (
+    item_id INT PRIMARY KEY,
+    order_count INT NOT NULL DEFAULT 0,
+    qty_sold INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+    CONSTRAINT fk_item_stats_item FOREIGN KEY (item_id) REFERENCES Menu_Items(item_id)
+        ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Named index for lookups by item (e.g. "never ordered" checks); InnoDB
+-- drops the implicit fk_orderitem_item index it created for the foreign key
+CREATE INDEX IF NOT EXISTS idx_orderitems_item ON Order_Items(item_id);
+
+DELIMITER //
+
+-- Recompute every counter from the order lines, archived ones included once
+-- queries/partition_orders.sql is applied (CALLed directly, never from a
+-- trigger, so the archive table is only opened when it exists)
+CREATE PROCEDURE IF NOT EXISTS refresh_item_stats()
+BEGIN
+    UPDATE Item_Stats SET order_count = 0, qty_sold = 0, revenue = 0;
+
+    IF EXISTS (SELECT 1 FROM information_schema.TABLES
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Order_Items_Archive') THEN
+        INSERT INTO Item_Stats (item_id, order_count, qty_sold, revenue)
+        SELECT item_id, COUNT(*), SUM(quantity), SUM(subtotal)
+        FROM (
+            SELECT item_id, quantity, subtotal FROM Order_Items
+            UNION ALL
+            SELECT item_id, quantity, subtotal FROM Order_Items_Archive
+        ) lines
+        GROUP BY item_id
+        ON DUPLICATE KEY UPDATE
+            order_count = VALUES(order_count),
+            qty_sold = VALUES(qty_sold),
+            revenue = VALUES(revenue);
+    ELSE
+        INSERT INTO Item_Stats (item_id, order_count, qty_sold, revenue)
+        SELECT item_id, COUNT(*), SUM(quantity), SUM(subtotal)
+        FROM Order_Items
+        GROUP BY item_id
+        ON DUPLICATE KEY UPDATE
+            order_count = VALUES(order_count),
+            qty_sold = VALUES(qty_sold),
+            revenue = VALUES(revenue);
+    END IF;
+END//
+
+CREATE TRIGGER IF NOT EXISTS item_stats_insert
+AFTER INSERT ON Order_Items
+FOR EACH ROW
+BEGIN
+    INSERT INTO Item_Stats (item_id, order_count, qty_sold, revenue)
+    VALUES (NEW.item_id, 1, NEW.quantity, NEW.subtotal)
+    ON DUPLICATE KEY UPDATE
+        order_count = order_count + 1,
+        qty_sold = qty_sold + VALUES(qty_sold),
+        revenue = revenue + VALUES(revenue);
+END//
+
+CREATE TRIGGER IF NOT EXISTS item_stats_update
+AFTER UPDATE ON Order_Items
+FOR EACH ROW
+BEGIN
+    IF NEW.item_id <> OLD.item_id THEN
+        UPDATE Item_Stats
+        SET order_count = order_count - 1,
+            qty_sold = qty_sold - OLD.quantity,
+            revenue = revenue - OLD.subtotal
+        WHERE item_id = OLD.item_id;
+
+        INSERT INTO Item_Stats (item_id, order_count, qty_sold, revenue)
+        VALUES (NEW.item_id, 1, NEW.quantity, NEW.subtotal)
+        ON DUPLICATE KEY UPDATE
+            order_count = order_count + 1,
+            qty_sold = qty_sold + VALUES(qty_sold),
+            revenue = revenue + VALUES(revenue);
+    ELSEIF NEW.quantity <> OLD.quantity OR NEW.subtotal <> OLD.subtotal THEN
+        UPDATE Item_Stats
+        SET qty_sold = qty_sold + NEW.quantity - OLD.quantity,
+            revenue = revenue + NEW.subtotal - OLD.subtotal
+        WHERE item_id = NEW.item_id;
+    END IF;
+END//
+
+CREATE TRIGGER IF NOT EXISTS item_stats_delete
+AFTER DELETE ON Order_Items
+FOR EACH ROW
+BEGIN
+    IF @archiving_orders IS NULL THEN
+        UPDATE Item_Stats
+        SET order_count = order_count - 1,
+            qty_sold = qty_sold - OLD.quantity,
+            revenue = revenue - OLD.subtotal
+        WHERE item_id = OLD.item_id;
+    END IF;
+END//
+
+-- Function 3 again: read the counter
+CREATE OR REPLACE FUNCTION get_total_sales_for_item(p_item_id INT)
+RETURNS DECIMAL(10,2)
+READS SQL DATA
+BEGIN
+    DECLARE total DECIMAL(10,2);
+    SELECT revenue INTO total FROM Item_Stats WHERE item_id = p_item_id;
+    RETURN IFNULL(total, 0.00);
+END//
+
+-- Procedure 7 again: check the counter, which includes archived order
+-- lines. A hard delete the server still refuses (order history the counter
+-- doesn't cover, e.g. archived before this migration) falls back to the
+-- soft delete.
+CREATE OR REPLACE PROCEDURE delete_menu_item(IN p_item_id INT)
+BEGIN
+    DECLARE v_order_count INT DEFAULT 0;
+    DECLARE v_refused BOOLEAN DEFAULT FALSE;
+
+    SELECT order_count INTO v_order_count FROM Item_Stats WHERE item_id = p_item_id;
+
+    IF v_order_count = 0 THEN
+        BEGIN
+            -- 1451: row is referenced by a foreign key; 45000: refused by a trigger
+            DECLARE CONTINUE HANDLER FOR 1451, SQLSTATE '45000' SET v_refused = TRUE;
+            DELETE FROM Menu_Items WHERE item_id = p_item_id;
+        END;
+    END IF;
+
+    IF v_order_count > 0 OR v_refused THEN
+        -- Soft delete - mark as unavailable
+        UPDATE Menu_Items
+        SET is_available = FALSE, stock = 0
+        WHERE item_id = p_item_id;
+        SELECT CONCAT('Menu item ', p_item_id, ' marked as unavailable (has order history)') AS message;
+    ELSE
+        SELECT CONCAT('Menu item ', p_item_id, ' deleted successfully') AS message;
+    END IF;
+END//
+
+DELIMITER ;
+
+-- Backfill existing order lines (recomputed, so safe to re-run)
+CALL refresh_item_stats();
@@ -0,0 +1,179 @@
+"""
+Order archival and partition maintenance
+With queries/partition_orders.sql applied, Orders and Order_Items are
+range-partitioned by month on order_date. Closed orders from old months
+are moved to Orders_Archive / Order_Items_Archive (and their status
+history to Order_Status_Events_Archive) in chunks, and the partitions they
+leave empty are dropped.
+"""
+
+from datetime import date
+from mysql.connector import Error
+import streamlit as st
+import config
+import db_utils
+
+PARTITIONED_TABLES = ('Orders', 'Order_Items')
+
+# Orders in these states are closed and may be archived
+ARCHIVE_STATUSES = ('completed', 'cancelled')
+
+def _month_start(day, offset=0):
+    """First day of the month `offset` months from day's month"""
+    month = day.year * 12 + day.month - 1 + offset
+    return date(month // 12, month % 12 + 1, 1)
+
+def get_partitions(table):
+    """Partitions of a table in order; empty if the table is not partitioned"""
+    return db_utils.fetch_query("""
+        SELECT PARTITION_NAME as name, PARTITION_DESCRIPTION as upper_bound, TABLE_ROWS as approx_rows
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (config.DB_NAME, table), use_replica=False)
+
+def is_partitioned():
+    """True once partition_orders.sql has been applied"""
+    return not get_partitions('Orders').empty
+
+def ensure_partitions(months_ahead=None):
+    """Split the catch-all pmax partition into monthly partitions.
+
+    Partitions are added from the month after the last one (or the oldest
+    order's month) up to months_ahead months from now, so new orders never
+    land in pmax. Returns {table: partitions added}.
+    """
+    months_ahead = config.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    last_month = _month_start(date.today(), months_ahead)
+    added = {}
+
+    for table in PARTITIONED_TABLES:
+        partitions = get_partitions(table)
+        if partitions.empty:
+            continue
+
+        bounds = [int(b) for b in partitions['upper_bound'] if str(b).isdigit()]
+        if bounds:
+            month = db_utils.fetch_query(
+                "SELECT DATE(FROM_UNIXTIME(%s)) as month", (max(bounds),), use_replica=False
+            )['month'][0]
+        else:
+            oldest = db_utils.fetch_query(
+                f"SELECT DATE(MIN(order_date)) as oldest FROM {table}", use_replica=False
+            )['oldest'][0]
+            month = _month_start(oldest or date.today())
+
+        new_partitions = []
+        while month <= last_month:
+            upper = _month_start(month, 1)
+            new_partitions.append(
+                f"PARTITION p{month:%Y%m} VALUES LESS THAN (UNIX_TIMESTAMP('{upper:%Y-%m-%d}'))"
+            )
+            month = upper
+
+        if new_partitions:
+            success = db_utils.execute_query(f"""
+                ALTER TABLE {table} REORGANIZE PARTITION pmax INTO (
+                    {', '.join(new_partitions)},
+                    PARTITION pmax VALUES LESS THAN MAXVALUE
+                )
+            """)
+            if not success:
+                break
+        added[table] = len(new_partitions)
+    return added
+
+def _archive_chunk(order_ids):
+    """Move a chunk of orders, with their items and status events, to the archive in one transaction.
+
+    @archiving_orders is set while the rows move, so the User_Stats and
+    Item_Stats triggers keep counting them.
+    """
+    placeholders = ", ".join(["%s"] * len(order_ids))
+    with db_utils.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET @archiving_orders = 1")
+        try:
+            cursor.execute(
+                f"INSERT INTO Order_Items_Archive SELECT * FROM Order_Items WHERE order_id IN ({placeholders})",
+                order_ids
+            )
+            cursor.execute(
+                f"INSERT INTO Orders_Archive SELECT * FROM Orders WHERE order_id IN ({placeholders})",
+                order_ids
+            )
+            cursor.execute(
+                f"INSERT INTO Order_Status_Events_Archive "
+                f"SELECT * FROM Order_Status_Events WHERE order_id IN ({placeholders})",
+                order_ids
+            )
+            cursor.execute(f"DELETE FROM Order_Items WHERE order_id IN ({placeholders})", order_ids)
+            # cascade_order_delete removes the live status events
+            cursor.execute(f"DELETE FROM Orders WHERE order_id IN ({placeholders})", order_ids)
+            conn.commit()
+        finally:
+            # Pooled sessions keep user variables; don't let later deletes skip the triggers
+            if conn.is_connected():
+                cursor.execute("SET @archiving_orders = NULL")
+        cursor.close()
+
+def archive_closed_orders(months=None, chunk_size=None):
+    """Move completed/cancelled orders older than `months` whole months to the archive tables.
+
+    Works ARCHIVE_CHUNK_SIZE orders per transaction, oldest first, so live
+    tables are only locked briefly. Returns the number of orders archived,
+    or None if the schema is not partitioned or a chunk failed.
+    """
+    months = config.ARCHIVE_AFTER_MONTHS if months is None else months
+    chunk_size = chunk_size or config.ARCHIVE_CHUNK_SIZE
+    cutoff = _month_start(date.today(), -months)
+
+    if not is_partitioned():
+        st.warning("Order archival needs queries/partition_orders.sql applied first")
+        return None
+
+    archived = 0
+    while True:
+        chunk = db_utils.fetch_query(f"""
+            SELECT order_id
+            FROM Orders
+            WHERE order_date < %s AND order_status IN ({', '.join(['%s'] * len(ARCHIVE_STATUSES))})
+            ORDER BY order_date
+            LIMIT %s
+        """, (cutoff, *ARCHIVE_STATUSES, chunk_size), use_replica=False)
+        if chunk.empty:
+            break
+        try:
+            _archive_chunk([int(order_id) for order_id in chunk['order_id']])
+        except (Error, db_utils.QueryLimitError) as e:
+            st.error(f"Archival stopped after {archived} orders: {e}")
+            return None
+        archived += len(chunk)
+    return archived
+
+def drop_empty_partitions(months=None):
+    """Drop monthly partitions older than the archive cutoff that no longer hold rows.
+
+    Returns {table: [dropped partition names]}.
+    """
+    months = config.ARCHIVE_AFTER_MONTHS if months is None else months
+    cutoff = db_utils.fetch_query(
+        "SELECT UNIX_TIMESTAMP(%s) as cutoff", (_month_start(date.today(), -months),), use_replica=False
+    )['cutoff'][0]
+    dropped = {}
+
+    for table in PARTITIONED_TABLES:
+        partitions = get_partitions(table)
+        names = []
+        for _, partition in partitions.iterrows():
+            bound = str(partition['upper_bound'])
+            if not bound.isdigit() or int(bound) > int(cutoff):
+                continue
+            rows = db_utils.fetch_query(
+                f"SELECT 1 as found FROM {table} PARTITION ({partition['name']}) LIMIT 1", use_replica=False
+            )
+            if rows.empty:
+                names.append(partition['name'])
+        if names and db_utils.execute_query(f"ALTER TABLE {table} DROP PARTITION {', '.join(names)}"):
+            dropped[table] = names
+    return dropped
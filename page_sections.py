@@ -0,0 +1,46 @@
+"""
+Lazy page sections
+st.tabs runs every tab body on each rerun, hidden or not. navigator() is a
+horizontal radio standing in for the tab bar: pages only run the selected
+section, so a rerun costs what the user is looking at. cached() keeps a
+section's query results in the session for a while, so switching back to
+a section (or toggling one of its widgets) doesn't query again.
+"""
+
+import time
+import streamlit as st
+import config
+import db_utils
+
+def navigator(labels, key):
+    """Show the section picker and return the selected label.
+
+    The selection is kept in st.session_state[key], so it survives reruns
+    triggered by widgets inside the section.
+    """
+    return st.radio("Section", labels, horizontal=True, key=key, label_visibility="collapsed")
+
+def cached(key, loader, ttl=None):
+    """Return loader(), reusing this session's result for up to ttl seconds.
+
+    key must identify everything else the result depends on (query,
+    parameters, data source); the database user is added here, since the
+    role decides which rows come back. ttl defaults to
+    config.SECTION_CACHE_SECONDS.
+    """
+    ttl = config.SECTION_CACHE_SECONDS if ttl is None else ttl
+    key = (db_utils.get_current_db_user()[0], key)
+    results = st.session_state.setdefault('_section_results', {})
+    now = time.time()
+
+    # Drop expired results so the session doesn't keep every past selection
+    for stale in [k for k, (loaded_at, _) in results.items() if now - loaded_at >= ttl]:
+        del results[stale]
+
+    if key not in results:
+        results[key] = (now, loader())
+    return results[key][1]
+
+def clear():
+    """Forget this session's cached section results"""
+    st.session_state.pop('_section_results', None)
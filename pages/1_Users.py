@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
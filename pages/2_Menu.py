@@ -1,11 +1,14 @@
 import streamlit as st
-import pandas as pd
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import db_utils
 import config
 import access_control
+import demand_forecast
+import lazy_imports
+
+pd = lazy_imports.lazy_import('pandas')
 
 st.set_page_config(
     page_title="Menu Management",
@@ -161,16 +164,24 @@ with tab1:
             
             with col2:
                 st.markdown("#### Low Stock Alert")
-                low_stock = db_utils.fetch_query("""
-                    SELECT item_name, stock 
+                # Items forecast to run out before the end of today
+                in_stock = db_utils.fetch_query("""
+                    SELECT item_id, item_name, stock 
                     FROM Menu_Items 
-                    WHERE stock <= 5 AND stock > 0
-                    ORDER BY stock ASC
-                    LIMIT 5
+                    WHERE stock > 0
                 """)
+                low_stock = in_stock
+                if not in_stock.empty:
+                    low_stock = demand_forecast.forecast_stock(in_stock)
+                    low_stock = low_stock[low_stock['runs_out_at'].notna()].sort_values('runs_out_at')
                 
                 if not low_stock.empty:
-                    st.dataframe(low_stock, hide_index=True, use_container_width=True)
+                    st.dataframe(
+                        low_stock[['item_name', 'stock', 'runs_out_at']].head(5),
+                        hide_index=True,
+                        use_container_width=True,
+                        column_config={"runs_out_at": "Runs Out By"}
+                    )
                 else:
                     st.success("All items well stocked!")
             
@@ -343,10 +354,11 @@ with tab3:
             )['count'][0]
             st.metric("Available Items", available_items)
             
-            # Low stock items
-            low_stock_count = db_utils.fetch_query(
-                "SELECT COUNT(*) as count FROM Menu_Items WHERE stock <= 5 AND stock > 0"
-            )['count'][0]
+            # Items forecast to run out today
+            low_stock_count = 0
+            if not items.empty:
+                stock_forecast = demand_forecast.forecast_stock(items)
+                low_stock_count = int(stock_forecast['runs_out_at'].notna().sum())
             st.metric("Low Stock Alert", low_stock_count, delta="⚠️" if low_stock_count > 0 else None)
             
             # Out of stock
@@ -360,6 +372,154 @@ with tab3:
     
     st.markdown("---")
     
+    # Forecast-based restock planning
+    st.subheader("Stock Forecast")
+    
+    try:
+        if not items.empty:
+            model = demand_forecast.get_model()
+            forecast = demand_forecast.forecast_stock(items, model)
+            forecast['restock_needed'] = (forecast['recommended_stock'] - forecast['stock']).clip(lower=0)
+            
+            st.caption(
+                f"Demand curves from the last {model['history_days']} days of orders "
+                f"(weekday x hour), rebuilt in {model['build_ms']:.0f} ms"
+            )
+            
+            st.dataframe(
+                forecast[['item_name', 'category_name', 'stock', 'expected_rest_of_day',
+                          'runs_out_at', 'recommended_stock', 'restock_needed']]
+                .sort_values(['restock_needed', 'item_name'], ascending=[False, True]),
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "item_name": "Item Name",
+                    "category_name": "Category",
+                    "stock": "Stock Qty",
+                    "expected_rest_of_day": "Expected Demand (rest of today)",
+                    "runs_out_at": "Runs Out By",
+                    "recommended_stock": "Recommended Stock (tomorrow)",
+                    "restock_needed": "Restock Needed"
+                }
+            )
+    
+    except Exception as e:
+        st.error(f"Error loading stock forecast: {e}")
+    
+    st.markdown("---")
+    
+    # Grid edits and CSV restocks applied in one set-based update
+    st.subheader("Bulk Stock Update")
+    
+    def show_bulk_result(result):
+        if result is None:
+            return
+        st.success(f"Stock updated for {result['changed']} item(s)")
+        if result['unknown']:
+            st.warning(f"Unknown item IDs skipped: {', '.join(str(i) for i in result['unknown'])}")
+        if not result['flipped'].empty:
+            st.markdown("**Availability changed:**")
+            flipped = result['flipped'].copy()
+            flipped['is_available'] = flipped['is_available'].apply(lambda x: "Available" if x else "Unavailable")
+            st.dataframe(flipped, use_container_width=True, hide_index=True)
+    
+    reenable = st.checkbox(
+        "Make out-of-stock items available again when restocked",
+        value=True,
+        key="bulk_reenable"
+    )
+    
+    grid_tab, csv_tab = st.tabs(["Stock Grid", "CSV Restock"])
+    
+    with grid_tab:
+        try:
+            if not items.empty:
+                grid = items[['item_id', 'item_name', 'category_name', 'stock']].copy()
+                edited = st.data_editor(
+                    grid,
+                    use_container_width=True,
+                    hide_index=True,
+                    disabled=['item_id', 'item_name', 'category_name'],
+                    column_config={
+                        "item_id": "ID",
+                        "item_name": "Item Name",
+                        "category_name": "Category",
+                        "stock": st.column_config.NumberColumn("Stock Qty", min_value=0, step=1)
+                    },
+                    key="stock_grid"
+                )
+                
+                changes = edited[edited['stock'] != grid['stock']]
+                st.info(f"{len(changes)} item(s) changed")
+                
+                if access_control.create_permission_protected_button("Save Stock Grid", "can_update", use_container_width=True):
+                    if changes.empty:
+                        st.warning("No stock changes to save")
+                    else:
+                        show_bulk_result(db_utils.bulk_update_stock(
+                            zip(changes['item_id'], changes['stock']),
+                            mode='set',
+                            reenable=reenable
+                        ))
+        except Exception as e:
+            st.error(f"Error loading stock grid: {e}")
+    
+    with csv_tab:
+        st.markdown("Upload a CSV with columns `item_id` (or `item_name`) and `quantity`.")
+        restock_mode = st.radio("Quantities are", ["Added to stock", "New stock levels"], horizontal=True)
+        uploaded = st.file_uploader("Restock CSV", type=["csv"])
+        
+        if uploaded is not None:
+            try:
+                restock = pd.read_csv(uploaded)
+                restock.columns = [c.strip().lower() for c in restock.columns]
+                
+                if 'item_id' not in restock.columns and 'item_name' in restock.columns:
+                    restock = restock.merge(items[['item_id', 'item_name']], on='item_name', how='left')
+                    missing = restock[restock['item_id'].isna()]
+                    if not missing.empty:
+                        st.warning(f"Unknown items skipped: {', '.join(missing['item_name'].astype(str))}")
+                    restock = restock.dropna(subset=['item_id'])
+                
+                if 'item_id' not in restock.columns or 'quantity' not in restock.columns:
+                    st.error("CSV needs an item_id or item_name column and a quantity column")
+                else:
+                    mode = 'add' if restock_mode == "Added to stock" else 'set'
+                    item_ids = pd.to_numeric(restock['item_id'], errors='coerce')
+                    quantities = pd.to_numeric(restock['quantity'], errors='coerce')
+                    invalid = item_ids.isna() | (item_ids % 1 != 0) | quantities.isna() | (quantities < 0) | (quantities % 1 != 0)
+                    
+                    problems = []
+                    if invalid.any():
+                        problems.append(f"{int(invalid.sum())} row(s) need a whole item_id and a whole, non-negative quantity")
+                        restock = restock[invalid]
+                    else:
+                        restock = pd.DataFrame({'item_id': item_ids.astype(int), 'quantity': quantities.astype(int)})
+                        if mode == 'add':
+                            # The same item listed twice is restocked by the total
+                            restock = restock.groupby('item_id', as_index=False)['quantity'].sum()
+                        else:
+                            repeated = restock.loc[restock['item_id'].duplicated(), 'item_id'].unique()
+                            if len(repeated):
+                                problems.append(f"Items listed more than once with new stock levels: {', '.join(map(str, repeated))}")
+                    
+                    st.dataframe(restock, use_container_width=True, hide_index=True)
+                    
+                    if problems:
+                        for problem in problems:
+                            st.error(problem)
+                        st.button("Apply Restock", disabled=True, use_container_width=True, help="Fix the CSV first")
+                    elif access_control.create_permission_protected_button("Apply Restock", "can_update", use_container_width=True):
+                        show_bulk_result(db_utils.bulk_update_stock(
+                            zip(restock['item_id'], restock['quantity']),
+                            mode=mode,
+                            reenable=reenable
+                        ))
+            except Exception as e:
+                st.error(f"Error reading restock CSV: {e}")
+    
+    st.markdown("---")
+    
     # Bulk stock update
     # st.subheader("Bulk Stock Operations")
     
@@ -4,12 +4,14 @@ Handle orders, payments, and order tracking
 """
 
 import streamlit as st
-import pandas as pd
 import sys
 import os
+from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import db_utils
 import config
+import access_control
+import kitchen_scheduler
 
 st.set_page_config(
     page_title="Orders Management",
@@ -22,7 +24,7 @@ st.markdown("Create orders, track status, and process payments")
 st.markdown("---")
 
 # Create tabs
-tab1, tab2, tab3, tab4 = st.tabs(["View Orders", "New Order", "Manage Orders", "Order Details"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["View Orders", "New Order", "Manage Orders", "Order Details", "Kitchen Queue"])
 
 # Tab 1: View Orders
 with tab1:
@@ -69,6 +71,11 @@ with tab1:
     
     query += " ORDER BY order_date DESC"
     
+    # Roles without view-all only get the rows their filter allows
+    query, role_filtered = access_control.get_filtered_query_based_on_role(query)
+    if role_filtered:
+        st.caption("Showing only the orders your role can see")
+    
     # Fetch orders
     try:
         if params:
@@ -263,13 +270,14 @@ with tab3:
         
         try:
             # Get pending/confirmed orders
-            pending_orders = db_utils.fetch_query("""
+            pending_query, _ = access_control.get_filtered_query_based_on_role("""
                 SELECT o.order_id, u.name, o.order_status, o.total_amount
                 FROM Orders o
                 JOIN Users u ON o.user_id = u.user_id
                 WHERE o.order_status IN ('pending', 'confirmed')
                 ORDER BY o.order_date DESC
             """)
+            pending_orders = db_utils.fetch_query(pending_query)
             
             if not pending_orders.empty:
                 order_options = [f"Order #{row['order_id']} - {row['name']} - ₹{row['total_amount']:.2f}" 
@@ -328,6 +336,7 @@ with tab3:
                                 'add_item_to_order',
                                 (selected_order_id, selected_item_add_id, quantity_add)
                             )
+                            kitchen_scheduler.refresh_order(selected_order_id)
                             st.success("Item added to order successfully!")
                             st.rerun()
                         except Exception as e:
@@ -345,13 +354,14 @@ with tab3:
         
         try:
             # Get orders
-            orders = db_utils.fetch_query("""
+            open_query, _ = access_control.get_filtered_query_based_on_role("""
                 SELECT o.order_id, u.name, o.order_status, o.payment_status
                 FROM Orders o
                 JOIN Users u ON o.user_id = u.user_id
                 WHERE o.order_status != 'completed' AND o.order_status != 'cancelled'
                 ORDER BY o.order_date DESC
             """)
+            orders = db_utils.fetch_query(open_query)
             
             if not orders.empty:
                 order_status_options = [f"Order #{row['order_id']} - {row['name']} ({row['order_status']})" 
@@ -395,6 +405,8 @@ with tab3:
                         )
                         
                         if success:
+                            if new_order_status != current_order_status:
+                                kitchen_scheduler.on_status_change(selected_status_order_id, new_order_status)
                             st.success("Order status updated successfully!")
                             if new_payment_status == 'completed':
                                 st.info("Wallet balance will be auto-deducted if payment method is 'wallet'")
@@ -413,12 +425,13 @@ with tab4:
     
     try:
         # Get all orders
-        all_orders = db_utils.fetch_query("""
+        all_orders_query, _ = access_control.get_filtered_query_based_on_role("""
             SELECT o.order_id, u.name, o.order_date, o.total_amount, o.order_status
             FROM Orders o
             JOIN Users u ON o.user_id = u.user_id
             ORDER BY o.order_date DESC
         """)
+        all_orders = db_utils.fetch_query(all_orders_query)
         
         if not all_orders.empty:
             order_detail_options = [f"Order #{row['order_id']} - {row['name']} - ₹{row['total_amount']:.2f}" 
@@ -436,7 +449,8 @@ with tab4:
             # Get order header
             order_header = db_utils.fetch_query(
                 "SELECT * FROM Order_Summary WHERE order_id = %s",
-                (selected_detail_order_id,)
+                (selected_detail_order_id,),
+                prepared=True
             )
             
             # Get order items
@@ -453,7 +467,7 @@ with tab4:
                 JOIN Menu_Items mi ON oi.item_id = mi.item_id
                 JOIN Categories c ON mi.category_id = c.category_id
                 WHERE oi.order_id = %s
-            """, (selected_detail_order_id,))
+            """, (selected_detail_order_id,), prepared=True)
             
             # Display order header
             col1, col2, col3 = st.columns(3)
@@ -513,3 +527,47 @@ with tab4:
     
     except Exception as e:
         st.error(f"Error loading order details: {e}")
+
+# Tab 5: Kitchen Queue
+with tab5:
+    st.subheader("Kitchen Queue")
+    st.caption(f"Confirmed and preparing orders scheduled across {config.KITCHEN_STATIONS} stations by prep time")
+    
+    try:
+        if st.button("Rebuild Schedule", key="rebuild_kitchen_schedule"):
+            kitchen_scheduler.rebuild_schedule()
+        
+        schedule = kitchen_scheduler.get_schedule()
+        queue = schedule.queue()
+        
+        if queue:
+            def clock(ts):
+                return datetime.fromtimestamp(ts).strftime('%H:%M')
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Orders in Queue", len(queue))
+            with col2:
+                st.metric("Kitchen Clear By", clock(max(entry['ready_at'] for entry in queue)))
+            with col3:
+                st.metric("Last Schedule Update", f"{schedule.last_update_ms:.3f} ms")
+            
+            st.dataframe(
+                [
+                    {
+                        'Order': entry['order_id'],
+                        'Status': entry['status'],
+                        'Station': entry['station'],
+                        'Starts': clock(entry['start_at']),
+                        'Ready (ETA)': clock(entry['ready_at'])
+                    }
+                    for entry in queue
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("No confirmed or preparing orders in the kitchen")
+    
+    except Exception as e:
+        st.error(f"Error loading kitchen queue: {e}")
@@ -1,12 +1,17 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import db_utils
 import config
+import lazy_imports
+import analytics_store
+import analytics_facts
+import chart_cache
+import page_sections
+
+# plotly is imported on first chart, after the KPIs have rendered
+go = lazy_imports.lazy_import('plotly.graph_objects')
 
 st.set_page_config(
     page_title="Reports & Analytics",
@@ -16,6 +21,37 @@ st.set_page_config(
 
 st.title("Reports & Analytics")
 st.markdown("Comprehensive insights into canteen operations")
+
+# Analytics mode: reports run on the local extract instead of MariaDB
+use_local_store = st.toggle(
+    "Use local analytics extract",
+    value=config.ANALYTICS_USE_LOCAL_STORE,
+    help="Run reports on a local copy of orders, kept current from the change feed, "
+         "instead of the transactional database"
+)
+
+if use_local_store:
+    extract = analytics_store.refresh()
+    if extract['refreshed_at']:
+        st.caption(
+            f"Extract as of {extract['refreshed_at']:%H:%M:%S} "
+            f"({extract['last_mode']} refresh, {extract['last_applied']} change(s), {extract['last_refresh_ms']} ms)"
+        )
+    if extract['last_error']:
+        st.warning(f"Extract could not be refreshed, showing older data: {extract['last_error']}")
+
+def fetch_report(query, params=None):
+    """Run a report query on the local extract or, with analytics mode off, on a replica.
+
+    Results are reused for the session for config.SECTION_CACHE_SECONDS.
+    """
+    def load():
+        if use_local_store:
+            return analytics_store.fetch(query, params)
+        return db_utils.fetch_query(query, params, use_replica=True)
+    key = ('analytics', use_local_store, query, tuple(params) if params else None)
+    return page_sections.cached(key, load)
+
 st.markdown("---")
 
 # KPI Section
@@ -24,32 +60,16 @@ st.subheader("Key Performance Indicators")
 col1, col2, col3, col4, col5 = st.columns(5)
 
 try:
-    # Total Revenue
-    total_revenue = db_utils.fetch_query("""
-        SELECT COALESCE(SUM(total_amount), 0) as revenue 
-        FROM Orders 
-        WHERE payment_status = 'completed'
-    """)['revenue'][0]
-    
-    # Total Orders
-    total_orders = db_utils.fetch_query("SELECT COUNT(*) as count FROM Orders")['count'][0]
-    
-    # Completed Orders
-    completed_orders = db_utils.fetch_query("""
-        SELECT COUNT(*) as count 
-        FROM Orders 
-        WHERE order_status = 'completed'
-    """)['count'][0]
-    
-    # Average Order Value
-    avg_order_value = db_utils.fetch_query("""
-        SELECT COALESCE(AVG(total_amount), 0) as avg_val 
-        FROM Orders 
-        WHERE payment_status = 'completed'
-    """)['avg_val'][0]
+    # One grouped scan of Orders feeds the KPIs and the Order Analytics tab
+    order_facts = fetch_report(analytics_facts.ORDER_FACTS)
+    kpi = analytics_facts.kpis(order_facts)
+    total_revenue = kpi['total_revenue']
+    total_orders = kpi['total_orders']
+    completed_orders = kpi['completed_orders']
+    avg_order_value = kpi['avg_order_value']
     
     # Total Users
-    total_users = db_utils.fetch_query("SELECT COUNT(*) as count FROM Users")['count'][0]
+    total_users = fetch_report("SELECT COUNT(*) as count FROM Users")['count'][0]
     
     with col1:
         st.metric("Total Revenue", f"₹{total_revenue:.2f}")
@@ -67,51 +87,60 @@ try:
         st.metric("Total Users", total_users)
 
 except Exception as e:
+    order_facts = None
     st.error(f"Error loading KPIs: {e}")
 
 st.markdown("---")
 
-# Create tabs for different reports
-tab1, tab2, tab3, tab4 = st.tabs(["Popular Items", "Revenue Analysis", "Customer Insights", "Order Analytics"])
+# Report sections; only the selected one runs its queries
+section = page_sections.navigator(
+    ["Popular Items", "Revenue Analysis", "Customer Insights", "Order Analytics", "Prep Times"],
+    key='analytics_section'
+)
 
-# Tab 1: Popular Items
-with tab1:
+# Popular Items
+if section == "Popular Items":
     st.subheader("Most Popular Items")
+    item_reports = None
     
     try:
-        # Get popular items from view
-        popular_items = db_utils.fetch_query("SELECT * FROM Popular_Items LIMIT 10")
+        # Per-item sales; both the top items and the category split come from it
+        item_facts = fetch_report(analytics_facts.ITEM_FACTS)
+        item_reports = analytics_facts.item_reports(item_facts) if not item_facts.empty else None
+        popular_items = item_reports['popular_items'] if item_reports else item_facts
         
         if not popular_items.empty:
             col1, col2 = st.columns([2, 1])
             
             with col1:
                 # Bar chart - Top items by quantity sold
-                fig = px.bar(
+                fig = chart_cache.figure(
+                    'bar',
                     popular_items.head(10),
                     x='item_name',
                     y='total_quantity_sold',
                     title='Top 10 Items by Quantity Sold',
                     labels={'item_name': 'Item', 'total_quantity_sold': 'Quantity Sold'},
                     color='total_quantity_sold',
-                    color_continuous_scale='viridis'
+                    color_continuous_scale='viridis',
+                    layout=dict(xaxis_tickangle=-45, height=400)
                 )
-                fig.update_layout(xaxis_tickangle=-45, height=400)
-                st.plotly_chart(fig, use_container_width=True)
+                chart_cache.plotly_chart(fig, use_container_width=True)
                 
                 # Revenue by item
                 popular_items['revenue'] = popular_items['price'] * popular_items['total_quantity_sold']
-                fig2 = px.bar(
+                fig2 = chart_cache.figure(
+                    'bar',
                     popular_items.head(10),
                     x='item_name',
                     y='revenue',
                     title='Top 10 Items by Revenue',
                     labels={'item_name': 'Item', 'revenue': 'Revenue (₹)'},
                     color='revenue',
-                    color_continuous_scale='blues'
+                    color_continuous_scale='blues',
+                    layout=dict(xaxis_tickangle=-45, height=400)
                 )
-                fig2.update_layout(xaxis_tickangle=-45, height=400)
-                st.plotly_chart(fig2, use_container_width=True)
+                chart_cache.plotly_chart(fig2, use_container_width=True)
             
             with col2:
                 st.markdown("### Top 10 Items")
@@ -152,32 +181,22 @@ with tab1:
     st.subheader("Sales by Category")
     
     try:
-        category_sales = db_utils.fetch_query("""
-            SELECT 
-                c.category_name,
-                COUNT(DISTINCT oi.order_id) as order_count,
-                SUM(oi.quantity) as total_quantity,
-                SUM(oi.subtotal) as total_revenue
-            FROM Order_Items oi
-            JOIN Menu_Items mi ON oi.item_id = mi.item_id
-            JOIN Categories c ON mi.category_id = c.category_id
-            GROUP BY c.category_id, c.category_name
-            ORDER BY total_revenue DESC
-        """)
+        category_sales = item_reports['category_sales'] if item_reports else None
         
-        if not category_sales.empty:
+        if category_sales is not None and not category_sales.empty:
             col1, col2 = st.columns(2)
             
             with col1:
                 # Pie chart
-                fig = px.pie(
+                fig = chart_cache.figure(
+                    'pie',
                     category_sales,
                     values='total_revenue',
                     names='category_name',
                     title='Revenue Distribution by Category',
                     hole=0.4
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                chart_cache.plotly_chart(fig, use_container_width=True)
             
             with col2:
                 # Table
@@ -188,63 +207,52 @@ with tab1:
     except Exception as e:
         st.error(f"Error loading category sales: {e}")
 
-# Tab 2: Revenue Analysis
-with tab2:
+def daily_revenue_figure(daily_revenue):
+    """Daily revenue line chart (built through chart_cache)"""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=daily_revenue['order_day'],
+        y=daily_revenue['daily_revenue'],
+        mode='lines+markers',
+        name='Daily Revenue',
+        line=dict(color='#4ECDC4', width=3),
+        marker=dict(size=8)
+    ))
+    fig.update_layout(
+        title='Daily Revenue Trend (Last 30 Days)',
+        xaxis_title='Date',
+        yaxis_title='Revenue (₹)',
+        height=400,
+        hovermode='x unified'
+    )
+    return fig
+
+# Revenue Analysis
+if section == "Revenue Analysis":
     st.subheader("Revenue Trends")
     
     try:
-        # Daily revenue
-        daily_revenue = db_utils.fetch_query("""
-            SELECT 
-                DATE(order_date) as order_day,
-                COUNT(*) as order_count,
-                SUM(total_amount) as daily_revenue
-            FROM Orders
-            WHERE payment_status = 'completed'
-            GROUP BY DATE(order_date)
-            ORDER BY order_day DESC
-            LIMIT 30
-        """)
+        # Paid orders per day and payment method; both charts are cut from it
+        revenue_facts = fetch_report(analytics_facts.REVENUE_FACTS)
+        revenue_reports = analytics_facts.revenue_reports(revenue_facts) if not revenue_facts.empty else None
+        daily_revenue = revenue_reports['daily_revenue'] if revenue_reports else revenue_facts
         
         if not daily_revenue.empty:
             daily_revenue = daily_revenue.sort_values('order_day')
             
             # Line chart
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=daily_revenue['order_day'],
-                y=daily_revenue['daily_revenue'],
-                mode='lines+markers',
-                name='Daily Revenue',
-                line=dict(color='#4ECDC4', width=3),
-                marker=dict(size=8)
-            ))
-            fig.update_layout(
-                title='Daily Revenue Trend (Last 30 Days)',
-                xaxis_title='Date',
-                yaxis_title='Revenue (₹)',
-                height=400,
-                hovermode='x unified'
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            fig = chart_cache.figure(daily_revenue_figure, daily_revenue)
+            chart_cache.plotly_chart(fig, use_container_width=True)
             
             # Revenue by payment method
-            payment_revenue = db_utils.fetch_query("""
-                SELECT 
-                    payment_method,
-                    COUNT(*) as order_count,
-                    SUM(total_amount) as total_revenue
-                FROM Orders
-                WHERE payment_status = 'completed'
-                GROUP BY payment_method
-                ORDER BY total_revenue DESC
-            """)
+            payment_revenue = revenue_reports['payment_revenue']
             
             col1, col2 = st.columns(2)
             
             with col1:
                 if not payment_revenue.empty:
-                    fig2 = px.bar(
+                    fig2 = chart_cache.figure(
+                        'bar',
                         payment_revenue,
                         x='payment_method',
                         y='total_revenue',
@@ -252,7 +260,7 @@ with tab2:
                         labels={'payment_method': 'Payment Method', 'total_revenue': 'Revenue (₹)'},
                         color='payment_method'
                     )
-                    st.plotly_chart(fig2, use_container_width=True)
+                    chart_cache.plotly_chart(fig2, use_container_width=True)
             
             with col2:
                 # Summary stats
@@ -282,43 +290,42 @@ with tab2:
     except Exception as e:
         st.error(f"Error loading revenue data: {e}")
 
-# Tab 3: Customer Insights
-with tab3:
+# Customer Insights
+if section == "Customer Insights":
     st.subheader("Customer Analysis")
     
     try:
-        # Top customers
-        top_customers = db_utils.fetch_query("""
-            SELECT 
-                u.name,
-                u.srn,
-                u.user_type,
-                COUNT(o.order_id) as order_count,
-                SUM(o.total_amount) as total_spent
-            FROM Users u
-            LEFT JOIN Orders o ON u.user_id = o.user_id
-            WHERE o.payment_status = 'completed'
-            GROUP BY u.user_id, u.name, u.srn, u.user_type
-            ORDER BY total_spent DESC
-            LIMIT 10
-        """)
+        if use_local_store or not db_utils.check_permission('can_view_all'):
+            # Paid orders and spend per user, feeding the top list and the user type split
+            # (the extract has no User_Stats, and staff are only granted the core tables)
+            customer_facts = fetch_report(analytics_facts.CUSTOMER_FACTS)
+            customer_reports = analytics_facts.customer_reports(customer_facts) if not customer_facts.empty else None
+        else:
+            # Per-user totals maintained by triggers: an index read and a scan of Users
+            customer_facts = None
+            customer_reports = {
+                'top_customers': fetch_report(analytics_facts.TOP_CUSTOMERS, (10,)),
+                'user_type_stats': fetch_report(analytics_facts.USER_TYPE_STATS)
+            }
+        top_customers = customer_reports['top_customers'] if customer_reports else customer_facts
         
         if not top_customers.empty:
             col1, col2 = st.columns([2, 1])
             
             with col1:
                 # Bar chart
-                fig = px.bar(
+                fig = chart_cache.figure(
+                    'bar',
                     top_customers,
                     x='name',
                     y='total_spent',
                     title='Top 10 Customers by Spending',
                     labels={'name': 'Customer', 'total_spent': 'Total Spent (₹)'},
                     color='user_type',
-                    hover_data=['srn', 'order_count']
+                    hover_data=['srn', 'order_count'],
+                    layout=dict(xaxis_tickangle=-45, height=400)
                 )
-                fig.update_layout(xaxis_tickangle=-45, height=400)
-                st.plotly_chart(fig, use_container_width=True)
+                chart_cache.plotly_chart(fig, use_container_width=True)
             
             with col2:
                 st.markdown("### Top Customers")
@@ -327,16 +334,7 @@ with tab3:
                 st.dataframe(display_cust, use_container_width=True, hide_index=True)
         
         # Customer type analysis
-        user_type_stats = db_utils.fetch_query("""
-            SELECT 
-                u.user_type,
-                COUNT(DISTINCT u.user_id) as user_count,
-                COUNT(o.order_id) as order_count,
-                COALESCE(SUM(o.total_amount), 0) as total_spent
-            FROM Users u
-            LEFT JOIN Orders o ON u.user_id = o.user_id AND o.payment_status = 'completed'
-            GROUP BY u.user_type
-        """)
+        user_type_stats = customer_reports['user_type_stats'] if customer_reports else customer_facts
         
         if not user_type_stats.empty:
             st.markdown("---")
@@ -345,65 +343,68 @@ with tab3:
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                fig = px.pie(
+                fig = chart_cache.figure(
+                    'pie',
                     user_type_stats,
                     values='user_count',
                     names='user_type',
                     title='Users by Type'
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                chart_cache.plotly_chart(fig, use_container_width=True)
             
             with col2:
-                fig = px.pie(
+                fig = chart_cache.figure(
+                    'pie',
                     user_type_stats,
                     values='order_count',
                     names='user_type',
                     title='Orders by User Type'
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                chart_cache.plotly_chart(fig, use_container_width=True)
             
             with col3:
-                fig = px.pie(
+                fig = chart_cache.figure(
+                    'pie',
                     user_type_stats,
                     values='total_spent',
                     names='user_type',
                     title='Revenue by User Type'
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                chart_cache.plotly_chart(fig, use_container_width=True)
     
     except Exception as e:
         st.error(f"Error loading customer data: {e}")
 
-# Tab 4: Order Analytics
-with tab4:
+# Order Analytics
+if section == "Order Analytics":
     st.subheader("Order Statistics")
     
     try:
+        # Cut from the same order facts as the KPIs (fetched again if they failed)
+        if order_facts is None:
+            order_facts = fetch_report(analytics_facts.ORDER_FACTS)
+        order_reports = analytics_facts.order_reports(order_facts) if not order_facts.empty else None
+        
         # Order status distribution
-        status_dist = db_utils.fetch_query("""
-            SELECT 
-                order_status,
-                COUNT(*) as count
-            FROM Orders
-            GROUP BY order_status
-            ORDER BY count DESC
-        """)
+        status_dist = order_reports['status_dist'] if order_reports else order_facts
         
         if not status_dist.empty:
             col1, col2 = st.columns(2)
             
             with col1:
-                fig = px.pie(
+                fig = chart_cache.figure(
+                    'pie',
                     status_dist,
                     values='count',
                     names='order_status',
                     title='Order Status Distribution',
                     hole=0.4
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                chart_cache.plotly_chart(fig, use_container_width=True)
             
             with col2:
-                fig = px.bar(
+                fig = chart_cache.figure(
+                    'bar',
                     status_dist,
                     x='order_status',
                     y='count',
@@ -411,19 +412,10 @@ with tab4:
                     labels={'order_status': 'Status', 'count': 'Count'},
                     color='order_status'
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                chart_cache.plotly_chart(fig, use_container_width=True)
         
         # Payment status
-        payment_dist = db_utils.fetch_query("""
-            SELECT 
-                payment_status,
-                payment_method,
-                COUNT(*) as count,
-                SUM(total_amount) as total_amount
-            FROM Orders
-            GROUP BY payment_status, payment_method
-            ORDER BY total_amount DESC
-        """)
+        payment_dist = order_reports['payment_dist'] if order_reports else order_facts
         
         if not payment_dist.empty:
             st.markdown("---")
@@ -432,13 +424,14 @@ with tab4:
             col1, col2 = st.columns(2)
             
             with col1:
-                fig = px.sunburst(
+                fig = chart_cache.figure(
+                    'sunburst',
                     payment_dist,
                     path=['payment_status', 'payment_method'],
                     values='count',
                     title='Payment Status & Method Distribution'
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                chart_cache.plotly_chart(fig, use_container_width=True)
             
             with col2:
                 display_payment = payment_dist.copy()
@@ -446,33 +439,163 @@ with tab4:
                 st.dataframe(display_payment, use_container_width=True, hide_index=True)
         
         # Hourly order pattern (if enough data)
-        hourly_pattern = db_utils.fetch_query("""
-            SELECT 
-                HOUR(order_date) as hour,
-                COUNT(*) as order_count
-            FROM Orders
-            GROUP BY HOUR(order_date)
-            ORDER BY hour
-        """)
+        hourly_pattern = order_reports['hourly_pattern'] if order_reports else order_facts
         
         if not hourly_pattern.empty and len(hourly_pattern) > 1:
             st.markdown("---")
             st.subheader("Order Pattern by Hour")
             
-            fig = px.line(
+            fig = chart_cache.figure(
+                'line',
                 hourly_pattern,
                 x='hour',
                 y='order_count',
                 title='Orders Throughout the Day',
                 labels={'hour': 'Hour of Day', 'order_count': 'Number of Orders'},
-                markers=True
+                markers=True,
+                layout=dict(height=400)
             )
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            chart_cache.plotly_chart(fig, use_container_width=True)
     
     except Exception as e:
         st.error(f"Error loading order analytics: {e}")
 
+# Prep time and time-in-state, computed from Order_Status_Events only.
+# Orders that became ready in the window are found through
+# idx_events_status_time, their timelines through idx_events_order_time.
+PREP_TIME_CTE = """
+    WITH ready AS (
+        SELECT order_id, MIN(changed_at) as ready_at
+        FROM Order_Status_Events
+        WHERE status = 'ready' AND changed_at >= NOW() - INTERVAL %s DAY
+        GROUP BY order_id
+    ),
+    prep AS (
+        SELECT 
+            r.order_id,
+            r.ready_at,
+            TIMESTAMPDIFF(SECOND, MIN(e.changed_at), r.ready_at) / 60 as prep_minutes
+        FROM ready r
+        JOIN Order_Status_Events e ON e.order_id = r.order_id
+            AND e.status IN ('confirmed', 'preparing')
+            AND e.changed_at <= r.ready_at
+        GROUP BY r.order_id, r.ready_at
+    )
+"""
+
+PREP_TIME_GROUPS = {
+    'Category': ("c.category_name", """
+        JOIN (SELECT DISTINCT oi.order_id, mi.category_id
+              FROM Order_Items oi
+              JOIN Menu_Items mi ON oi.item_id = mi.item_id) oc ON oc.order_id = p.order_id
+        JOIN Categories c ON c.category_id = oc.category_id"""),
+    'Hour': ("HOUR(p.ready_at)", ""),
+    'Day': ("DATE(p.ready_at)", "")
+}
+
+def fetch_prep_percentiles(group_name, days):
+    """p50/p95 prep minutes (confirmed/preparing -> ready) per group"""
+    group_expr, joins = PREP_TIME_GROUPS[group_name]
+    return db_utils.fetch_query(PREP_TIME_CTE + f"""
+        SELECT DISTINCT
+            {group_expr} as grp,
+            COUNT(*) OVER (PARTITION BY {group_expr}) as orders,
+            ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY p.prep_minutes)
+                  OVER (PARTITION BY {group_expr}), 1) as p50_minutes,
+            ROUND(PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY p.prep_minutes)
+                  OVER (PARTITION BY {group_expr}), 1) as p95_minutes
+        FROM prep p{joins}
+        ORDER BY grp
+    """, (days,), use_replica=True)
+
+def fetch_time_in_state(days):
+    """p50/p95 minutes spent in each order status, from consecutive events"""
+    return db_utils.fetch_query("""
+        WITH recent AS (
+            SELECT DISTINCT order_id
+            FROM Order_Status_Events
+            WHERE status IN ('ready', 'completed', 'cancelled')
+              AND changed_at >= NOW() - INTERVAL %s DAY
+        ),
+        spans AS (
+            SELECT 
+                e.order_id,
+                e.status,
+                TIMESTAMPDIFF(SECOND, e.changed_at,
+                    LEAD(e.changed_at) OVER (PARTITION BY e.order_id ORDER BY e.changed_at, e.event_id)) as seconds
+            FROM recent r
+            JOIN Order_Status_Events e ON e.order_id = r.order_id
+        ),
+        per_order AS (
+            SELECT order_id, status, SUM(seconds) / 60 as minutes
+            FROM spans
+            WHERE seconds IS NOT NULL
+            GROUP BY order_id, status
+        )
+        SELECT DISTINCT
+            status,
+            COUNT(*) OVER (PARTITION BY status) as orders,
+            ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY minutes) OVER (PARTITION BY status), 1) as p50_minutes,
+            ROUND(PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY minutes) OVER (PARTITION BY status), 1) as p95_minutes
+        FROM per_order
+        ORDER BY p50_minutes DESC
+    """, (days,), use_replica=True)
+
+# Prep Times
+if section == "Prep Times":
+    st.subheader("Preparation Times")
+    st.caption("Prep time runs from when an order is confirmed (or starts preparing) until it is ready.")
+    
+    try:
+        col1, col2 = st.columns(2)
+        with col1:
+            prep_days = st.selectbox("Period", [1, 7, 30, 90], index=1, format_func=lambda d: f"Last {d} days")
+        with col2:
+            prep_group = st.radio("Group by", list(PREP_TIME_GROUPS), horizontal=True)
+        
+        prep_stats = page_sections.cached(
+            ('analytics', 'prep', prep_group, prep_days),
+            lambda: fetch_prep_percentiles(prep_group, prep_days)
+        )
+        
+        if not prep_stats.empty:
+            fig = chart_cache.figure(
+                'bar',
+                prep_stats,
+                x='grp',
+                y=['p50_minutes', 'p95_minutes'],
+                barmode='group',
+                title=f'Prep Time by {prep_group} (p50 / p95)',
+                labels={'grp': prep_group, 'value': 'Minutes', 'variable': 'Percentile'}
+            )
+            chart_cache.plotly_chart(fig, use_container_width=True)
+            st.dataframe(prep_stats.rename(columns={'grp': prep_group}), use_container_width=True, hide_index=True)
+        else:
+            st.info("No orders reached 'ready' in this period")
+        
+        state_stats = page_sections.cached(
+            ('analytics', 'time_in_state', prep_days),
+            lambda: fetch_time_in_state(prep_days)
+        )
+        
+        if not state_stats.empty:
+            st.markdown("---")
+            st.subheader("Time in Each Status")
+            
+            fig = chart_cache.figure(
+                'bar',
+                state_stats,
+                x='status',
+                y=['p50_minutes', 'p95_minutes'],
+                barmode='group',
+                title='Minutes Spent per Status (p50 / p95)',
+                labels={'status': 'Status', 'value': 'Minutes', 'variable': 'Percentile'}
+            )
+            chart_cache.plotly_chart(fig, use_container_width=True)
+    
+    except Exception as e:
+        st.error(f"Error loading prep time analytics: {e}")
+
 # # Footer section
 # st.markdown("---")
 # st.markdown("""
@@ -2,9 +2,13 @@ import streamlit as st
 import pandas as pd
 import sys
 import os
+import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import db_utils
 import config
+import table_maintenance
+import chart_cache
+import page_sections
 
 st.set_page_config(
     page_title="Admin & Debug",
@@ -19,18 +23,18 @@ st.markdown("---")
 # Warning banner
 st.warning("**Admin Area**: These tools can modify the database structure and data. Use with caution!")
 
-# Create tabs
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+# Admin sections; only the selected one runs its queries
+section = page_sections.navigator([
     "Database Info",
     "User Privileges",
-    "Triggers", 
-    "Procedures", 
+    "Triggers",
+    "Procedures",
     "Functions",
     "Query Examples"
-])
+], key='admin_section')
 
-# Tab 1: Database Info
-with tab1:
+# Database Info
+if section == "Database Info":
     st.subheader("Database Information")
     
     # Connection test
@@ -39,9 +43,21 @@ with tab1:
         st.success(msg)
     else:
         st.error(msg)
-    
+
+    # Read replica health (lag in seconds, None = out of rotation)
+    if config.DB_REPLICA_HOSTS:
+        replica_status = db_utils.get_replica_status()
+        if replica_status:
+            replica_df = pd.DataFrame([
+                {'replica': host, 'lag_seconds': state['lag'], 'healthy': state['lag'] is not None}
+                for host, state in replica_status.items()
+            ])
+            st.dataframe(replica_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("Replica health has not been checked yet")
+
     st.markdown("---")
-    
+
     # Database statistics
     st.subheader("Table Statistics")
     
@@ -56,7 +72,7 @@ with tab1:
             SELECT 'Orders', COUNT(*) FROM Orders
             UNION ALL
             SELECT 'Order_Items', COUNT(*) FROM Order_Items
-        """)
+        """, use_replica=True)
         
         if not stats.empty:
             col1, col2 = st.columns([1, 2])
@@ -65,8 +81,8 @@ with tab1:
                 st.dataframe(stats, use_container_width=True, hide_index=True)
             
             with col2:
-                import plotly.express as px
-                fig = px.bar(
+                fig = chart_cache.figure(
+                    'bar',
                     stats,
                     x='table_name',
                     y='record_count',
@@ -75,17 +91,140 @@ with tab1:
                     color='record_count',
                     color_continuous_scale='viridis'
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                chart_cache.plotly_chart(fig, use_container_width=True)
     
     except Exception as e:
         st.error(f"Error loading stats: {e}")
     
     st.markdown("---")
-    
+
+    # Queries cancelled or refused by the per-role limits
+    st.subheader("Query Limits")
+
+    limits_df = pd.DataFrame([
+        {
+            'user': user,
+            'max_statement_time (s)': perms.get('max_statement_time'),
+            'max_concurrent_queries': perms.get('max_concurrent_queries'),
+            'max_rows': perms.get('max_rows')
+        }
+        for user, perms in config.ROLE_PERMISSIONS.items()
+    ])
+    st.dataframe(limits_df, use_container_width=True, hide_index=True)
+
+    limit_stats = db_utils.get_query_limit_stats()
+    if not limit_stats.empty:
+        st.dataframe(limit_stats, use_container_width=True, hide_index=True)
+    else:
+        st.caption("No queries have hit a limit since the server started")
+
+    st.markdown("---")
+
+    # Prepared statement reuse on pooled connections
+    st.subheader("Prepared Statement Cache")
+
+    stmt_stats = db_utils.get_statement_cache_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Cache Hits", stmt_stats['hits'])
+    with col2:
+        st.metric("Cache Misses", stmt_stats['misses'])
+    with col3:
+        st.metric("Evictions", stmt_stats['evictions'])
+    with col4:
+        st.metric("Parse Time Saved", f"{stmt_stats['saved_seconds'] * 1000:.1f} ms")
+
+    st.markdown("---")
+
+    # Plotly figures reused across reruns and sessions
+    st.subheader("Chart Cache")
+
+    chart_stats = chart_cache.get_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Cache Hits", chart_stats['hits'])
+    with col2:
+        st.metric("Cache Misses", chart_stats['misses'])
+    with col3:
+        st.metric("Cached Figures", chart_stats['figures'],
+                  help=f"About {chart_stats['bytes'] / 1024 / 1024:.1f} MB of {config.CHART_CACHE_MAX_MB} MB, "
+                       f"{chart_stats['evictions']} evicted")
+    with col4:
+        st.metric("Build Time Saved", f"{chart_stats['saved_seconds'] * 1000:.1f} ms")
+
+    st.markdown("---")
+
+    # Change data capture outbox
+    st.subheader("Change Feed")
+
+    try:
+        outbox, consumers = db_utils.get_cdc_status()
+        if not outbox.empty:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Changes in Outbox", int(outbox['pending_rows'][0]))
+            with col2:
+                st.metric("Newest Change ID", int(outbox['newest_id'][0]))
+            with col3:
+                oldest = outbox['oldest_at'][0]
+                st.metric("Oldest Change", oldest.strftime('%d/%m %H:%M') if pd.notna(oldest) else "-")
+
+        if not consumers.empty:
+            st.dataframe(consumers, use_container_width=True, hide_index=True)
+        else:
+            st.info("No CDC consumers have checkpointed yet")
+
+        gap_stats = db_utils.get_cdc_gap_stats()
+        if gap_stats['skipped']:
+            st.caption(
+                f"Gaps in this process: {gap_stats['skipped']} change id(s) skipped, "
+                f"{gap_stats['recovered']} delivered late on re-check, {gap_stats['lost']} never committed, "
+                f"{gap_stats['pending']} range(s) awaiting re-check"
+            )
+
+        if st.button(f"Purge Changes Older Than {config.CDC_RETENTION_HOURS}h", use_container_width=True):
+            deleted = db_utils.purge_change_outbox()
+            if deleted is not None:
+                st.success(f"Purged {deleted} change(s)")
+    except Exception as e:
+        st.error(f"Error loading change feed: {e}")
+
+    st.markdown("---")
+
+    # Background table maintenance (scheduled from the Delete page)
+    st.subheader("Table Maintenance")
+
+    try:
+        status = table_maintenance.get_scheduler_status()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Scheduler", "Running" if status['running'] else "Stopped")
+        with col2:
+            st.metric("Off-Peak Now", "Yes" if table_maintenance.in_window() else "No")
+        with col3:
+            last_run = status.get('last_run')
+            st.metric("Last Run", last_run.strftime('%d/%m %H:%M') if last_run else "-")
+        if status.get('last_error'):
+            st.warning(f"Last run failed: {status['last_error']}")
+
+        history = table_maintenance.get_history()
+        if not history.empty:
+            st.dataframe(history, use_container_width=True, hide_index=True)
+            st.caption(
+                f"{int(history['duration_ms'].sum()) / 1000:.1f}s spent, "
+                f"{history['reclaimed_mb'].astype(float).clip(lower=0).sum():.1f} MB reclaimed over the runs shown"
+            )
+        else:
+            st.info("No maintenance has run yet")
+    except Exception as e:
+        st.error(f"Error loading maintenance history: {e}")
+
+    st.markdown("---")
+
     # Table structures
     st.subheader("Table Structures")
     
-    tables = ['Users', 'Categories', 'Menu_Items', 'Orders', 'Order_Items']
+    tables = ['Users', 'Categories', 'Menu_Items', 'Orders', 'Order_Items', 'Order_Status_Events', 'Change_Outbox', 'CDC_Checkpoints', 'Maintenance_History', 'User_Stats', 'Item_Stats']
     
     selected_table = st.selectbox("Select Table to View Structure", tables)
     
@@ -120,8 +259,8 @@ with tab1:
             except Exception as e:
                 st.error(f"Error: {e}")
 
-# Tab 2: User Privileges
-with tab2:
+# User Privileges
+if section == "User Privileges":
     st.subheader("Database Users and Privileges")
     
     st.info("""
@@ -151,8 +290,8 @@ with tab2:
     
 
 
-# Tab 3: Triggers
-with tab3:
+# Triggers
+if section == "Triggers":
     st.subheader("Database Triggers")
     
     try:
@@ -239,8 +378,8 @@ with tab3:
         else:
             st.success("All items have healthy stock levels")
 
-# Tab 4: Procedures
-with tab4:
+# Procedures
+if section == "Procedures":
     st.subheader("Stored Procedures")
     
     try:
@@ -377,8 +516,8 @@ with tab4:
                 except Exception as e:
                     st.error(f"Error: {e}")
 
-# Tab 5: Functions
-with tab5:
+# Functions
+if section == "Functions":
     st.subheader("Stored Functions")
     
     try:
@@ -465,8 +604,47 @@ with tab5:
                 except Exception as e:
                     st.error(f"Error: {e}")
 
-# Tab 6: Query Examples
-with tab6:
+    st.markdown("---")
+
+    # Batch vs looped function calls
+    with st.expander("Benchmark: Batch vs Looped Function Calls"):
+        st.markdown("Evaluate a function for every ID with one `call_function_batch` statement versus one `call_function` per ID")
+
+        bench_sources = {
+            'get_wallet_balance': "SELECT user_id FROM Users",
+            'get_order_total': "SELECT order_id FROM Orders",
+            'get_total_sales_for_item': "SELECT item_id FROM Menu_Items"
+        }
+        bench_func = st.selectbox("Function", list(bench_sources.keys()), key="bench_func")
+
+        if st.button("Run Benchmark", key="run_bench"):
+            try:
+                ids = db_utils.fetch_query(bench_sources[bench_func]).iloc[:, 0].tolist()
+                param_rows = [(int(i),) for i in ids]
+
+                start = time.perf_counter()
+                looped = [db_utils.call_function(bench_func, row) for row in param_rows]
+                looped_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                batched = db_utils.call_function_batch(bench_func, param_rows)
+                batch_time = time.perf_counter() - start
+
+                bench_df = pd.DataFrame([
+                    {'method': 'Looped call_function', 'statements': len(param_rows), 'time_ms': looped_time * 1000},
+                    {'method': 'call_function_batch', 'statements': 1, 'time_ms': batch_time * 1000}
+                ])
+                st.dataframe(bench_df, use_container_width=True, hide_index=True)
+
+                if batched == looped:
+                    st.success(f"Results match for {len(param_rows)} IDs - batch is {looped_time / max(batch_time, 1e-9):.1f}x faster")
+                else:
+                    st.error("Batched results differ from looped results")
+            except Exception as e:
+                st.error(f"Error: {e}")
+
+# Query Examples
+if section == "Query Examples":
     st.subheader("SQL Query Examples")
     
     st.info("This section demonstrates the different types of queries used in the application")
@@ -496,7 +674,7 @@ with tab6:
     
     if st.button("Run Nested Query", key="run_nested"):
         try:
-            result = db_utils.fetch_query(nested_query)
+            result = db_utils.fetch_query(nested_query, use_replica=True)
             if not result.empty:
                 st.success(f"Found {len(result)} users spending above average")
                 st.dataframe(result, use_container_width=True, hide_index=True)
@@ -535,7 +713,7 @@ with tab6:
     
     if st.button("Run JOIN Query", key="run_join"):
         try:
-            result = db_utils.fetch_query(join_query)
+            result = db_utils.fetch_query(join_query, use_replica=True)
             if not result.empty:
                 st.success(f"Retrieved {len(result)} order items")
                 st.dataframe(result, use_container_width=True, hide_index=True)
@@ -571,7 +749,7 @@ with tab6:
     
     if st.button("Run Aggregate Query", key="run_aggregate"):
         try:
-            result = db_utils.fetch_query(aggregate_query)
+            result = db_utils.fetch_query(aggregate_query, use_replica=True)
             if not result.empty:
                 st.success(f"Category statistics calculated")
                 
@@ -639,7 +817,7 @@ with tab6:
     
     if st.button("Run Selected Query", key="run_example"):
         try:
-            result = db_utils.fetch_query(query_examples[selected_example])
+            result = db_utils.fetch_query(query_examples[selected_example], use_replica=True)
             if not result.empty:
                 st.success(f"Query executed successfully - {len(result)} rows returned")
                 st.dataframe(result, use_container_width=True, hide_index=True)
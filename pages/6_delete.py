@@ -4,12 +4,14 @@ Handle deletion of users, menu items, and orders with proper validation
 """
 
 import streamlit as st
-import pandas as pd
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import db_utils
 import config
+import order_archive
+import bulk_delete
+import table_maintenance
 
 st.set_page_config(
     page_title="Delete Operations",
@@ -24,6 +26,42 @@ st.markdown("---")
 # Warning banner
 st.error("**Warning**: Deletion operations cannot be easily undone. Please verify before confirming.")
 
+def render_bulk_delete(job_name, button_label):
+    """Start or resume a bulk delete job, with a progress bar while it runs"""
+    job = bulk_delete.JOBS[job_name]
+    try:
+        remaining = bulk_delete.count_remaining(job_name)
+        state = bulk_delete.get_job_state(job_name)
+        interrupted = state is not None and state['status'] == 'running' and not state['active']
+        
+        st.caption(f"{job['label']}: {remaining} row(s) to delete, {config.BULK_DELETE_CHUNK_SIZE} per chunk")
+        if interrupted:
+            st.info(
+                f"Interrupted run: {state['deleted_rows']} of {state['total_rows']} row(s) deleted "
+                f"(up to #{state['last_key']}), resume to continue"
+            )
+            button_label = f"Resume: {button_label}"
+        
+        if st.button(button_label, type="secondary", key=f"bulk_{job_name}", disabled=remaining == 0 and not interrupted):
+            bar = st.progress(0.0)
+            status = st.empty()
+            
+            def show_progress(progress):
+                bar.progress(min(progress['deleted_rows'] / max(progress['total_rows'], 1), 1.0))
+                status.caption(
+                    f"{progress['deleted_rows']} / {progress['total_rows']} deleted, "
+                    f"pausing {progress['pause']:.2f}s"
+                    + (f" ({progress['lock_waits']} lock wait(s))" if progress['lock_waits'] else "")
+                )
+            
+            deleted = bulk_delete.run_job(job_name, progress=show_progress)
+            if deleted is not None:
+                bar.progress(1.0)
+                st.success(f"{deleted} row(s) deleted")
+    except Exception as e:
+        st.error(f"Error: {e}")
+
+
 # Create tabs
 tab1, tab2, tab3, tab4 = st.tabs(["Delete Orders", "Delete Menu Items", "Delete Users", "Delete History"])
 
@@ -111,7 +149,7 @@ with tab1:
                             FROM Order_Items oi
                             JOIN Menu_Items mi ON oi.item_id = mi.item_id
                             WHERE oi.order_id = %s
-                        """, (order_id_to_delete,))
+                        """, (order_id_to_delete,), prepared=True)
                         
                         if not order_items.empty:
                             st.markdown("**Items in this order:**")
@@ -182,9 +220,10 @@ with tab2:
                     mi.price,
                     mi.stock,
                     mi.is_available,
-                    COALESCE((SELECT COUNT(*) FROM Order_Items WHERE item_id = mi.item_id), 0) as order_count
+                    COALESCE(ist.order_count, 0) as order_count
                 FROM Menu_Items mi
                 JOIN Categories c ON mi.category_id = c.category_id
+                LEFT JOIN Item_Stats ist ON ist.item_id = mi.item_id
                 ORDER BY c.category_name, mi.item_name
             """)
             
@@ -275,6 +314,9 @@ with tab2:
             st.metric("Unavailable Items", unavailable_items)
         except Exception as e:
             st.error(f"Error loading stats: {e}")
+        
+        st.markdown("### Bulk Cleanup")
+        render_bulk_delete('unordered_unavailable_items', "Delete Unused Unavailable Items")
 
 # Tab 3: Delete Users
 with tab3:
@@ -300,8 +342,9 @@ with tab3:
                     u.email,
                     u.user_type,
                     u.wallet_balance,
-                    COALESCE((SELECT COUNT(*) FROM Orders WHERE user_id = u.user_id), 0) as order_count
+                    COALESCE(us.order_count, 0) as order_count
                 FROM Users u
+                LEFT JOIN User_Stats us ON us.user_id = u.user_id
                 ORDER BY u.name
             """)
             
@@ -395,6 +438,9 @@ with tab3:
             st.metric("Users without Orders", users_no_orders)
         except Exception as e:
             st.error(f"Error loading stats: {e}")
+        
+        st.markdown("### Bulk Cleanup")
+        render_bulk_delete('users_without_orders', "Delete Inactive Users")
 
 # Tab 4: Deletion History
 with tab4:
@@ -475,24 +521,82 @@ with tab4:
     with col1:
         st.markdown("### Clear Old Data")
         
-        if st.button("Delete All Cancelled Orders", type="secondary"):
+        render_bulk_delete('cancelled_orders', "Delete All Cancelled Orders")
+        
+        st.markdown("### Archive Old Orders")
+        st.caption(
+            f"Moves completed and cancelled orders older than {config.ARCHIVE_AFTER_MONTHS} months "
+            f"to the archive tables, {config.ARCHIVE_CHUNK_SIZE} orders per transaction."
+        )
+        
+        if st.button("Archive Closed Orders", type="secondary"):
             try:
-                query = "DELETE FROM Orders WHERE order_status = 'cancelled'"
-                success = db_utils.execute_query(query)
-                if success:
-                    st.success("All cancelled orders deleted!")
-                    st.rerun()
+                archived = order_archive.archive_closed_orders()
+                if archived is not None:
+                    st.success(f"{archived} order(s) archived")
+                    dropped = order_archive.drop_empty_partitions()
+                    for table, names in dropped.items():
+                        st.info(f"Dropped empty {table} partitions: {', '.join(names)}")
             except Exception as e:
                 st.error(f"Error: {e}")
-    
-    with col2:
-        st.markdown("### Vacuum Operations")
         
-        if st.button("Optimize Database Tables", type="secondary"):
+        if st.button("Maintain Partitions", type="secondary"):
             try:
-                tables = ['Users', 'Orders', 'Order_Items', 'Menu_Items', 'Categories']
-                for table in tables:
-                    db_utils.execute_query(f"OPTIMIZE TABLE {table}")
-                st.success("All tables optimized!")
+                added = order_archive.ensure_partitions()
+                if added:
+                    for table, count in added.items():
+                        st.success(f"{table}: {count} monthly partition(s) added")
+                else:
+                    st.info("Orders is not partitioned (apply queries/partition_orders.sql)")
             except Exception as e:
-                st.error(f"Error: {e}")
\ No newline at end of file
+                st.error(f"Error: {e}")
+        
+        st.markdown("### Rebuild Sales Counters")
+        st.caption(
+            "Recomputes Item_Stats from all order lines, archived ones included. Needed after orders "
+            "are deleted outside the app: the cascade to Order_Items skips the counter triggers."
+        )
+        
+        if st.button("Rebuild Item Sales Counters", type="secondary"):
+            if db_utils.call_procedure('refresh_item_stats') is not None:
+                st.success("Item sales counters rebuilt")
+    
+    with col2:
+        st.markdown("### Table Maintenance")
+        st.caption(
+            f"ANALYZE and online rebuilds run in the background between "
+            f"{config.MAINTENANCE_WINDOW_START_HOUR:02d}:00 and {config.MAINTENANCE_WINDOW_END_HOUR:02d}:00, "
+            f"only for tables that need them."
+        )
+        
+        try:
+            plan = table_maintenance.get_plan()
+            if not plan.empty:
+                due = plan[plan['action'].notna()]
+                st.dataframe(
+                    due[['table_name', 'action', 'reason']] if not due.empty else due,
+                    use_container_width=True,
+                    hide_index=True
+                )
+                if due.empty:
+                    st.success("No table needs maintenance")
+            
+            status = table_maintenance.get_scheduler_status()
+            if status['running']:
+                st.info(
+                    f"Scheduler running (started by {status['user']})"
+                    + (f", now: {status['current']}" if status.get('current') else "")
+                )
+                if st.button("Stop Maintenance Scheduler", type="secondary"):
+                    table_maintenance.stop_scheduler()
+                    st.rerun()
+            elif st.button(
+                "Start Maintenance Scheduler",
+                type="secondary",
+                disabled=not db_utils.get_capabilities().is_admin,
+                help="Rebuilds need ALTER privileges, so only administrators can start it"
+            ):
+                table_maintenance.start_scheduler()
+                st.rerun()
+        except Exception as e:
+            st.error(f"Error: {e}")
@@ -0,0 +1,398 @@
+"""
+Test and benchmark database provisioning
+Builds a template database once (queries/queries.sql without its users,
+grants and verification queries, then the migrations, then optional
+generated data), snapshots it to a dump file, and clones it into
+throwaway databases in seconds.
+
+The template is tagged with a hash of the schema files and generator
+settings: `prepare` reuses it while the hash matches, restores the matching
+snapshot when there is one, and only rebuilds from scratch otherwise.
+
+Usage:
+    python provision_db.py prepare [--users N --orders N --days N]
+    python provision_db.py snapshot | restore
+    python provision_db.py clone NAME | drop NAME
+"""
+
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import hashlib
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+import mysql.connector
+from mysql.connector import Error
+import config
+import migrate
+import sql_script
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_FILE = os.path.join(BASE_DIR, 'queries', 'queries.sql')
+
+# Statements in queries.sql that are not part of the schema: the database
+# itself, server-wide users and grants, and the verification output
+SKIPPED_STATEMENTS = re.compile(
+    r'^(SELECT|SHOW|DESCRIBE|DESC|EXPLAIN|USE|DROP\s+DATABASE|CREATE\s+DATABASE|'
+    r'DROP\s+USER|CREATE\s+USER|GRANT|REVOKE|FLUSH)\b',
+    re.IGNORECASE
+)
+
+DEFINER_CLAUSE = re.compile(r'\s*DEFINER\s*=\s*`[^`]*`@`[^`]*`', re.IGNORECASE)
+
+CLIENTS = {
+    'dump': ('mariadb-dump', 'mysqldump'),
+    'client': ('mariadb', 'mysql')
+}
+
+# Marks the template with the hash it was built from; not copied to clones
+MARKER_TABLE = 'Provision_Info'
+
+def _connect(database=None):
+    """Server connection with the account that can create databases"""
+    return mysql.connector.connect(
+        host=config.DB_HOST,
+        port=config.DB_PORT,
+        user=config.DB_USER,
+        password=config.DB_PASSWORD,
+        database=database
+    )
+
+def _generator_settings(users=None, orders=None, days=None):
+    return {
+        'users': config.PROVISION_USERS if users is None else users,
+        'orders': config.PROVISION_ORDERS if orders is None else orders,
+        'days': config.PROVISION_DAYS if days is None else days
+    }
+
+def schema_hash(settings):
+    """Hash of queries.sql, the migration files and the generator settings"""
+    digest = hashlib.sha256()
+    for path in [SCHEMA_FILE] + [path for _, _, path in migrate.find_migrations()]:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    digest.update(repr(sorted(settings.items())).encode())
+    return digest.hexdigest()
+
+def _snapshot_path(digest):
+    return os.path.join(BASE_DIR, config.PROVISION_SNAPSHOT_DIR, f"{config.PROVISION_TEMPLATE_DB}_{digest[:12]}.sql")
+
+def _template_hash(cursor):
+    try:
+        cursor.execute(f"SELECT schema_hash FROM `{config.PROVISION_TEMPLATE_DB}`.{MARKER_TABLE}")
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except Error:
+        return None
+
+def _mark_template(cursor, digest):
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {MARKER_TABLE} (schema_hash CHAR(64) NOT NULL)")
+    cursor.execute(f"DELETE FROM {MARKER_TABLE}")
+    cursor.execute(f"INSERT INTO {MARKER_TABLE} VALUES (%s)", (digest,))
+
+def generate_data(conn, users, orders, days, seed=42):
+    """Add generated users and orders spread over the last `days` days.
+
+    Menu items and categories are the seeded ones. Orders older than a day
+    are completed (some cancelled); the rest are spread over the open
+    statuses. Change_Outbox is emptied afterwards, as production purges it.
+    """
+    rng = random.Random(seed)
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT COALESCE(MAX(user_id), 0) FROM Users")
+    first_user = cursor.fetchone()[0] + 1
+    user_rows = [
+        (user_id, f"GEN{user_id:08d}", f"User {user_id}", f"user{user_id}@gen.pes.edu",
+         rng.choice(['student'] * 8 + ['faculty', 'staff']), round(rng.uniform(0, 2000), 2))
+        for user_id in range(first_user, first_user + users)
+    ]
+    for start in range(0, len(user_rows), 1000):
+        cursor.executemany("""
+            INSERT INTO Users (user_id, srn, name, email, user_type, wallet_balance)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, user_rows[start:start + 1000])
+    conn.commit()
+
+    cursor.execute("SELECT user_id FROM Users")
+    user_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT item_id, price FROM Menu_Items")
+    items = [(row[0], float(row[1])) for row in cursor.fetchall()]
+    cursor.execute("SELECT COALESCE(MAX(order_id), 0) FROM Orders")
+    first_order = cursor.fetchone()[0] + 1
+
+    now = datetime.now().replace(microsecond=0)
+    order_rows, item_rows = [], []
+    for order_id in range(first_order, first_order + orders):
+        # Meal-time peaks over the campus day
+        order_date = now - timedelta(days=rng.randrange(days), seconds=rng.randrange(86400))
+        order_date = order_date.replace(hour=rng.choice([8, 9, 11, 12, 12, 13, 13, 14, 16, 17]))
+        if order_date > now:
+            order_date -= timedelta(days=1)
+
+        chosen = rng.sample(items, rng.randint(1, min(4, len(items))))
+        total = 0.0
+        for item_id, price in chosen:
+            quantity = rng.choice([1, 1, 1, 2, 2, 3])
+            total += price * quantity
+            item_rows.append((order_id, item_id, quantity, price, price * quantity))
+
+        if now - order_date > timedelta(days=1):
+            status = 'cancelled' if rng.random() < 0.05 else 'completed'
+        else:
+            status = rng.choice(['pending', 'confirmed', 'preparing', 'ready', 'completed'])
+        method = rng.choice(['wallet', 'wallet', 'upi', 'upi', 'cash', 'card'])
+        payment = 'refunded' if status == 'cancelled' else ('pending' if status == 'pending' else 'completed')
+        order_rows.append((order_id, rng.choice(user_ids), order_date, round(total, 2), status, method, payment))
+
+    for start in range(0, len(order_rows), 1000):
+        cursor.executemany("""
+            INSERT INTO Orders (order_id, user_id, order_date, total_amount, order_status, payment_method, payment_status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, order_rows[start:start + 1000])
+        conn.commit()
+    for start in range(0, len(item_rows), 2000):
+        cursor.executemany("""
+            INSERT INTO Order_Items (order_id, item_id, quantity, unit_price, subtotal)
+            VALUES (%s, %s, %s, %s, %s)
+        """, item_rows[start:start + 2000])
+        conn.commit()
+
+    cursor.execute("TRUNCATE TABLE Change_Outbox")
+    conn.commit()
+    cursor.close()
+
+def build_template(settings):
+    """Build the template from scratch and tag it. Returns the hash."""
+    digest = schema_hash(settings)
+    template = config.PROVISION_TEMPLATE_DB
+    with open(SCHEMA_FILE, 'r') as f:
+        statements = [s for s in sql_script.split_statements(f.read()) if not SKIPPED_STATEMENTS.match(s)]
+
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{template}`")
+        cursor.execute(f"CREATE DATABASE `{template}`")
+        cursor.execute(f"USE `{template}`")
+        for statement in statements:
+            cursor.execute(statement)
+            if cursor.with_rows:
+                cursor.fetchall()
+        conn.commit()
+
+        migrate.apply_pending(conn)
+        if settings['users'] or settings['orders']:
+            generate_data(conn, settings['users'], settings['orders'], settings['days'])
+        _mark_template(cursor, digest)
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    return digest
+
+def _client(kind):
+    """Path of the dump or command-line client, preferring the MariaDB names"""
+    for candidate in CLIENTS[kind]:
+        path = shutil.which(candidate)
+        if path:
+            return path
+    raise RuntimeError(f"None of {', '.join(CLIENTS[kind])} found on PATH")
+
+def _client_args():
+    return [f"--host={config.DB_HOST}", f"--port={config.DB_PORT}", f"--user={config.DB_USER}"]
+
+def _client_env():
+    # The password goes through the environment, not the process list
+    return dict(os.environ, MYSQL_PWD=config.DB_PASSWORD)
+
+def snapshot(digest=None):
+    """Dump the template (schema, routines, triggers, data) to the snapshot file"""
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        digest = digest or _template_hash(cursor)
+        cursor.close()
+    finally:
+        conn.close()
+    if digest is None:
+        raise RuntimeError("No template to snapshot; run prepare first")
+
+    path = _snapshot_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as out:
+        subprocess.run(
+            [_client('dump'), *_client_args(), '--single-transaction', '--routines', '--triggers',
+             '--skip-comments', config.PROVISION_TEMPLATE_DB],
+            stdout=out, env=_client_env(), check=True
+        )
+    return path
+
+def restore(digest):
+    """Recreate the template from its snapshot; False if there is none"""
+    path = _snapshot_path(digest)
+    if not os.path.exists(path):
+        return False
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{config.PROVISION_TEMPLATE_DB}`")
+        cursor.execute(f"CREATE DATABASE `{config.PROVISION_TEMPLATE_DB}`")
+        cursor.close()
+    finally:
+        conn.close()
+    with open(path, 'rb') as dump:
+        subprocess.run(
+            [_client('client'), *_client_args(), config.PROVISION_TEMPLATE_DB],
+            stdin=dump, env=_client_env(), check=True
+        )
+    return True
+
+def prepare(users=None, orders=None, days=None):
+    """Make sure the template matches the current schema; returns how it got there"""
+    settings = _generator_settings(users, orders, days)
+    digest = schema_hash(settings)
+
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        current = _template_hash(cursor)
+        cursor.close()
+    finally:
+        conn.close()
+
+    if current == digest:
+        return 'reused'
+    if restore(digest):
+        return 'restored'
+    build_template(settings)
+    snapshot(digest)
+    return 'built'
+
+def _copy_definitions(cursor, template, target, kind, names):
+    """Recreate views, triggers or routines from the template in the target database"""
+    pending = list(names)
+    # Views may select from other views, so retry until no progress is made
+    while pending:
+        failed = []
+        for name in pending:
+            cursor.execute(f"SHOW CREATE {kind} `{template}`.`{name}`")
+            row = cursor.fetchone()
+            definition = row[1] if kind == 'VIEW' else row[2]
+            definition = DEFINER_CLAUSE.sub('', definition).replace(f"`{template}`.", f"`{target}`.")
+            try:
+                cursor.execute(definition)
+            except Error:
+                if kind != 'VIEW':
+                    raise
+                failed.append(name)
+        if len(failed) == len(pending):
+            raise RuntimeError(f"Could not recreate views: {', '.join(failed)}")
+        pending = failed
+
+def clone(target):
+    """Create database `target` as a copy of the template. Returns seconds taken."""
+    started = time.perf_counter()
+    template = config.PROVISION_TEMPLATE_DB
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{target}`")
+        cursor.execute(f"CREATE DATABASE `{target}`")
+        cursor.execute(f"USE `{target}`")
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+
+        cursor.execute("""
+            SELECT TABLE_NAME, TABLE_TYPE FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME <> %s
+        """, (template, MARKER_TABLE))
+        objects = cursor.fetchall()
+        tables = [name for name, kind in objects if kind == 'BASE TABLE']
+        views = [name for name, kind in objects if kind == 'VIEW']
+
+        # SHOW CREATE TABLE keeps foreign keys and partitions, unlike CREATE TABLE ... LIKE
+        for table in tables:
+            cursor.execute(f"SHOW CREATE TABLE `{template}`.`{table}`")
+            cursor.execute(cursor.fetchone()[1])
+            cursor.execute(f"INSERT INTO `{table}` SELECT * FROM `{template}`.`{table}`")
+        conn.commit()
+
+        _copy_definitions(cursor, template, target, 'VIEW', views)
+        for kind in ('PROCEDURE', 'FUNCTION'):
+            cursor.execute("""
+                SELECT ROUTINE_NAME FROM information_schema.ROUTINES
+                WHERE ROUTINE_SCHEMA = %s AND ROUTINE_TYPE = %s
+            """, (template, kind))
+            _copy_definitions(cursor, template, target, kind, [row[0] for row in cursor.fetchall()])
+        # Triggers last, so copying the rows did not fire them
+        cursor.execute("""
+            SELECT TRIGGER_NAME FROM information_schema.TRIGGERS
+            WHERE TRIGGER_SCHEMA = %s ORDER BY EVENT_OBJECT_TABLE, ACTION_ORDER
+        """, (template,))
+        _copy_definitions(cursor, template, target, 'TRIGGER', [row[0] for row in cursor.fetchall()])
+        cursor.close()
+    finally:
+        conn.close()
+    return time.perf_counter() - started
+
+def drop(target):
+    """Drop a cloned database (never the template or the app database)"""
+    if target in (config.PROVISION_TEMPLATE_DB, config.DB_NAME):
+        raise RuntimeError(f"Refusing to drop {target}")
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{target}`")
+        cursor.close()
+    finally:
+        conn.close()
+
+@contextmanager
+def cloned_database(name=None):
+    """Clone the template for one test or benchmark and drop it afterwards; yields the database name"""
+    name = name or f"{config.PROVISION_TEMPLATE_DB}_{uuid.uuid4().hex[:8]}"
+    clone(name)
+    try:
+        yield name
+    finally:
+        drop(name)
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision test and benchmark databases")
+    parser.add_argument('command', choices=['prepare', 'snapshot', 'restore', 'clone', 'drop'])
+    parser.add_argument('name', nargs='?', help="database to clone into or drop")
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--orders', type=int)
+    parser.add_argument('--days', type=int)
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'prepare':
+            started = time.perf_counter()
+            how = prepare(args.users, args.orders, args.days)
+            print(f"Template {config.PROVISION_TEMPLATE_DB} {how} in {time.perf_counter() - started:.1f}s")
+        elif args.command == 'snapshot':
+            print(f"Snapshot written to {snapshot()}")
+        elif args.command == 'restore':
+            digest = schema_hash(_generator_settings(args.users, args.orders, args.days))
+            print("Template restored" if restore(digest) else "No snapshot for the current schema")
+        elif args.name is None:
+            parser.error(f"{args.command} needs a database name")
+        elif args.command == 'clone':
+            print(f"Cloned {config.PROVISION_TEMPLATE_DB} into {args.name} in {clone(args.name):.1f}s")
+        else:
+            drop(args.name)
+            print(f"Dropped {args.name}")
+    except (Error, RuntimeError, subprocess.CalledProcessError) as e:
+        print(f"FAIL: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+-- =====================================================
+-- MONTHLY PARTITIONING OF ORDERS AND ORDER_ITEMS
+-- Apply after queries.sql:  mysql -u root -p < queries/partition_orders.sql
+-- Then create the monthly partitions from the app (Delete -> Database
+-- Cleanup Utilities -> Maintain Partitions, i.e. order_archive.ensure_partitions).
+-- =====================================================
+
+USE canteen;
+
+-- InnoDB partitioned tables cannot have foreign keys (in either direction),
+-- so the keys touching Orders and Order_Items are dropped and their rules
+-- are kept by the triggers below. Ids are never updated, so ON UPDATE
+-- CASCADE is not replaced.
+ALTER TABLE Order_Items
+    DROP FOREIGN KEY fk_orderitem_order,
+    DROP FOREIGN KEY fk_orderitem_item;
+ALTER TABLE Order_Status_Events DROP FOREIGN KEY fk_event_order;
+ALTER TABLE Orders DROP FOREIGN KEY fk_order_user;
+
+-- Order_Items carries its order's date so both tables partition the same way
+ALTER TABLE Order_Items
+    ADD COLUMN order_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP AFTER order_id;
+
+UPDATE Order_Items oi
+JOIN Orders o ON o.order_id = oi.order_id
+SET oi.order_date = o.order_date;
+
+-- Every unique key must include the partitioning column
+ALTER TABLE Orders
+    MODIFY order_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (order_id, order_date);
+
+ALTER TABLE Order_Items
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (order_item_id, order_date),
+    DROP INDEX uk_order_item,
+    ADD UNIQUE KEY uk_order_item (order_id, item_id, order_date);
+
+-- Archive tables for closed periods (same columns, not partitioned)
+CREATE TABLE Orders_Archive LIKE Orders;
+CREATE TABLE Order_Items_Archive LIKE Order_Items;
+CREATE TABLE Order_Status_Events_Archive LIKE Order_Status_Events;
+
+-- Live and archived orders together, for reports over all history
+CREATE VIEW All_Orders AS
+SELECT * FROM Orders
+UNION ALL
+SELECT * FROM Orders_Archive;
+
+-- A single catch-all partition; order_archive.ensure_partitions splits it by month
+ALTER TABLE Orders
+PARTITION BY RANGE (UNIX_TIMESTAMP(order_date)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+ALTER TABLE Order_Items
+PARTITION BY RANGE (UNIX_TIMESTAMP(order_date)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+
+DELIMITER //
+
+-- Replaces fk_order_user (RESTRICT): orders need an existing user
+CREATE TRIGGER check_order_user
+BEFORE INSERT ON Orders
+FOR EACH ROW
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM Users WHERE user_id = NEW.user_id) THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Order references a user that does not exist';
+    END IF;
+END//
+
+-- Replaces fk_orderitem_order / fk_orderitem_item and copies the order date
+CREATE TRIGGER check_order_item_refs
+BEFORE INSERT ON Order_Items
+FOR EACH ROW
+BEGIN
+    DECLARE v_order_date TIMESTAMP DEFAULT NULL;
+
+    SELECT order_date INTO v_order_date
+    FROM Orders
+    WHERE order_id = NEW.order_id;
+
+    IF v_order_date IS NULL THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Order item references an order that does not exist';
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM Menu_Items WHERE item_id = NEW.item_id) THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Order item references a menu item that does not exist';
+    END IF;
+
+    SET NEW.order_date = v_order_date;
+END//
+
+-- Replaces ON DELETE CASCADE from Orders to Order_Items and Order_Status_Events
+-- (order_archive copies both to their archive tables before deleting orders)
+CREATE TRIGGER cascade_order_delete
+AFTER DELETE ON Orders
+FOR EACH ROW
+BEGIN
+    DELETE FROM Order_Items WHERE order_id = OLD.order_id;
+    DELETE FROM Order_Status_Events WHERE order_id = OLD.order_id;
+END//
+
+-- Replaces fk_order_user (ON DELETE RESTRICT), including archived orders
+CREATE TRIGGER restrict_user_delete
+BEFORE DELETE ON Users
+FOR EACH ROW
+BEGIN
+    IF EXISTS (SELECT 1 FROM Orders WHERE user_id = OLD.user_id)
+       OR EXISTS (SELECT 1 FROM Orders_Archive WHERE user_id = OLD.user_id) THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Cannot delete user with existing orders. Cancel orders first.';
+    END IF;
+END//
+
+-- Replaces fk_orderitem_item (ON DELETE RESTRICT), including archived orders
+CREATE TRIGGER restrict_menu_item_delete
+BEFORE DELETE ON Menu_Items
+FOR EACH ROW
+BEGIN
+    IF EXISTS (SELECT 1 FROM Order_Items WHERE item_id = OLD.item_id)
+       OR EXISTS (SELECT 1 FROM Order_Items_Archive WHERE item_id = OLD.item_id) THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Cannot delete a menu item that has been ordered';
+    END IF;
+END//
+
+-- refresh_user_stats (migrations/0002_user_stats.sql) again: archived
+-- orders stay in the user's lifetime metrics
+CREATE OR REPLACE PROCEDURE refresh_user_stats(IN p_user_id INT)
+BEGIN
+    INSERT INTO User_Stats (user_id, order_count, paid_order_count, total_spent, first_order_at, last_order_at)
+    SELECT
+        p_user_id,
+        COUNT(*),
+        COALESCE(SUM(payment_status = 'completed'), 0),
+        COALESCE(SUM(IF(payment_status = 'completed', total_amount, 0)), 0),
+        MIN(order_date),
+        MAX(order_date)
+    FROM (
+        SELECT payment_status, total_amount, order_date FROM Orders WHERE user_id = p_user_id
+        UNION ALL
+        SELECT payment_status, total_amount, order_date FROM Orders_Archive WHERE user_id = p_user_id
+    ) o
+    ON DUPLICATE KEY UPDATE
+        order_count = VALUES(order_count),
+        paid_order_count = VALUES(paid_order_count),
+        total_spent = VALUES(total_spent),
+        first_order_at = VALUES(first_order_at),
+        last_order_at = VALUES(last_order_at);
+END//
+
+-- delete_menu_item is not redefined here: the version in
+-- migrations/0003_item_stats.sql checks Item_Stats, which keeps archived
+-- order lines, and falls back to a soft delete when
+-- restrict_menu_item_delete refuses the hard delete.
+
+DELIMITER ;
+
+-- Verification
+SELECT TABLE_NAME, PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+FROM information_schema.PARTITIONS
+WHERE TABLE_SCHEMA = 'canteen' AND TABLE_NAME IN ('Orders', 'Order_Items');
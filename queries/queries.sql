@@ -12,11 +12,15 @@ DROP USER IF EXISTS 'canteen_readonly'@'localhost';
 CREATE USER 'canteen_admin'@'localhost' IDENTIFIED BY 'admin_pass_123';
 GRANT ALL PRIVILEGES ON canteen.* TO 'canteen_admin'@'localhost';
 GRANT CREATE USER ON *.* TO 'canteen_admin'@'localhost';
+-- Lets the app read replica lag (SHOW SLAVE STATUS) when read replicas are configured
+GRANT SLAVE MONITOR ON *.* TO 'canteen_admin'@'localhost';
 
 -- Create Manager User (Can manage data but not structure)
 CREATE USER 'canteen_manager'@'localhost' IDENTIFIED BY 'manager_pass_123';
 GRANT SELECT, INSERT, UPDATE, DELETE ON canteen.* TO 'canteen_manager'@'localhost';
 GRANT EXECUTE ON canteen.* TO 'canteen_manager'@'localhost';
+-- Bulk stock updates stage rows in a temporary table
+GRANT CREATE TEMPORARY TABLES ON canteen.* TO 'canteen_manager'@'localhost';
 
 -- Create Staff User (Limited CRUD operations)
 CREATE USER 'canteen_staff'@'localhost' IDENTIFIED BY 'staff_pass_123';
@@ -112,6 +116,63 @@ CREATE TABLE Order_Items (
     UNIQUE KEY uk_order_item (order_id, item_id)
 );
 
+-- Append-only history of order status changes, written by triggers on Orders
+CREATE TABLE Order_Status_Events (
+    event_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    order_id INT NOT NULL,
+    status ENUM('pending', 'confirmed', 'preparing', 'ready', 'completed', 'cancelled') NOT NULL,
+    previous_status ENUM('pending', 'confirmed', 'preparing', 'ready', 'completed', 'cancelled') NULL,
+    payment_status ENUM('pending', 'completed', 'failed', 'refunded') NOT NULL,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_event_order FOREIGN KEY (order_id) REFERENCES Orders(order_id) 
+        ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Change data capture: every row change on the core tables, in commit-ish order
+CREATE TABLE Change_Outbox (
+    change_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    table_name VARCHAR(30) NOT NULL,
+    row_id INT NOT NULL,
+    operation ENUM('INSERT', 'UPDATE', 'DELETE') NOT NULL,
+    payload JSON,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Last change_id each CDC consumer has processed
+CREATE TABLE CDC_Checkpoints (
+    consumer VARCHAR(50) PRIMARY KEY,
+    last_change_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Progress of resumable bulk deletes (bulk_delete.py)
+CREATE TABLE Bulk_Delete_Jobs (
+    job_name VARCHAR(50) PRIMARY KEY,
+    last_key BIGINT NOT NULL DEFAULT 0,
+    deleted_rows INT NOT NULL DEFAULT 0,
+    total_rows INT NOT NULL DEFAULT 0,
+    status ENUM('running', 'done') NOT NULL DEFAULT 'running',
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- One row per ANALYZE / online rebuild run by table_maintenance.py
+CREATE TABLE Maintenance_History (
+    history_id INT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(64) NOT NULL,
+    operation ENUM('analyze', 'rebuild') NOT NULL,
+    reason VARCHAR(100),
+    started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    duration_ms INT NOT NULL DEFAULT 0,
+    size_before BIGINT NOT NULL DEFAULT 0,
+    size_after BIGINT NOT NULL DEFAULT 0,
+    free_before BIGINT NOT NULL DEFAULT 0,
+    free_after BIGINT NOT NULL DEFAULT 0,
+    status ENUM('ok', 'failed') NOT NULL,
+    error TEXT,
+    INDEX idx_maintenance_table_time (table_name, started_at)
+);
+
 
 CREATE INDEX idx_users_srn ON Users(srn);
 CREATE INDEX idx_users_email ON Users(email);
@@ -120,7 +181,19 @@ CREATE INDEX idx_menu_available ON Menu_Items(is_available);
 CREATE INDEX idx_orders_user ON Orders(user_id);
 CREATE INDEX idx_orders_status ON Orders(order_status);
 CREATE INDEX idx_orders_date ON Orders(order_date);
+-- Backs role-filtered order lists (e.g. staff: today's orders in a given status)
+CREATE INDEX idx_orders_status_date ON Orders(order_status, order_date);
 CREATE INDEX idx_orderitems_order ON Order_Items(order_id);
+-- Timeline of one order, and "orders that entered a status in a time range"
+CREATE INDEX idx_events_order_time ON Order_Status_Events(order_id, changed_at);
+CREATE INDEX idx_events_status_time ON Order_Status_Events(status, changed_at);
+-- Retention purge finds old changes by time
+CREATE INDEX idx_outbox_changed ON Change_Outbox(changed_at);
+
+-- Staff read order timelines (kitchen ETAs, prep time analytics); granted here as the table exists now
+GRANT SELECT ON canteen.Order_Status_Events TO 'canteen_staff'@'localhost';
+-- The Analytics page's local extract follows the change feed for every role that can open it
+GRANT SELECT ON canteen.Change_Outbox TO 'canteen_staff'@'localhost';
 
 
 INSERT INTO Categories (category_name, description) VALUES
@@ -242,6 +315,202 @@ BEGIN
     END IF;
 END//
 
+-- Trigger 4: Record the initial status of new orders
+CREATE TRIGGER record_order_created
+AFTER INSERT ON Orders
+FOR EACH ROW
+BEGIN
+    INSERT INTO Order_Status_Events (order_id, status, previous_status, payment_status, changed_at)
+    VALUES (NEW.order_id, NEW.order_status, NULL, NEW.payment_status, NEW.order_date);
+END//
+
+-- Trigger 5: Record order and payment status changes
+CREATE TRIGGER record_order_status_change
+AFTER UPDATE ON Orders
+FOR EACH ROW
+BEGIN
+    IF NEW.order_status <> OLD.order_status
+       OR NEW.payment_status <> OLD.payment_status THEN
+        INSERT INTO Order_Status_Events (order_id, status, previous_status, payment_status)
+        VALUES (NEW.order_id, NEW.order_status, OLD.order_status, NEW.payment_status);
+    END IF;
+END//
+
+DELIMITER ;
+
+-- Orders inserted above predate the triggers; start their history at the current status
+INSERT INTO Order_Status_Events (order_id, status, previous_status, payment_status, changed_at)
+SELECT order_id, order_status, NULL, payment_status, order_date
+FROM Orders
+WHERE order_id NOT IN (SELECT order_id FROM Order_Status_Events);
+
+
+-- Change data capture triggers: append every change to Change_Outbox.
+-- Payloads carry the columns consumers react to (NEW values, OLD on delete).
+DELIMITER //
+
+CREATE TRIGGER cdc_orders_insert
+AFTER INSERT ON Orders
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Orders', NEW.order_id, 'INSERT', JSON_OBJECT(
+            'user_id', NEW.user_id,
+            'order_status', NEW.order_status,
+            'payment_status', NEW.payment_status,
+            'payment_method', NEW.payment_method,
+            'total_amount', NEW.total_amount,
+            'estimated_ready_time', NEW.estimated_ready_time
+        ));
+END//
+
+CREATE TRIGGER cdc_orders_update
+AFTER UPDATE ON Orders
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Orders', NEW.order_id, 'UPDATE', JSON_OBJECT(
+            'user_id', NEW.user_id,
+            'order_status', NEW.order_status,
+            'payment_status', NEW.payment_status,
+            'payment_method', NEW.payment_method,
+            'total_amount', NEW.total_amount,
+            'estimated_ready_time', NEW.estimated_ready_time
+        ));
+END//
+
+CREATE TRIGGER cdc_orders_delete
+AFTER DELETE ON Orders
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Orders', OLD.order_id, 'DELETE', JSON_OBJECT(
+            'user_id', OLD.user_id,
+            'order_status', OLD.order_status,
+            'payment_status', OLD.payment_status,
+            'payment_method', OLD.payment_method,
+            'total_amount', OLD.total_amount,
+            'estimated_ready_time', OLD.estimated_ready_time
+        ));
+END//
+
+CREATE TRIGGER cdc_order_items_insert
+AFTER INSERT ON Order_Items
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Order_Items', NEW.order_item_id, 'INSERT', JSON_OBJECT(
+            'order_id', NEW.order_id,
+            'item_id', NEW.item_id,
+            'quantity', NEW.quantity,
+            'unit_price', NEW.unit_price,
+            'subtotal', NEW.subtotal
+        ));
+END//
+
+CREATE TRIGGER cdc_order_items_update
+AFTER UPDATE ON Order_Items
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Order_Items', NEW.order_item_id, 'UPDATE', JSON_OBJECT(
+            'order_id', NEW.order_id,
+            'item_id', NEW.item_id,
+            'quantity', NEW.quantity,
+            'unit_price', NEW.unit_price,
+            'subtotal', NEW.subtotal
+        ));
+END//
+
+CREATE TRIGGER cdc_order_items_delete
+AFTER DELETE ON Order_Items
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Order_Items', OLD.order_item_id, 'DELETE', JSON_OBJECT(
+            'order_id', OLD.order_id,
+            'item_id', OLD.item_id,
+            'quantity', OLD.quantity,
+            'unit_price', OLD.unit_price,
+            'subtotal', OLD.subtotal
+        ));
+END//
+
+CREATE TRIGGER cdc_menu_items_insert
+AFTER INSERT ON Menu_Items
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Menu_Items', NEW.item_id, 'INSERT', JSON_OBJECT(
+            'category_id', NEW.category_id,
+            'item_name', NEW.item_name,
+            'price', NEW.price,
+            'stock', NEW.stock,
+            'is_available', NEW.is_available
+        ));
+END//
+
+CREATE TRIGGER cdc_menu_items_update
+AFTER UPDATE ON Menu_Items
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Menu_Items', NEW.item_id, 'UPDATE', JSON_OBJECT(
+            'category_id', NEW.category_id,
+            'item_name', NEW.item_name,
+            'price', NEW.price,
+            'stock', NEW.stock,
+            'is_available', NEW.is_available
+        ));
+END//
+
+CREATE TRIGGER cdc_menu_items_delete
+AFTER DELETE ON Menu_Items
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Menu_Items', OLD.item_id, 'DELETE', JSON_OBJECT(
+            'category_id', OLD.category_id,
+            'item_name', OLD.item_name,
+            'price', OLD.price,
+            'stock', OLD.stock,
+            'is_available', OLD.is_available
+        ));
+END//
+
+CREATE TRIGGER cdc_users_insert
+AFTER INSERT ON Users
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Users', NEW.user_id, 'INSERT', JSON_OBJECT(
+            'user_type', NEW.user_type,
+            'wallet_balance', NEW.wallet_balance
+        ));
+END//
+
+CREATE TRIGGER cdc_users_update
+AFTER UPDATE ON Users
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Users', NEW.user_id, 'UPDATE', JSON_OBJECT(
+            'user_type', NEW.user_type,
+            'wallet_balance', NEW.wallet_balance
+        ));
+END//
+
+CREATE TRIGGER cdc_users_delete
+AFTER DELETE ON Users
+FOR EACH ROW
+BEGIN
+    INSERT INTO Change_Outbox (table_name, row_id, operation, payload)
+    VALUES ('Users', OLD.user_id, 'DELETE', JSON_OBJECT(
+            'user_type', OLD.user_type,
+            'wallet_balance', OLD.wallet_balance
+        ));
+END//
+
 DELIMITER ;
 
 
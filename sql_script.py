@@ -0,0 +1,91 @@
+"""
+SQL script tokenizer
+Splits a script into statements the way the mysql client does: honours
+DELIMITER commands (for procedure and trigger bodies), quoted strings and
+identifiers, and comments.
+"""
+
+import re
+
+DELIMITER_COMMAND = re.compile(r'DELIMITER[ \t]+(\S+)[ \t]*(?:\r?\n|$)', re.IGNORECASE)
+
+def split_statements(script):
+    """Return the statements of a script, without delimiters or comments.
+
+    Ordinary comments are dropped; /*! ... */ version comments are kept as
+    the server executes them. A DELIMITER command is only recognised at the
+    start of a statement, like in the mysql client.
+    """
+    statements = []
+    current = []
+    delimiter = ';'
+    i = 0
+    n = len(script)
+
+    while i < n:
+        char = script[i]
+
+        # DELIMITER is a client command, not SQL; it must start a statement
+        if char in 'dD' and not ''.join(current).strip():
+            match = DELIMITER_COMMAND.match(script, i)
+            if match and (i == 0 or script[i - 1] in '\r\n \t'):
+                delimiter = match.group(1)
+                current = []
+                i = match.end()
+                continue
+
+        if script.startswith(delimiter, i):
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            i += len(delimiter)
+            continue
+
+        if char in ("'", '"', '`'):
+            end = _string_end(script, i)
+            current.append(script[i:end])
+            i = end
+            continue
+
+        if char == '#' or (script.startswith('--', i) and (i + 2 == n or script[i + 2] in ' \t\r\n')):
+            end = script.find('\n', i)
+            i = n if end == -1 else end
+            continue
+
+        if script.startswith('/*', i):
+            end = script.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            if script.startswith('/*!', i):
+                current.append(script[i:end])
+            else:
+                current.append(' ')
+            i = end
+            continue
+
+        current.append(char)
+        i += 1
+
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+def _string_end(script, start):
+    """Index just past the quoted string or identifier starting at start"""
+    quote = script[start]
+    i = start + 1
+    n = len(script)
+    while i < n:
+        char = script[i]
+        if char == '\\' and quote != '`':
+            i += 2
+            continue
+        if char == quote:
+            # A doubled quote is an escaped quote, not the end
+            if i + 1 < n and script[i + 1] == quote:
+                i += 2
+                continue
+            return i + 1
+        i += 1
+    return n
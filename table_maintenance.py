@@ -0,0 +1,257 @@
+"""
+Online table maintenance
+Picks the tables that need work from information_schema (free space left
+by deletes, statistics not refreshed since the table last changed) and runs
+ANALYZE TABLE or an online rebuild on them from a background thread, only
+inside the off-peak window. Every run is recorded in Maintenance_History.
+"""
+
+from datetime import datetime
+import threading
+import time
+import mysql.connector
+from mysql.connector import Error
+import config
+import db_utils
+import lazy_imports
+
+pd = lazy_imports.lazy_import('pandas')
+
+# Size, free space and last change of every InnoDB table in the schema
+TABLE_STATS_QUERY = """
+    SELECT
+        TABLE_NAME as table_name,
+        TABLE_ROWS as approx_rows,
+        DATA_LENGTH + INDEX_LENGTH as used_bytes,
+        DATA_FREE as free_bytes,
+        UPDATE_TIME as updated_at
+    FROM information_schema.TABLES
+    WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE' AND ENGINE = 'InnoDB'
+    ORDER BY TABLE_NAME
+"""
+
+# Last successful run of each operation per table
+LAST_RUNS_QUERY = """
+    SELECT table_name, operation, MAX(started_at) as last_run
+    FROM Maintenance_History
+    WHERE status = 'ok'
+    GROUP BY table_name, operation
+"""
+
+# Rebuilds copy the table in place while reads and writes continue; if the
+# server can't do that for a table the ALTER fails instead of locking it
+OPERATIONS = {
+    'analyze': "ANALYZE TABLE {table}",
+    'rebuild': "ALTER TABLE {table} FORCE, ALGORITHM=INPLACE, LOCK=NONE"
+}
+
+# Background scheduler shared by all sessions
+_scheduler = None
+_stop = threading.Event()
+_status = {}
+_scheduler_lock = threading.Lock()
+
+def in_window(now=None):
+    """True inside the off-peak window (which may wrap past midnight)"""
+    hour = (now or datetime.now()).hour
+    start, end = config.MAINTENANCE_WINDOW_START_HOUR, config.MAINTENANCE_WINDOW_END_HOUR
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+def plan_maintenance(stats, last_runs, now=None):
+    """Decide the operation each table needs.
+
+    A table is rebuilt when its free space is both over
+    MAINTENANCE_MIN_FREE_MB and over MAINTENANCE_FRAGMENTATION_RATIO of its
+    size (the rebuild refreshes statistics too). Otherwise it is analyzed
+    when it changed since its last ANALYZE, or was never analyzed, and that
+    was over MAINTENANCE_ANALYZE_AFTER_HOURS ago. Returns stats with
+    fragmentation, action (None when nothing is due) and reason columns.
+    """
+    now = now or datetime.now()
+    plan = stats.copy()
+    last = {(row['table_name'], row['operation']): row['last_run'] for _, row in last_runs.iterrows()}
+
+    actions, reasons, fragmentation = [], [], []
+    for _, row in plan.iterrows():
+        used, free = int(row['used_bytes'] or 0), int(row['free_bytes'] or 0)
+        ratio = free / (used + free) if used + free else 0.0
+        fragmentation.append(round(ratio, 3))
+
+        analyzed = max(
+            [t for t in (last.get((row['table_name'], 'analyze')), last.get((row['table_name'], 'rebuild'))) if t is not None],
+            default=None
+        )
+        updated = row['updated_at'] if pd.notna(row['updated_at']) else None
+
+        if free >= config.MAINTENANCE_MIN_FREE_MB * 1024 * 1024 and ratio >= config.MAINTENANCE_FRAGMENTATION_RATIO:
+            actions.append('rebuild')
+            reasons.append(f"{free / 1024 / 1024:.1f} MB free ({ratio:.0%})")
+        elif analyzed is None:
+            actions.append('analyze')
+            reasons.append("never analyzed")
+        elif (now - analyzed).total_seconds() > config.MAINTENANCE_ANALYZE_AFTER_HOURS * 3600 and \
+                (updated is None or updated > analyzed):
+            actions.append('analyze')
+            reasons.append(f"changed since {analyzed:%d/%m %H:%M}")
+        else:
+            actions.append(None)
+            reasons.append("")
+
+    plan['fragmentation'] = fragmentation
+    plan['action'] = actions
+    plan['reason'] = reasons
+    return plan
+
+def get_plan():
+    """Current plan for the Delete page (session credentials)"""
+    stats = db_utils.fetch_query(TABLE_STATS_QUERY, (config.DB_NAME,), use_replica=False)
+    last_runs = db_utils.fetch_query(LAST_RUNS_QUERY, use_replica=False)
+    if last_runs.empty:
+        last_runs = pd.DataFrame(columns=['table_name', 'operation', 'last_run'])
+    return plan_maintenance(stats, last_runs) if not stats.empty else stats
+
+def get_history(limit=100):
+    """Most recent maintenance runs, newest first"""
+    return db_utils.fetch_query("""
+        SELECT table_name, operation, reason, started_at, duration_ms,
+               ROUND(free_before / 1048576, 1) as free_mb_before,
+               ROUND(free_after / 1048576, 1) as free_mb_after,
+               ROUND((size_before - size_after) / 1048576, 1) as reclaimed_mb,
+               status, error
+        FROM Maintenance_History
+        ORDER BY started_at DESC
+        LIMIT %s
+    """, (limit,), use_replica=True)
+
+def _connect(username, password):
+    """Dedicated connection for maintenance, outside the app's pools and query slots.
+
+    No statement timeout, and DDL gives up quickly instead of queueing the
+    app behind a metadata lock.
+    """
+    conn = mysql.connector.connect(
+        host=config.DB_HOST,
+        port=config.DB_PORT,
+        user=username,
+        password=password,
+        database=config.DB_NAME
+    )
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SET SESSION max_statement_time = 0, lock_wait_timeout = {int(config.MAINTENANCE_LOCK_WAIT_SECONDS)}"
+    )
+    cursor.close()
+    return conn
+
+def _fetch(conn, query, params=None):
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    frame = pd.DataFrame(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+    cursor.close()
+    return frame
+
+def _table_size(cursor, table):
+    cursor.execute("""
+        SELECT DATA_LENGTH + INDEX_LENGTH + DATA_FREE, DATA_FREE
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
+    """, (config.DB_NAME, table))
+    size, free = cursor.fetchone()
+    return int(size or 0), int(free or 0)
+
+def _run_operation(conn, table, operation, reason):
+    """Run one operation and record it in Maintenance_History"""
+    cursor = conn.cursor()
+    size_before, free_before = _table_size(cursor, table)
+    started_at = datetime.now()
+    started = time.perf_counter()
+    error = None
+    try:
+        cursor.execute(OPERATIONS[operation].format(table=table))
+        # ANALYZE/ALTER report problems as result rows rather than errors
+        for row in cursor.fetchall() if cursor.with_rows else ():
+            if len(row) >= 4 and str(row[2]).lower() == 'error':
+                error = str(row[3])
+    except Error as e:
+        error = str(e)
+    duration_ms = int((time.perf_counter() - started) * 1000)
+    size_after, free_after = _table_size(cursor, table)
+
+    cursor.execute("""
+        INSERT INTO Maintenance_History
+            (table_name, operation, reason, started_at, duration_ms,
+             size_before, size_after, free_before, free_after, status, error)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, (table, operation, reason, started_at, duration_ms,
+          size_before, size_after, free_before, free_after,
+          'failed' if error else 'ok', error))
+    conn.commit()
+    cursor.close()
+    return error is None
+
+def run_maintenance(username, password):
+    """Plan and run all due operations, one table at a time. Returns the number run."""
+    conn = _connect(username, password)
+    try:
+        stats = _fetch(conn, TABLE_STATS_QUERY, (config.DB_NAME,))
+        last_runs = _fetch(conn, LAST_RUNS_QUERY)
+        plan = plan_maintenance(stats, last_runs)
+        done = 0
+        for _, row in plan[plan['action'].notna()].iterrows():
+            if _stop.is_set() or not in_window():
+                break
+            with _scheduler_lock:
+                _status['current'] = f"{row['action']} {row['table_name']}"
+            _run_operation(conn, row['table_name'], row['action'], row['reason'])
+            done += 1
+        return done
+    finally:
+        with _scheduler_lock:
+            _status['current'] = None
+        conn.close()
+
+def _scheduler_loop(username, password):
+    while not _stop.is_set():
+        if in_window():
+            try:
+                ran = run_maintenance(username, password)
+                with _scheduler_lock:
+                    _status.update(last_run=datetime.now(), last_count=ran, last_error=None)
+            except Exception as e:
+                with _scheduler_lock:
+                    _status.update(last_run=datetime.now(), last_error=str(e))
+        with _scheduler_lock:
+            _status['last_check'] = datetime.now()
+        _stop.wait(config.MAINTENANCE_CHECK_SECONDS)
+
+def start_scheduler():
+    """Start the background scheduler with the current user's credentials.
+
+    Returns False if it is already running in this process.
+    """
+    global _scheduler
+    username, password = db_utils.get_current_db_user()
+    with _scheduler_lock:
+        if _scheduler is not None and _scheduler.is_alive():
+            return False
+        _stop.clear()
+        _status.clear()
+        _status.update(user=username, started_at=datetime.now(), current=None)
+        _scheduler = threading.Thread(
+            target=_scheduler_loop, args=(username, password), name="table-maintenance", daemon=True
+        )
+        _scheduler.start()
+    return True
+
+def stop_scheduler():
+    """Stop the scheduler after the operation in progress (if any) finishes"""
+    _stop.set()
+
+def get_scheduler_status():
+    """Scheduler state as a dict; 'running' is False when it was never started or has stopped"""
+    with _scheduler_lock:
+        status = dict(_status)
+        status['running'] = _scheduler is not None and _scheduler.is_alive() and not _stop.is_set()
+    return status